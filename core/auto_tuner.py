@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Auto Tuner
+Steps view-distance and simulation-distance with measured tick load
+"""
+
+import os
+import sys
+import json
+import time
+from pathlib import Path
+
+import psutil
+
+from cpu_sampler import cpu_snapshot
+from metrics_store import MetricsStore, SeriesLayoutError, SYSTEM_FIELDS, SYSTEM_SERIES
+from process_discovery import ProcessDiscovery
+from rcon import get_client, read_properties, RconError
+from server_manager import ServerManager
+from server_probe import ServerProbe
+from server_registry import ServerRegistry
+from tick_monitor import TickMonitor, tick_series_name, TICK_FIELDS, SAMPLE_INTERVAL
+
+STATE_FILE = "msm_autotune.json"
+
+EVALUATE_INTERVAL = 30
+
+# Hysteresis: step down above HIGH, only step up again below LOW
+HIGH_MSPT = 45.0
+LOW_MSPT = 30.0
+HIGH_CPU = 90.0
+LOW_CPU = 70.0
+
+# How long a condition must hold before acting on it
+OVERLOAD_WINDOW = 60
+SLACK_WINDOW = 300
+MIN_SAMPLES = 3
+
+# Rate limits between changes
+DOWN_COOLDOWN = 120
+UP_COOLDOWN = 600
+
+MIN_VIEW_DISTANCE = 4
+MIN_SIMULATION_DISTANCE = 3
+
+HISTORY_LENGTH = 50
+
+def write_properties(server_path, updates):
+    """Set keys in server.properties, keeping comments and line order"""
+    props_file = Path(server_path) / "server.properties"
+    lines = props_file.read_text().splitlines() if props_file.exists() else []
+    pending = dict(updates)
+    for i, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if "=" in line and not line.lstrip().startswith("#") and key in pending:
+            lines[i] = f"{key}={pending.pop(key)}"
+    lines += [f"{key}={value}" for key, value in pending.items()]
+    tmp_file = props_file.with_name(f".{props_file.name}.{os.getpid()}.tmp")
+    tmp_file.write_text("\n".join(lines) + "\n")
+    os.replace(tmp_file, props_file)
+
+def decide(state, samples, cpu, players, now):
+    """Next (view, simulation) distances, or None to leave them alone.
+
+    samples are tick samples ({"t", "tps", "mspt"}) from the last
+    SLACK_WINDOW seconds, cpu the host CPU percentages over the same span.
+    """
+    view, simulation = state["view"], state["simulation"]
+    since_change = now - state.get("last_change", 0)
+
+    def load(sample):
+        # Without a reported MSPT, infer it from TPS below 20
+        if sample["mspt"]:
+            return sample["mspt"]
+        return 1000 / max(sample["tps"], 0.1) if sample["tps"] < 19.5 else 0
+
+    recent = [s for s in samples if s["t"] >= now - OVERLOAD_WINDOW]
+    recent_cpu = cpu[-max(1, len(cpu) * OVERLOAD_WINDOW // SLACK_WINDOW):] if cpu else []
+
+    overloaded = len(recent) >= MIN_SAMPLES and (
+        all(load(s) > HIGH_MSPT for s in recent)
+        or (recent_cpu and min(recent_cpu) > HIGH_CPU)
+    )
+    if overloaded:
+        if since_change < DOWN_COOLDOWN:
+            return None
+        # Simulation distance drives tick cost; shed it first
+        if simulation > MIN_SIMULATION_DISTANCE:
+            simulation -= 1
+        elif view > MIN_VIEW_DISTANCE:
+            view -= 1
+        else:
+            return None
+        return view, simulation
+
+    slack = (
+        len(samples) >= MIN_SAMPLES
+        and samples[0]["t"] <= now - SLACK_WINDOW + SAMPLE_INTERVAL * 2
+        and all(load(s) < LOW_MSPT for s in samples)
+        and (not cpu or max(cpu) < LOW_CPU)
+        and players > 0
+    )
+    if slack and since_change >= UP_COOLDOWN:
+        # Restore view distance first, then simulation, up to the configured ceiling
+        if view < state["ceiling_view"]:
+            view += 1
+        elif simulation < state["ceiling_simulation"]:
+            simulation += 1
+        else:
+            return None
+        return view, simulation
+    return None
+
+class AutoTuner:
+    """Closed-loop view/simulation distance control for servers with "autotune" enabled.
+
+    The distances in server.properties when autotune is first enabled
+    become the ceiling. The tuner only ever lowers them and then brings
+    them back up. A change is sent at runtime when the server config
+    has an "autotune_command" template (for example a view-distance
+    plugin's command, with {view} and {simulation} placeholders). It is
+    always written to server.properties, so it also applies from the next
+    restart.
+
+    A change that could only be staged is recorded as pending against
+    the server process's start time. Until that process is replaced, the
+    running server still has the old distances. No further step is taken
+    until then, because measured load would not reflect the staged values.
+    """
+
+    def __init__(self):
+        self.data_dir = Path.home() / ".msm"
+        self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
+        self.manager = ServerManager()
+        self.store = MetricsStore()
+        self.probe = ServerProbe(self.servers_dir)
+        self.discovery = ProcessDiscovery(self.servers_dir)
+        self.monitors = {}
+
+    def load_state(self, server_path):
+        properties = read_properties(server_path)
+        view = int(properties.get("view-distance", 10))
+        simulation = int(properties.get("simulation-distance", view))
+
+        state = {"last_change": 0, "history": []}
+        state_file = server_path / STATE_FILE
+        if state_file.exists():
+            try:
+                with open(state_file) as f:
+                    state = json.load(f)
+            except ValueError:
+                pass
+
+        # Distances edited by hand since the last step become the new ceiling
+        if (state.get("view"), state.get("simulation")) != (view, simulation):
+            state.update(view=view, simulation=simulation, ceiling_view=view, ceiling_simulation=simulation)
+        return state
+
+    def save_state(self, server_path, state):
+        state_file = server_path / STATE_FILE
+        tmp_file = state_file.with_name(f".{state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, state_file)
+
+    def host_cpu(self, since):
+        """Host CPU over the window from the metrics store, else the live sample"""
+        if self.store.fields(SYSTEM_SERIES) is not None:
+            try:
+                rows = self.store.series(SYSTEM_SERIES, SYSTEM_FIELDS).query("1s", since)
+            except SeriesLayoutError as e:
+                self.store.warn_layout(SYSTEM_SERIES, e)
+                rows = []
+            if rows:
+                return [row["cpu"] for row in rows]
+        return [cpu_snapshot()["overall"]]
+
+    def apply(self, name, config, view, simulation):
+        """Stage the distances and push them at runtime if possible; returns how"""
+        server_path = self.registry.path(name)
+        write_properties(server_path, {"view-distance": view, "simulation-distance": simulation})
+
+        template = config.get("autotune_command")
+        client = get_client(server_path)
+        if template and client is not None:
+            try:
+                client.command(template.format(view=view, simulation=simulation))
+                return "applied"
+            except RconError:
+                pass
+        return "staged"
+
+    def server_started(self, name):
+        """Start time of the server's JVM, or None when it cannot be found"""
+        proc = self.discovery.refresh([name]).get(name)
+        if proc is None:
+            return None
+        try:
+            return proc.create_time()
+        except psutil.Error:
+            return None
+
+    def evaluate(self, name, config, players):
+        """Apply the next step for one server; returns the change made, or None"""
+        server_path = self.registry.path(name)
+        state = self.load_state(server_path)
+        now = time.time()
+        started = self.server_started(name)
+
+        pending = state.get("pending")
+        if pending:
+            if started is None or pending["started"] == started:
+                # The running server still has the distances from before the staged step
+                return None
+            # Restarted since: the staged distances are in effect now
+            del state["pending"]
+            self.save_state(server_path, state)
+
+        # Samples from before a restart were measured under other distances
+        since = max(now - SLACK_WINDOW, started or 0)
+        try:
+            samples = self.store.series(tick_series_name(name), TICK_FIELDS).query("1s", since)
+        except SeriesLayoutError as e:
+            self.store.warn_layout(tick_series_name(name), e)
+            return None
+        decision = decide(state, samples, self.host_cpu(now - SLACK_WINDOW), players, now)
+        if decision is None:
+            return None
+
+        view, simulation = decision
+        how = self.apply(name, config, view, simulation)
+        change = {
+            "t": now,
+            "from": [state["view"], state["simulation"]],
+            "to": [view, simulation],
+            "how": how
+        }
+        state.update(view=view, simulation=simulation, last_change=now)
+        if how == "staged" and started is not None:
+            state["pending"] = {"view": view, "simulation": simulation, "started": started}
+        state["history"] = (state["history"] + [change])[-HISTORY_LENGTH:]
+        self.save_state(server_path, state)
+        return change
+
+    def run(self):
+        """Sample ticks and tune every autotune-enabled running server until interrupted"""
+        print(f"\033[36m[INFO]\033[0m Auto-tuning servers every {EVALUATE_INTERVAL}s")
+        last_evaluate = time.monotonic()
+        try:
+            while True:
+                running = self.manager.get_running_servers()
+                configs = {
+                    name: config for name, config in self.registry.all().items()
+                    if config.get("autotune") and name in running
+                }
+                for name in list(self.monitors):
+                    if name not in configs:
+                        del self.monitors[name]
+                for name in configs:
+                    if name not in self.monitors:
+                        self.monitors[name] = TickMonitor(name, self.store)
+                    else:
+                        self.monitors[name].sample()
+
+                if time.monotonic() - last_evaluate >= EVALUATE_INTERVAL:
+                    last_evaluate = time.monotonic()
+                    probes = self.probe.results(configs)
+                    for name, config in configs.items():
+                        players = probes[name].get("players", {}).get("online", 0)
+                        change = self.evaluate(name, config, players)
+                        if change:
+                            print(f"\033[36m[INFO]\033[0m {name}: view/simulation distance "
+                                  f"{change['from'][0]}/{change['from'][1]} -> "
+                                  f"{change['to'][0]}/{change['to'][1]} ({change['how']})")
+                time.sleep(SAMPLE_INTERVAL)
+        except KeyboardInterrupt:
+            print("\n\033[32m[INFO]\033[0m Stopped auto-tuner")
+
+    def set_enabled(self, name, enabled):
+        server_path = self.registry.path(name)
+        config_file = server_path / "msm_config.json"
+        with open(config_file) as f:
+            config = json.load(f)
+        config["autotune"] = enabled
+        with open(config_file, "w") as f:
+            json.dump(config, f, indent=2)
+        self.registry.invalidate()
+        if enabled:
+            # Record the ceiling from the current properties
+            self.save_state(server_path, self.load_state(server_path))
+
+def format_status(state, enabled):
+    """Lines describing a server's auto-tune state for terminal views"""
+    lines = [
+        f"Auto-tune: {'enabled' if enabled else 'disabled'}",
+        f"View/simulation distance: {state['view']}/{state['simulation']} "
+        f"(ceiling {state['ceiling_view']}/{state['ceiling_simulation']})"
+    ]
+    if state.get("pending"):
+        lines.append("Staged in server.properties; paused until the server restarts")
+    for change in state["history"][-10:]:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(change["t"]))
+        lines.append(f"  {when}  {change['from'][0]}/{change['from'][1]} -> "
+                     f"{change['to'][0]}/{change['to'][1]} ({change['how']})")
+    return lines
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "enable", "disable", "status"):
+        print("Usage: auto_tuner.py run | enable <server> | disable <server> | status <server>")
+        sys.exit(1)
+
+    tuner = AutoTuner()
+    if sys.argv[1] == "run":
+        tuner.run()
+        return
+
+    if len(sys.argv) < 3 or tuner.registry.get(sys.argv[2]) is None:
+        print(f"\033[31m[ERROR]\033[0m Server not found")
+        sys.exit(1)
+    name = sys.argv[2]
+
+    if sys.argv[1] == "status":
+        state = tuner.load_state(tuner.registry.path(name))
+        for line in format_status(state, tuner.registry.get(name).get("autotune", False)):
+            print(f"  {line}")
+        return
+
+    tuner.set_enabled(name, sys.argv[1] == "enable")
+    print(f"\033[32m[SUCCESS]\033[0m Auto-tune {sys.argv[1]}d for '{name}'")
+    if sys.argv[1] == "enable":
+        print("\033[36m[INFO]\033[0m Run: python3 core/auto_tuner.py run")
+
+if __name__ == "__main__":
+    main()
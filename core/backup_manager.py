@@ -12,12 +12,37 @@ import tarfile
 from pathlib import Path
 from datetime import datetime
 
+from backup_scheduler import BackupScheduler, format_schedule, MIN_INTERVAL
+from backup_store import BackupStore, format_stats
+from compression import Compressor
+from hot_backup import HotBackup
+from server_manager import ServerManager
+from server_registry import ServerRegistry
+
 class BackupManager:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
         self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
         self.backups_dir = self.data_dir / "backups"
         self.backups_dir.mkdir(parents=True, exist_ok=True)
+        settings = self.load_settings()
+        self.store = BackupStore(self.backups_dir / "store",
+                                 region_headers=settings.get("backup_region_headers", True),
+                                 compressor=Compressor.from_settings(settings))
+        self.hot_backup = HotBackup(self.store)
+    
+    def load_settings(self):
+        """The global config.json as a dict"""
+        config_file = self.data_dir / "config.json"
+        if config_file.exists():
+            with open(config_file) as f:
+                return json.load(f)
+        return {}
+    
+    def get_setting(self, key, default=None):
+        """Read a value from the global config.json"""
+        return self.load_settings().get(key, default)
     
     def show_menu(self):
         """Display backup manager menu"""
@@ -34,7 +59,8 @@ class BackupManager:
             print("  \033[32m[2]\033[0m Restore Backup")
             print("  \033[32m[3]\033[0m List Backups")
             print("  \033[32m[4]\033[0m Delete Backup")
-            print("  \033[32m[5]\033[0m Automated Backup Settings")
+            print("  \033[32m[5]\033[0m Export Backup")
+            print("  \033[32m[6]\033[0m Automated Backup Settings")
             print("  \033[31m[0]\033[0m Back")
             print()
             
@@ -49,6 +75,8 @@ class BackupManager:
             elif choice == "4":
                 self.delete_backup()
             elif choice == "5":
+                self.export_backup()
+            elif choice == "6":
                 self.backup_settings()
             elif choice == "0":
                 break
@@ -60,7 +88,7 @@ class BackupManager:
         print()
         
         # Select server
-        servers = list(self.servers_dir.iterdir())
+        servers = [self.registry.path(name) for name in self.registry.names()]
         if not servers:
             print("\033[31m[ERROR]\033[0m No servers found")
             input("\nPress Enter to continue...")
@@ -81,109 +109,117 @@ class BackupManager:
             input("\nPress Enter to continue...")
             return
         
-        server_name = server_path.name
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{server_name}_{timestamp}"
-        
         print()
-        print(f"\033[36m[INFO]\033[0m Creating backup: {backup_name}")
-        print(f"\033[36m[INFO]\033[0m This may take a while...")
-        
-        # Create backup directory
-        backup_path = self.backups_dir / server_name
-        backup_path.mkdir(parents=True, exist_ok=True)
-        
-        # Create tarball
-        backup_file = backup_path / f"{backup_name}.tar.gz"
+        print(f"\033[36m[INFO]\033[0m Creating snapshot of {server_path.name}")
+        print(f"\033[36m[INFO]\033[0m Only files changed since the last snapshot are read...")
         
         try:
-            with tarfile.open(backup_file, "w:gz") as tar:
-                tar.add(server_path, arcname=server_name)
-            
-            # Save backup metadata
-            metadata = {
-                "server": server_name,
-                "timestamp": timestamp,
-                "date": datetime.now().isoformat(),
-                "size": backup_file.stat().st_size
-            }
+            # Running servers are flushed and frozen first so regions are not torn
+            manifest_path, stats = self.hot_backup.backup(server_path.name)
             
-            metadata_file = backup_path / f"{backup_name}.json"
-            with open(metadata_file, "w") as f:
-                json.dump(metadata, f, indent=2)
-            
-            size_mb = backup_file.stat().st_size / 1024 / 1024
             print()
             print(f"\033[32m[SUCCESS]\033[0m Backup created successfully!")
-            print(f"\033[36m[INFO]\033[0m Size: {size_mb:.2f} MB")
-            print(f"\033[36m[INFO]\033[0m Location: {backup_file}")
+            print(f"\033[36m[INFO]\033[0m {format_stats(stats)}")
+            print(f"\033[36m[INFO]\033[0m Snapshot: {manifest_path.stem}")
+            if "paused" in stats:
+                print(f"\033[36m[INFO]\033[0m World saving was paused for {stats['paused'] * 1000:.0f}ms")
             
         except Exception as e:
             print(f"\033[31m[ERROR]\033[0m Backup failed: {str(e)}")
         
         input("\nPress Enter to continue...")
     
-    def restore_backup(self):
-        """Restore a server from backup"""
-        os.system('clear')
-        print("\033[1m\033[36m═══ RESTORE BACKUP ═══\033[0m")
-        print()
+    def backup_servers(self):
+        """Names of servers with snapshots or legacy tar.gz backups"""
+        names = set(self.store.servers())
+        for server_dir in self.backups_dir.iterdir():
+            if server_dir != self.store.directory and server_dir.is_dir() and any(server_dir.glob("*.tar.gz")):
+                names.add(server_dir.name)
+        return sorted(names)
+    
+    def backups_for(self, server_name):
+        """Snapshots and legacy tarballs of a server, newest first"""
+        backups = []
+        for manifest_path in self.store.snapshots(server_name):
+            manifest = self.store.load(manifest_path)
+            backups.append({
+                "kind": "snapshot",
+                "path": manifest_path,
+                "date": manifest["date"],
+                "size": manifest["stats"]["size"],
+                "stored": manifest["stats"]["stored"]
+            })
+        
+        for backup in (self.backups_dir / server_name).glob("*.tar.gz"):
+            date = datetime.fromtimestamp(backup.stat().st_mtime).isoformat()
+            metadata_file = backup.with_name(backup.name[:-len(".tar.gz")] + ".json")
+            if metadata_file.exists():
+                with open(metadata_file) as f:
+                    date = json.load(f)["date"]
+            size = backup.stat().st_size
+            backups.append({"kind": "tarball", "path": backup, "date": date, "size": size, "stored": size})
         
-        # List servers with backups
-        backup_servers = list(self.backups_dir.iterdir())
+        return sorted(backups, key=lambda b: b["date"], reverse=True)
+    
+    def describe(self, backup):
+        if backup["kind"] == "snapshot":
+            return (f"{backup['date'][:19]} - snapshot, {backup['size'] / 1024 / 1024:.2f} MB "
+                    f"({backup['stored'] / 1024 / 1024:.2f} MB new)")
+        return f"{backup['date'][:19]} - {backup['path'].name}, {backup['size'] / 1024 / 1024:.2f} MB"
+    
+    def select_backup(self, action):
+        """Ask for a server and one of its backups; returns (server name, backup) or None"""
+        backup_servers = self.backup_servers()
         if not backup_servers:
             print("\033[31m[ERROR]\033[0m No backups found")
             input("\nPress Enter to continue...")
-            return
+            return None
         
         print("Select server:")
-        for i, server_dir in enumerate(backup_servers, 1):
-            if server_dir.is_dir():
-                print(f"  \033[32m[{i}]\033[0m {server_dir.name}")
+        for i, server_name in enumerate(backup_servers, 1):
+            print(f"  \033[32m[{i}]\033[0m {server_name}")
         
         print()
         choice = input("Select: ")
         
         try:
-            server_index = int(choice) - 1
-            backup_server_dir = backup_servers[server_index]
-        except:
+            server_name = backup_servers[int(choice) - 1]
+        except (ValueError, IndexError):
             print("\033[31m[ERROR]\033[0m Invalid selection")
             input("\nPress Enter to continue...")
-            return
-        
-        # List backups for server
-        backups = sorted(backup_server_dir.glob("*.tar.gz"), reverse=True)
-        if not backups:
-            print("\033[31m[ERROR]\033[0m No backups found for this server")
-            input("\nPress Enter to continue...")
-            return
+            return None
         
+        backups = self.backups_for(server_name)
         print()
-        print("Select backup to restore:")
+        print(f"Select backup to {action}:")
         for i, backup in enumerate(backups, 1):
-            metadata_file = backup.with_suffix('.json')
-            if metadata_file.exists():
-                with open(metadata_file) as f:
-                    meta = json.load(f)
-                size_mb = backup.stat().st_size / 1024 / 1024
-                print(f"  \033[32m[{i}]\033[0m {meta['date']} ({size_mb:.2f} MB)")
-            else:
-                print(f"  \033[32m[{i}]\033[0m {backup.name}")
+            print(f"  \033[32m[{i}]\033[0m {self.describe(backup)}")
         
         print()
         choice = input("Select: ")
         
         try:
-            backup_index = int(choice) - 1
-            backup_file = backups[backup_index]
-        except:
+            return server_name, backups[int(choice) - 1]
+        except (ValueError, IndexError):
             print("\033[31m[ERROR]\033[0m Invalid selection")
             input("\nPress Enter to continue...")
+            return None
+    
+    def restore_backup(self):
+        """Restore a server from backup"""
+        os.system('clear')
+        print("\033[1m\033[36m═══ RESTORE BACKUP ═══\033[0m")
+        print()
+        
+        selected = self.select_backup("restore")
+        if not selected:
             return
+        server_name, backup = selected
         
         print()
         print("\033[33m[WARN]\033[0m This will overwrite the current server!")
+        if server_name in ServerManager().get_running_servers():
+            print("\033[33m[WARN]\033[0m The server is running; stop it first")
         confirm = input("Continue? (y/n): ")
         
         if confirm.lower() != 'y':
@@ -193,9 +229,12 @@ class BackupManager:
         print(f"\033[36m[INFO]\033[0m Restoring backup...")
         
         try:
-            # Extract backup
-            with tarfile.open(backup_file, "r:gz") as tar:
-                tar.extractall(self.servers_dir)
+            if backup["kind"] == "snapshot":
+                self.store.restore(backup["path"], self.servers_dir / server_name)
+            else:
+                with tarfile.open(backup["path"], "r:gz") as tar:
+                    tar.extractall(self.servers_dir)
+            self.registry.invalidate()
             
             print(f"\033[32m[SUCCESS]\033[0m Backup restored successfully!")
             
@@ -210,39 +249,25 @@ class BackupManager:
         print("\033[1m\033[36m═══ BACKUP LIST ═══\033[0m")
         print()
         
-        backup_servers = list(self.backups_dir.iterdir())
+        backup_servers = self.backup_servers()
         if not backup_servers:
             print("\033[90mNo backups found\033[0m")
             input("\nPress Enter to continue...")
             return
         
-        total_size = 0
         total_backups = 0
         
-        for server_dir in sorted(backup_servers):
-            if server_dir.is_dir():
-                backups = sorted(server_dir.glob("*.tar.gz"), reverse=True)
-                if backups:
-                    print(f"\033[1m\033[33m{server_dir.name}\033[0m")
-                    
-                    for backup in backups:
-                        metadata_file = backup.with_suffix('.json')
-                        size = backup.stat().st_size
-                        size_mb = size / 1024 / 1024
-                        total_size += size
-                        total_backups += 1
-                        
-                        if metadata_file.exists():
-                            with open(metadata_file) as f:
-                                meta = json.load(f)
-                            print(f"  • {meta['date']} - {size_mb:.2f} MB")
-                        else:
-                            print(f"  • {backup.name} - {size_mb:.2f} MB")
-                    
-                    print()
-        
-        total_size_mb = total_size / 1024 / 1024
-        print(f"\033[90mTotal: {total_backups} backups ({total_size_mb:.2f} MB)\033[0m")
+        for server_name in backup_servers:
+            print(f"\033[1m\033[33m{server_name}\033[0m")
+            for backup in self.backups_for(server_name):
+                total_backups += 1
+                print(f"  • {self.describe(backup)}")
+            print()
+        
+        # Snapshots share chunks, so the store's size is what they cost together
+        tarballs = sum(b.stat().st_size for b in self.backups_dir.glob("*/*.tar.gz"))
+        total_size_mb = (self.store.usage() + tarballs) / 1024 / 1024
+        print(f"\033[90mTotal: {total_backups} backups ({total_size_mb:.2f} MB on disk)\033[0m")
         
         input("\nPress Enter to continue...")
     
@@ -252,82 +277,154 @@ class BackupManager:
         print("\033[1m\033[36m═══ DELETE BACKUP ═══\033[0m")
         print()
         
-        # List servers with backups
-        backup_servers = list(self.backups_dir.iterdir())
-        if not backup_servers:
-            print("\033[31m[ERROR]\033[0m No backups found")
-            input("\nPress Enter to continue...")
+        selected = self.select_backup("delete")
+        if not selected:
             return
+        _, backup = selected
         
-        print("Select server:")
-        for i, server_dir in enumerate(backup_servers, 1):
-            if server_dir.is_dir():
-                print(f"  \033[32m[{i}]\033[0m {server_dir.name}")
+        print()
+        confirm = input(f"\033[33mDelete {self.describe(backup)}? (y/n): \033[0m")
         
+        if confirm.lower() == 'y':
+            try:
+                if backup["kind"] == "snapshot":
+                    self.store.delete(backup["path"])
+                    chunks, size = self.store.prune()
+                    print(f"\033[36m[INFO]\033[0m Freed {size / 1024 / 1024:.2f} MB of chunks no other backup uses")
+                else:
+                    backup["path"].unlink()
+                    metadata_file = backup["path"].with_name(backup["path"].name[:-len(".tar.gz")] + ".json")
+                    if metadata_file.exists():
+                        metadata_file.unlink()
+                
+                print(f"\033[32m[SUCCESS]\033[0m Backup deleted")
+            except Exception as e:
+                print(f"\033[31m[ERROR]\033[0m {str(e)}")
+        
+        input("\nPress Enter to continue...")
+    
+    def export_backup(self):
+        """Write a snapshot out as a standalone .tar.gz"""
+        os.system('clear')
+        print("\033[1m\033[36m═══ EXPORT BACKUP ═══\033[0m")
         print()
-        choice = input("Select: ")
         
-        try:
-            server_index = int(choice) - 1
-            backup_server_dir = backup_servers[server_index]
-        except:
-            print("\033[31m[ERROR]\033[0m Invalid selection")
-            input("\nPress Enter to continue...")
+        selected = self.select_backup("export")
+        if not selected:
             return
-        
-        # List backups
-        backups = sorted(backup_server_dir.glob("*.tar.gz"), reverse=True)
-        if not backups:
-            print("\033[31m[ERROR]\033[0m No backups found")
+        server_name, backup = selected
+        if backup["kind"] != "snapshot":
+            print(f"\033[36m[INFO]\033[0m Already an archive: {backup['path']}")
             input("\nPress Enter to continue...")
             return
         
-        print()
-        print("Select backup to delete:")
-        for i, backup in enumerate(backups, 1):
-            size_mb = backup.stat().st_size / 1024 / 1024
-            print(f"  \033[32m[{i}]\033[0m {backup.name} ({size_mb:.2f} MB)")
+        exports_dir = self.backups_dir / "exports"
+        exports_dir.mkdir(exist_ok=True)
+        out_path = exports_dir / f"{server_name}_{backup['path'].stem}.tar.gz"
         
         print()
-        choice = input("Select: ")
+        print(f"\033[36m[INFO]\033[0m Compressing with {self.store.compressor.threads} threads...")
         
         try:
-            backup_index = int(choice) - 1
-            backup_file = backups[backup_index]
-        except:
-            print("\033[31m[ERROR]\033[0m Invalid selection")
-            input("\nPress Enter to continue...")
-            return
-        
-        print()
-        confirm = input(f"\033[33mDelete {backup_file.name}? (y/n): \033[0m")
-        
-        if confirm.lower() == 'y':
-            try:
-                backup_file.unlink()
-                metadata_file = backup_file.with_suffix('.json')
-                if metadata_file.exists():
-                    metadata_file.unlink()
-                
-                print(f"\033[32m[SUCCESS]\033[0m Backup deleted")
-            except Exception as e:
-                print(f"\033[31m[ERROR]\033[0m {str(e)}")
+            self.store.export(backup["path"], out_path)
+            size_mb = out_path.stat().st_size / 1024 / 1024
+            print(f"\033[32m[SUCCESS]\033[0m Exported to {out_path} ({size_mb:.2f} MB)")
+        except Exception as e:
+            print(f"\033[31m[ERROR]\033[0m Export failed: {str(e)}")
         
         input("\nPress Enter to continue...")
     
+    def save_setting(self, key, value):
+        """Write one value to the global config.json"""
+        settings = self.load_settings()
+        settings[key] = value
+        with open(self.data_dir / "config.json", "w") as f:
+            json.dump(settings, f, indent=2)
+    
     def backup_settings(self):
         """Configure automated backup settings"""
-        os.system('clear')
-        print("\033[1m\033[36m═══ BACKUP SETTINGS ═══\033[0m")
+        while True:
+            os.system('clear')
+            print("\033[1m\033[36m═══ BACKUP SETTINGS ═══\033[0m")
+            print()
+            
+            scheduler = BackupScheduler()
+            settings = scheduler.settings
+            retention = scheduler.retention({})
+            enabled = settings.get("auto_backup", True)
+            print(f"  Automatic Backups: \033[1m{'Enabled' if enabled else 'Disabled'}\033[0m")
+            print(f"  Interval: \033[1m{scheduler.interval({}) // 60} minutes\033[0m")
+            print(f"  Keep: \033[1mlast {retention['max_backups']}, {retention['backup_keep_hourly']} hourly, "
+                  f"{retention['backup_keep_daily']} daily, {retention['backup_keep_weekly']} weekly\033[0m")
+            print()
+            for line in format_schedule(scheduler.schedule()):
+                print(line)
+            print()
+            print("\033[90mBackups run while the scheduler is running: python3 core/backup_scheduler.py run\033[0m")
+            print()
+            
+            print("\033[1m\033[33m═══ OPTIONS ═══\033[0m")
+            print()
+            print("  \033[32m[1]\033[0m Toggle Automatic Backups")
+            print("  \033[32m[2]\033[0m Change Interval")
+            print("  \033[32m[3]\033[0m Change Retention")
+            print("  \033[32m[4]\033[0m Apply Retention Now")
+            print("  \033[31m[0]\033[0m Back")
+            print()
+            
+            choice = input("Select option: ")
+            
+            if choice == "1":
+                self.save_setting("auto_backup", not enabled)
+            elif choice == "2":
+                self.change_backup_interval()
+            elif choice == "3":
+                self.change_retention(retention)
+            elif choice == "4":
+                print()
+                removed = sum(scheduler.apply_retention(name) for name in scheduler.store.servers())
+                print(f"\033[32m[SUCCESS]\033[0m Removed {removed} snapshots")
+                input("\nPress Enter to continue...")
+            elif choice == "0":
+                break
+    
+    def change_backup_interval(self):
+        """Change how often servers are backed up"""
         print()
-        print("\033[33m[INFO]\033[0m Automated backups coming soon!")
+        minutes = input("Minutes between backups: ")
+        try:
+            minutes = int(minutes)
+            if minutes * 60 >= MIN_INTERVAL:
+                self.save_setting("backup_interval", minutes * 60)
+                print("\033[32m[SUCCESS]\033[0m Interval updated")
+            else:
+                print(f"\033[31m[ERROR]\033[0m Interval must be at least {MIN_INTERVAL // 60} minutes")
+        except ValueError:
+            print("\033[31m[ERROR]\033[0m Invalid value")
+        input("\nPress Enter to continue...")
+    
+    def change_retention(self, retention):
+        """Change how many snapshots are kept (Enter keeps the current value)"""
         print()
-        print("Planned features:")
-        print("  • Scheduled automatic backups")
-        print("  • Configurable retention policy")
-        print("  • Cloud backup integration")
-        print("  • Incremental backups")
-        
+        labels = (
+            ("max_backups", "Latest snapshots to keep"),
+            ("backup_keep_hourly", "Hourly snapshots to keep"),
+            ("backup_keep_daily", "Daily snapshots to keep"),
+            ("backup_keep_weekly", "Weekly snapshots to keep")
+        )
+        for key, label in labels:
+            value = input(f"{label} [{retention[key]}]: ")
+            if not value:
+                continue
+            try:
+                value = int(value)
+                if value < 0:
+                    raise ValueError
+            except ValueError:
+                print("\033[31m[ERROR]\033[0m Invalid value")
+                continue
+            self.save_setting(key, value)
+        print("\033[32m[SUCCESS]\033[0m Retention updated")
         input("\nPress Enter to continue...")
 
 def main():
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Backup Scheduler
+Runs interval backups of every server and thins old snapshots
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+from pathlib import Path
+from datetime import datetime
+
+from backup_store import BackupStore, format_stats, RACY_WINDOW_NS
+from compression import Compressor
+from hot_backup import HotBackup
+from server_registry import ServerRegistry
+
+CHECK_INTERVAL = 30
+
+# A server skipped as unchanged is looked at again after at most this long
+SKIP_RECHECK = 600
+
+MIN_INTERVAL = 300
+
+DEFAULT_RETENTION = {
+    "max_backups": 5,
+    "backup_keep_hourly": 24,
+    "backup_keep_daily": 7,
+    "backup_keep_weekly": 4
+}
+
+LOCK_PATH = Path.home() / ".msm" / "backup_scheduler.lock"
+
+def snapshot_time(manifest_path):
+    """When a snapshot was taken, from its file name (20240101_120000[_n].json)"""
+    return datetime.strptime(manifest_path.stem[:15], "%Y%m%d_%H%M%S")
+
+def keep_set(manifest_paths, retention):
+    """Snapshots to keep: the newest max_backups (at least one), plus the
+    newest of each of the last backup_keep_hourly hours, backup_keep_daily
+    days and backup_keep_weekly ISO weeks that have one.
+    """
+    newest_first = sorted(manifest_paths, key=snapshot_time, reverse=True)
+    # The newest snapshot is always kept
+    keep = set(newest_first[:max(1, retention["max_backups"])])
+    buckets = (
+        ("backup_keep_hourly", lambda t: t.strftime("%Y%m%d%H")),
+        ("backup_keep_daily", lambda t: t.strftime("%Y%m%d")),
+        ("backup_keep_weekly", lambda t: t.isocalendar()[:2])
+    )
+    for key, bucket in buckets:
+        seen = set()
+        for manifest_path in newest_first:
+            if len(seen) >= retention[key]:
+                break
+            period = bucket(snapshot_time(manifest_path))
+            if period not in seen:
+                seen.add(period)
+                keep.add(manifest_path)
+    return keep
+
+def world_dirs(server_path):
+    """Directories holding the server's worlds; the whole server when none are found"""
+    dirs = [d for d in server_path.iterdir() if d.is_dir() and (d / "level.dat").exists()]
+    bedrock_worlds = server_path / "worlds"
+    if bedrock_worlds.is_dir():
+        dirs.extend(d for d in bedrock_worlds.iterdir() if d.is_dir())
+    return dirs or [server_path]
+
+def changed_since(server_path, since_ns):
+    """Check whether anything in the worlds was written or removed since since_ns"""
+    since_ns -= RACY_WINDOW_NS
+    for world in world_dirs(server_path):
+        for root, dirnames, filenames in os.walk(world):
+            # A directory's mtime changes when entries are added or removed
+            for name in [root] + [os.path.join(root, f) for f in filenames]:
+                try:
+                    if os.lstat(name).st_mtime_ns >= since_ns:
+                        return True
+                except FileNotFoundError:
+                    return True
+    return False
+
+class BackupScheduler:
+    """Backs servers up one at a time when their interval has passed.
+
+    Jobs run in order of how overdue they are and never overlap, so two
+    servers are not read and compressed at the same time. Because a
+    server's next slot counts from when its last snapshot finished,
+    servers that start out due together drift apart. Retention is
+    applied to a server after each of its backups.
+    """
+
+    def __init__(self):
+        self.data_dir = Path.home() / ".msm"
+        self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
+        self.settings = self.load_settings()
+        self.store = BackupStore(self.data_dir / "backups" / "store",
+                                 region_headers=self.settings.get("backup_region_headers", True),
+                                 compressor=Compressor.from_settings(self.settings))
+        self.hot_backup = HotBackup(self.store)
+        # Servers found unchanged: name -> time to look again
+        self.skipped = {}
+
+    def load_settings(self):
+        config_file = self.data_dir / "config.json"
+        if config_file.exists():
+            with open(config_file) as f:
+                return json.load(f)
+        return {}
+
+    def retention(self, config):
+        """Retention counts for a server; msm_config.json overrides config.json"""
+        return {key: int(config.get(key, self.settings.get(key, default)))
+                for key, default in DEFAULT_RETENTION.items()}
+
+    def interval(self, config):
+        return max(MIN_INTERVAL, int(config.get("backup_interval", self.settings.get("backup_interval", 3600))))
+
+    def enabled(self, config):
+        return config.get("auto_backup", self.settings.get("auto_backup", True))
+
+    def last_backup(self, name):
+        """(time of the newest snapshot, its manifest path), or (None, None)"""
+        snapshots = self.store.snapshots(name)
+        if not snapshots:
+            return None, None
+        return snapshot_time(snapshots[-1]).timestamp(), snapshots[-1]
+
+    def schedule(self, now=None):
+        """Every server with its next due time, soonest first"""
+        now = now or time.time()
+        entries = []
+        for name, config in self.registry.all().items():
+            last, manifest_path = self.last_backup(name)
+            entry = {"name": name, "enabled": self.enabled(config), "interval": self.interval(config),
+                     "last": last, "manifest": manifest_path, "count": len(self.store.snapshots(name))}
+            entry["due"] = (last or 0) + entry["interval"]
+            if name in self.skipped:
+                entry["due"] = max(entry["due"], self.skipped[name])
+            entries.append(entry)
+        return sorted(entries, key=lambda e: e["due"])
+
+    def backup(self, entry, now=None):
+        """Back one server up unless its worlds are unchanged; returns stats or None"""
+        now = now or time.time()
+        name = entry["name"]
+        if entry["manifest"] is not None:
+            started_ns = self.store.load(entry["manifest"]).get("started_ns", 0)
+            if not changed_since(self.servers_dir / name, started_ns):
+                self.skipped[name] = now + min(entry["interval"], SKIP_RECHECK)
+                return None
+        self.skipped.pop(name, None)
+        manifest_path, stats = self.hot_backup.backup(name)
+        self.apply_retention(name)
+        return stats
+
+    def apply_retention(self, name):
+        """Delete snapshots outside the retention policy; returns how many"""
+        snapshots = self.store.snapshots(name)
+        keep = keep_set(snapshots, self.retention(self.registry.get(name) or {}))
+        removed = [p for p in snapshots if p not in keep]
+        for manifest_path in removed:
+            self.store.delete(manifest_path)
+        if removed:
+            chunks, size = self.store.prune()
+            print(f"\033[36m[INFO]\033[0m {name}: removed {len(removed)} old snapshots, "
+                  f"freed {size / 1024 / 1024:.1f} MB")
+        return len(removed)
+
+    def run_due(self):
+        """Run every due backup, one after another"""
+        for entry in self.schedule():
+            if not entry["enabled"] or not self.settings.get("auto_backup", True):
+                continue
+            if entry["due"] > time.time():
+                break
+            try:
+                stats = self.backup(entry)
+            except Exception as e:
+                print(f"\033[31m[ERROR]\033[0m {entry['name']}: backup failed: {e}")
+                # Do not retry every check
+                self.skipped[entry["name"]] = time.time() + min(entry["interval"], SKIP_RECHECK)
+                continue
+            if stats is None:
+                print(f"\033[36m[INFO]\033[0m {entry['name']}: worlds unchanged, skipped")
+            else:
+                print(f"\033[32m[SUCCESS]\033[0m {entry['name']}: {format_stats(stats)}")
+
+    def run(self):
+        """Check for due backups until interrupted"""
+        lock = open(LOCK_PATH, "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("\033[33m[WARN]\033[0m The backup scheduler is already running")
+            return False
+
+        print(f"\033[36m[INFO]\033[0m Backup scheduler started, checking every {CHECK_INTERVAL}s")
+        try:
+            while True:
+                # Pick up changes made in the settings menu
+                self.settings = self.load_settings()
+                self.run_due()
+                time.sleep(CHECK_INTERVAL)
+        except KeyboardInterrupt:
+            print("\n\033[36m[INFO]\033[0m Backup scheduler stopped")
+        finally:
+            lock.close()
+        return True
+
+def format_schedule(schedule, now=None):
+    """Lines describing each server's backup schedule"""
+    now = now or time.time()
+    lines = [f"  {'Server':<20} {'Last backup':<20} {'Next':<12} {'Kept':>5}"]
+    for entry in schedule:
+        last = datetime.fromtimestamp(entry["last"]).strftime("%Y-%m-%d %H:%M") if entry["last"] else "never"
+        if not entry["enabled"]:
+            due = "disabled"
+        elif entry["due"] <= now:
+            due = "due now"
+        else:
+            due = f"in {(entry['due'] - now) / 60:.0f} min"
+        lines.append(f"  {entry['name']:<20} {last:<20} {due:<12} {entry['count']:>5}")
+    return lines
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "once", "status", "retention"):
+        print("Usage: backup_scheduler.py run | once | status | retention")
+        sys.exit(1)
+
+    scheduler = BackupScheduler()
+    if sys.argv[1] == "run":
+        scheduler.run()
+    elif sys.argv[1] == "once":
+        scheduler.run_due()
+    elif sys.argv[1] == "retention":
+        for name in scheduler.store.servers():
+            scheduler.apply_retention(name)
+    else:
+        if not scheduler.settings.get("auto_backup", True):
+            print("\033[33m[WARN]\033[0m Automatic backups are disabled in settings")
+        for line in format_schedule(scheduler.schedule()):
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Backup Store
+Deduplicating, content-addressed snapshots of server directories
+"""
+
+import os
+import sys
+import json
+import time
+import stat
+import fcntl
+import shutil
+import hashlib
+import tarfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import deque
+from concurrent.futures import Future
+
+from compression import Compressor, ParallelGzipFile, decompress
+
+STORE_DIR = Path.home() / ".msm" / "backups" / "store"
+
+# Generic files are cut after ANCHOR once a chunk has MIN_CHUNK bytes, or at
+# MAX_CHUNK. The anchor depends only on content, so an insertion moves the
+# boundaries next to it and leaves the rest of the file's chunks unchanged.
+ANCHOR = b"\x9e\x37"
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 1024 * 1024
+READ_SIZE = 8 * 1024 * 1024
+
+# Region files: 4KiB sectors, an 8KiB header (locations + timestamps)
+SECTOR_SIZE = 4096
+REGION_HEADER_SIZE = 8192
+REGION_SUFFIX = ".mca"
+
+# A file modified this close to the previous snapshot may have changed again
+# within the same mtime tick, so it is read even when size and mtime match
+RACY_WINDOW_NS = 2 * 10**9
+
+def unchanged(old, st, trusted_before):
+    """Check whether a file's previous entry still describes it without reading it"""
+    return (old is not None and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns
+            and st.st_mtime_ns < trusted_before)
+
+def chunk_hash(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def cdc_pieces(f):
+    """Content-defined pieces of a file object, as bytes"""
+    buf = b""
+    eof = False
+    while True:
+        if not eof and len(buf) < MAX_CHUNK:
+            data = f.read(READ_SIZE)
+            eof = not data
+            buf += data
+        if not buf:
+            return
+        start = 0
+        while True:
+            low, high = start + MIN_CHUNK, start + MAX_CHUNK
+            if low >= len(buf):
+                end = len(buf) if eof else None
+            else:
+                found = buf.find(ANCHOR, low, min(high, len(buf)))
+                if found != -1:
+                    end = found + len(ANCHOR)
+                elif high <= len(buf):
+                    end = high
+                else:
+                    end = len(buf) if eof else None
+            if end is None:
+                break
+            yield buf[start:end]
+            start = end
+            if start == len(buf):
+                break
+        buf = buf[start:]
+        if eof and not buf:
+            return
+
+def region_slots(header):
+    """{index: (offset, sectors, timestamp)} for every chunk in a region header"""
+    slots = {}
+    if len(header) < REGION_HEADER_SIZE:
+        return slots
+    for i in range(1024):
+        entry = header[i * 4:i * 4 + 4]
+        offset, sectors = int.from_bytes(entry[:3], "big"), entry[3]
+        if offset >= 2 and sectors:
+            timestamp = int.from_bytes(header[SECTOR_SIZE + i * 4:SECTOR_SIZE + i * 4 + 4], "big")
+            slots[i] = (offset, sectors, timestamp)
+    return slots
+
+def region_ranges(data):
+    """(start, end) byte ranges of every chunk stored in a region file"""
+    ranges = []
+    for offset, sectors, _ in region_slots(data[:REGION_HEADER_SIZE]).values():
+        start = offset * SECTOR_SIZE
+        ranges.append((start, min(start + sectors * SECTOR_SIZE, len(data))))
+    return ranges
+
+def region_pieces(data):
+    """A region file cut at its header and chunk boundaries.
+
+    Chunks are the unit Minecraft rewrites, so a save that touched a few
+    chunks only produces new pieces for those, even when they moved.
+    """
+    cuts = {0, min(REGION_HEADER_SIZE, len(data)), len(data)}
+    for start, end in region_ranges(data):
+        cuts.update((start, end))
+    cuts = sorted(c for c in cuts if c <= len(data))
+    return [data[a:b] for a, b in zip(cuts, cuts[1:]) if b > a]
+
+class BackupStore:
+    """Chunks under chunks/<xx>/<hash>, snapshot manifests under snapshots/<server>/.
+
+    A manifest lists every file with its size, mtime and mode, plus the
+    hash of its piece list, which is stored as a chunk too. A file whose
+    size and mtime match the previous snapshot reuses that list without
+    being read. A changed region file is read through its header when
+    region_headers is set (see store_region).
+    """
+
+    def __init__(self, directory=None, region_headers=True, compressor=None):
+        self.region_headers = region_headers
+        self.compressor = compressor or Compressor()
+        self.directory = Path(directory) if directory else STORE_DIR
+        self.chunks_dir = self.directory / "chunks"
+        self.snapshots_dir = self.directory / "snapshots"
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        self.lock_file = self.directory / "lock"
+
+    def locked(self, exclusive):
+        """File lock: snapshots share it, pruning takes it alone"""
+        handle = open(self.lock_file, "a")
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return handle
+
+    def chunk_path(self, digest):
+        return self.chunks_dir / digest[:2] / digest
+
+    def put_chunk(self, data):
+        """Store data unless present; returns (hash, length, bytes written).
+
+        Runs on the compressor's workers, so hashing, compression and the
+        write for many chunks proceed in parallel.
+        """
+        digest = chunk_hash(data)
+        path = self.chunk_path(digest)
+        if path.exists():
+            return digest, len(data), 0
+        payload = self.compressor.compress(data)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return digest, len(data), len(payload)
+
+    def get_chunk(self, digest):
+        with open(self.chunk_path(digest), "rb") as f:
+            return decompress(f.read())
+
+    def pieces(self, entry):
+        """[hash, length] pieces of a manifest file entry"""
+        if "chunks" in entry:
+            return entry["chunks"]
+        return json.loads(self.get_chunk(entry["list"]))
+
+    def put_pieces(self, pieces, stats):
+        """Store a piece list as a chunk of its own, so unchanged files cost one reference"""
+        digest, _, written = self.put_chunk(json.dumps(pieces, separators=(",", ":")).encode())
+        stats["stored"] += written
+        return digest
+
+    def add_piece(self, data, pieces, stats, read=True):
+        """Queue a piece for storing; resolve() turns the list into [hash, length] pairs"""
+        pieces.append(self.compressor.submit(self.put_chunk, data))
+        stats["read"] += len(data) if read else 0
+
+    def read_chunks(self, pieces):
+        """Chunk contents in order, decompressed ahead on the compressor's workers"""
+        pending = deque()
+        for digest, _ in pieces:
+            pending.append(self.compressor.submit(self.get_chunk, digest))
+            if len(pending) > self.compressor.threads * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def resolve(self, pieces, stats):
+        resolved = []
+        for piece in pieces:
+            if isinstance(piece, Future):
+                digest, length, written = piece.result()
+                stats["stored"] += written
+                stats["new_chunks"] += bool(written)
+                piece = [digest, length]
+            resolved.append(piece)
+        return resolved
+
+    def store_file(self, path, stats):
+        """Piece list for one file, storing new chunks"""
+        pieces = []
+        with open(path, "rb") as f:
+            if path.suffix == REGION_SUFFIX:
+                data = f.read()
+                for piece in region_pieces(data):
+                    self.add_piece(piece, pieces, stats)
+            else:
+                for piece in cdc_pieces(f):
+                    self.add_piece(piece, pieces, stats)
+        return pieces
+
+    def store_region(self, path, old_pieces, trusted_before, stats):
+        """Piece list for a changed region file, read through its header.
+
+        A chunk whose location and timestamp match the previous snapshot's
+        header keeps its old piece without being read. Only rewritten
+        chunks are read from disk. Free sectors are not referenced by the
+        region, so they are stored as zeros instead of being read.
+        """
+        with open(path, "rb") as f:
+            header = f.read(REGION_HEADER_SIZE)
+            size = os.fstat(f.fileno()).st_size
+            if len(header) < REGION_HEADER_SIZE or not old_pieces or old_pieces[0][1] != REGION_HEADER_SIZE:
+                f.seek(0)
+                pieces = []
+                for piece in region_pieces(f.read()):
+                    self.add_piece(piece, pieces, stats)
+                return pieces
+
+            old_slots = region_slots(self.get_chunk(old_pieces[0][0]))
+            old_by_start, position = {}, 0
+            for digest, length in old_pieces:
+                old_by_start[position] = (digest, length)
+                position += length
+
+            slots = region_slots(header)
+            starts = {offset * SECTOR_SIZE: (i, offset, sectors, timestamp)
+                      for i, (offset, sectors, timestamp) in slots.items()}
+            cuts = {0, REGION_HEADER_SIZE, size}
+            for offset, sectors, _ in slots.values():
+                cuts.update((offset * SECTOR_SIZE, min((offset + sectors) * SECTOR_SIZE, size)))
+            cuts = sorted(c for c in cuts if c <= size)
+
+            pieces = []
+            self.add_piece(header, pieces, stats)
+            for start, end in zip(cuts[1:], cuts[2:]):
+                if end <= start:
+                    continue
+                slot = starts.get(start)
+                if slot is None:
+                    self.add_piece(bytes(end - start), pieces, stats, read=False)
+                    continue
+                i, offset, sectors, timestamp = slot
+                old = old_by_start.get(start)
+                # Timestamps have 1s resolution: only trust ones older than the last snapshot
+                if (old_slots.get(i) == (offset, sectors, timestamp) and old and old[1] == end - start
+                        and timestamp < trusted_before):
+                    pieces.append(list(old))
+                    stats["reused_chunks"] += 1
+                    continue
+                f.seek(start)
+                self.add_piece(f.read(end - start), pieces, stats)
+        return pieces
+
+    def snapshots(self, server_name):
+        """Manifest paths for a server, oldest first"""
+        directory = self.snapshots_dir / server_name
+        return sorted(directory.glob("*.json")) if directory.exists() else []
+
+    def servers(self):
+        return sorted(d.name for d in self.snapshots_dir.iterdir() if d.is_dir() and self.snapshots(d.name))
+
+    def load(self, manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def previous(self, server_name):
+        """({path: entry} of the newest snapshot, mtime before which its entries can be trusted)"""
+        history = self.snapshots(server_name)
+        if not history:
+            return {}, 0
+        last = self.load(history[-1])
+        return ({entry["path"]: entry for entry in last["files"]},
+                last.get("started_ns", 0) - RACY_WINDOW_NS)
+
+    def snapshot(self, server_path, taken_ns=None, carried=None):
+        """Snapshot a server directory; returns the manifest path and its stats.
+
+        taken_ns is when the directory's contents were captured, for a
+        frozen copy that is read after the server has moved on. carried
+        maps paths left out of that copy, because they were unchanged,
+        to their entries in the previous snapshot.
+        """
+        return self.compressor.run(self.write_snapshot, Path(server_path), taken_ns, carried or {})
+
+    def write_snapshot(self, server_path, taken_ns=None, carried=None):
+        previous, trusted_before = self.previous(server_path.name)
+        history = self.snapshots(server_path.name)
+
+        stats = {"files": 0, "unchanged": 0, "size": 0, "read": 0, "stored": 0, "new_chunks": 0,
+                 "reused_chunks": 0}
+        files, dirs = [], []
+        # Files whose chunks are still being stored; their list is filled in later
+        pending = deque()
+        walk_started_ns = time.time_ns()
+        started_ns = taken_ns or walk_started_ns
+        with self.locked(exclusive=False):
+            for root, dirnames, filenames in os.walk(server_path):
+                dirnames.sort()
+                rel_root = Path(root).relative_to(server_path)
+                if not filenames and not dirnames and rel_root != Path("."):
+                    dirs.append(str(rel_root))
+                for filename in sorted(filenames):
+                    path = Path(root) / filename
+                    rel = str(rel_root / filename)
+                    try:
+                        st = path.lstat()
+                    except FileNotFoundError:
+                        continue
+                    if not stat.S_ISREG(st.st_mode):
+                        continue
+
+                    stats["files"] += 1
+                    stats["size"] += st.st_size
+                    old = previous.get(rel)
+                    entry = {
+                        "path": rel,
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                        "mode": st.st_mode & 0o7777,
+                        "list": None
+                    }
+                    if unchanged(old, st, trusted_before):
+                        entry["list"] = old.get("list")
+                        if entry["list"] is None:
+                            entry["list"] = self.put_pieces(old["chunks"], stats)
+                        stats["unchanged"] += 1
+                    else:
+                        try:
+                            if old and self.region_headers and path.suffix == REGION_SUFFIX:
+                                pieces = self.store_region(path, self.pieces(old),
+                                                           trusted_before // 10**9, stats)
+                            else:
+                                pieces = self.store_file(path, stats)
+                        except FileNotFoundError:
+                            # Deleted while walking (rotated log, saved temp file)
+                            continue
+                        # Keep reading the next files while workers compress these
+                        pending.append((entry, pieces))
+                        while len(pending) > self.compressor.threads * 2:
+                            done, pieces = pending.popleft()
+                            done["list"] = self.put_pieces(self.resolve(pieces, stats), stats)
+                    files.append(entry)
+
+            walked = {entry["path"] for entry in files}
+            for rel, old in (carried or {}).items():
+                if rel in walked:
+                    continue
+                stats["files"] += 1
+                stats["size"] += old["size"]
+                stats["unchanged"] += 1
+                files.append({
+                    "path": rel,
+                    "size": old["size"],
+                    "mtime_ns": old["mtime_ns"],
+                    "mode": old["mode"],
+                    "list": old.get("list") or self.put_pieces(old["chunks"], stats)
+                })
+
+            while pending:
+                done, pieces = pending.popleft()
+                done["list"] = self.put_pieces(self.resolve(pieces, stats), stats)
+
+            stats["seconds"] = round((time.time_ns() - walk_started_ns) / 1e9, 2)
+            now = datetime.now()
+            manifest = {
+                "server": server_path.name,
+                "timestamp": now.strftime("%Y%m%d_%H%M%S"),
+                "date": now.isoformat(),
+                "started_ns": started_ns,
+                "files": files,
+                "dirs": dirs,
+                "stats": stats
+            }
+            directory = self.snapshots_dir / server_path.name
+            directory.mkdir(exist_ok=True)
+            manifest_path = directory / f"{manifest['timestamp']}.json"
+            if manifest_path.exists():
+                manifest["timestamp"] += f"_{len(history)}"
+                manifest_path = directory / f"{manifest['timestamp']}.json"
+            tmp_path = manifest_path.with_name(f".{manifest_path.name}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, manifest_path)
+        return manifest_path, stats
+
+    def restore(self, manifest_path, target):
+        """Rebuild a snapshot at target, replacing what is there"""
+        self.compressor.run(self.write_restore, manifest_path, target)
+
+    def write_restore(self, manifest_path, target):
+        manifest = self.load(manifest_path)
+        target = Path(target)
+        staging = target.with_name(f".{target.name}.restoring")
+        if staging.exists():
+            shutil.rmtree(staging)
+
+        try:
+            with self.locked(exclusive=False):
+                staging.mkdir(parents=True)
+                for rel in manifest["dirs"]:
+                    (staging / rel).mkdir(parents=True, exist_ok=True)
+                for entry in manifest["files"]:
+                    path = staging / entry["path"]
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(path, "wb") as f:
+                        for data in self.read_chunks(self.pieces(entry)):
+                            f.write(data)
+                    os.chmod(path, entry["mode"])
+                    # Keep mtimes so the next snapshot sees these files as unchanged
+                    os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # Swap in the restored tree, then drop the old one
+        old = target.with_name(f".{target.name}.replaced")
+        if target.exists():
+            os.replace(target, old)
+        os.replace(staging, target)
+        if old.exists():
+            shutil.rmtree(old)
+
+    def export(self, manifest_path, out_path):
+        """Write a snapshot as a .tar.gz for copying off the host"""
+        self.compressor.run(self.write_export, manifest_path, Path(out_path))
+
+    def write_export(self, manifest_path, out_path):
+        manifest = self.load(manifest_path)
+        prefix = manifest["server"]
+        tmp_path = out_path.with_name(f".{out_path.name}.tmp")
+        try:
+            with self.locked(exclusive=False), open(tmp_path, "wb") as f:
+                out = ParallelGzipFile(f, self.compressor)
+                with tarfile.open(fileobj=out, mode="w|") as tar:
+                    for rel in manifest["dirs"]:
+                        info = tarfile.TarInfo(f"{prefix}/{rel}")
+                        info.type, info.mode, info.mtime = tarfile.DIRTYPE, 0o755, time.time()
+                        tar.addfile(info)
+                    for entry in manifest["files"]:
+                        info = tarfile.TarInfo(f"{prefix}/{entry['path']}")
+                        info.size, info.mode = entry["size"], entry["mode"]
+                        info.mtime = entry["mtime_ns"] / 1e9
+                        tar.addfile(info, ChunkReader(self.read_chunks(self.pieces(entry))))
+                out.close()
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, out_path)
+
+    def delete(self, manifest_path):
+        Path(manifest_path).unlink()
+
+    def prune(self):
+        """Delete chunks no snapshot refers to; returns (chunks, bytes) freed"""
+        with self.locked(exclusive=True):
+            referenced, lists = set(), set()
+            for manifest_path in self.snapshots_dir.glob("*/*.json"):
+                for entry in self.load(manifest_path)["files"]:
+                    if "list" in entry:
+                        lists.add(entry["list"])
+                    else:
+                        referenced.update(digest for digest, _ in entry["chunks"])
+            # Unchanged files share piece lists, so each list is read once
+            for digest in lists:
+                referenced.add(digest)
+                referenced.update(piece for piece, _ in json.loads(self.get_chunk(digest)))
+
+            freed = [0, 0]
+            for path in self.chunks_dir.glob("*/*"):
+                if path.name not in referenced:
+                    freed[0] += 1
+                    freed[1] += path.stat().st_size
+                    path.unlink()
+        return tuple(freed)
+
+    def usage(self):
+        """Bytes the chunk store takes on disk"""
+        return sum(p.stat().st_size for p in self.chunks_dir.glob("*/*"))
+
+class ChunkReader:
+    """Read-only file object over a stream of chunk contents, for tarfile"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.current = b""
+        self.position = 0
+
+    def read(self, size=-1):
+        parts, wanted = [], size
+        while wanted != 0:
+            if self.position >= len(self.current):
+                self.current, self.position = next(self.chunks, None), 0
+                if self.current is None:
+                    self.current = b""
+                    break
+            end = len(self.current) if wanted < 0 else min(len(self.current), self.position + wanted)
+            parts.append(self.current[self.position:end])
+            if wanted > 0:
+                wanted -= end - self.position
+            self.position = end
+        return b"".join(parts)
+
+def format_stats(stats):
+    """One-line summary of a snapshot's stats"""
+    reused = f", {stats['reused_chunks']} region chunks reused" if stats.get("reused_chunks") else ""
+    return (f"{stats['files']} files ({stats['unchanged']} unchanged{reused}), "
+            f"{stats['size'] / 1024 / 1024:.1f} MB total, {stats['read'] / 1024 / 1024:.1f} MB read, "
+            f"{stats['stored'] / 1024 / 1024:.2f} MB new in {stats['new_chunks']} chunks, "
+            f"{stats['seconds']:.1f}s")
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("snapshot", "list", "restore", "export", "prune"):
+        print("Usage: backup_store.py snapshot <server> [--full] | list <server> | "
+              "restore <server> <timestamp> | export <server> <timestamp> <file.tar.gz> | prune")
+        sys.exit(1)
+
+    # --full reads every changed region file instead of trusting chunk timestamps
+    full = "--full" in sys.argv
+    if full:
+        sys.argv.remove("--full")
+    store = BackupStore(region_headers=not full)
+    if sys.argv[1] == "prune":
+        chunks, size = store.prune()
+        print(f"\033[32m[SUCCESS]\033[0m Freed {size / 1024 / 1024:.1f} MB in {chunks} chunks")
+        return
+
+    server_path = Path.home() / ".msm" / "servers" / sys.argv[2] if len(sys.argv) > 2 else None
+    if sys.argv[1] == "snapshot":
+        if server_path is None or not server_path.exists():
+            print("\033[31m[ERROR]\033[0m Server not found")
+            sys.exit(1)
+        manifest_path, stats = store.snapshot(server_path)
+        print(f"\033[32m[SUCCESS]\033[0m Snapshot {manifest_path.stem}: {format_stats(stats)}")
+    elif sys.argv[1] == "list":
+        for manifest_path in store.snapshots(sys.argv[2]):
+            print(f"  {manifest_path.stem}  {format_stats(store.load(manifest_path)['stats'])}")
+    else:
+        if len(sys.argv) < (5 if sys.argv[1] == "export" else 4):
+            print("Usage: backup_store.py restore <server> <timestamp> | "
+                  "export <server> <timestamp> <file.tar.gz>")
+            sys.exit(1)
+        manifest_path = store.snapshots_dir / sys.argv[2] / f"{sys.argv[3]}.json"
+        if not manifest_path.exists():
+            print("\033[31m[ERROR]\033[0m Snapshot not found")
+            sys.exit(1)
+        if sys.argv[1] == "export":
+            store.export(manifest_path, sys.argv[4])
+            print(f"\033[32m[SUCCESS]\033[0m Exported {sys.argv[2]} {sys.argv[3]} to {sys.argv[4]}")
+        else:
+            store.restore(manifest_path, server_path)
+            print(f"\033[32m[SUCCESS]\033[0m Restored {sys.argv[2]} to {sys.argv[3]}")
+
+if __name__ == "__main__":
+    main()
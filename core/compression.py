@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Compression
+Pluggable, multi-threaded block compression for backups
+"""
+
+import os
+import sys
+import zlib
+import gzip
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Payloads start with a codec byte so stored data can always be read back
+CODEC_RAW = b"r"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+CODECS = {"none": CODEC_RAW, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+
+# Keep the compressed form only when it saves at least this much
+MIN_SAVING = 0.97
+
+# Blocks per gzip member when writing archives
+GZIP_BLOCK = 1024 * 1024
+
+IONICE_CLASSES = {
+    "idle": getattr(psutil, "IOPRIO_CLASS_IDLE", None),
+    "best-effort": getattr(psutil, "IOPRIO_CLASS_BE", None)
+}
+
+_zstd_local = threading.local()
+
+def default_threads():
+    """Leave one core for the servers"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+def available(codec):
+    return codec != "zstd" or zstandard is not None
+
+def lower_priority(nice=10, ionice="idle"):
+    """Lower the calling thread's CPU and I/O priority.
+
+    On Linux both apply per thread. The workers that compress and read
+    backups call this, so the rest of the process keeps its priority.
+    """
+    tid = threading.get_native_id()
+    if nice:
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, min(19, os.getpriority(os.PRIO_PROCESS, tid) + nice))
+        except (AttributeError, OSError):
+            pass
+    io_class = IONICE_CLASSES.get(ionice)
+    if io_class is not None:
+        try:
+            psutil.Process(tid).ionice(io_class)
+        except (psutil.Error, OSError, ValueError):
+            pass
+
+def zstd_compressor(level):
+    # ZstdCompressor objects are not thread-safe; keep one per thread and level
+    compressors = _zstd_local.__dict__.setdefault("compressors", {})
+    if level not in compressors:
+        compressors[level] = zstandard.ZstdCompressor(level=level)
+    return compressors[level]
+
+def compress(data, codec="zlib", level=None):
+    """data as a codec-tagged payload; stored raw when compression does not pay"""
+    level = DEFAULT_LEVELS.get(codec) if level is None else level
+    if codec == "zstd":
+        packed = zstd_compressor(level).compress(data)
+    elif codec == "zlib":
+        packed = zlib.compress(data, level)
+    else:
+        return CODEC_RAW + data
+    if len(packed) < len(data) * MIN_SAVING:
+        return CODECS[codec] + packed
+    return CODEC_RAW + data
+
+def decompress(payload):
+    codec, body = payload[:1], payload[1:]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == CODEC_RAW:
+        return body
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("This backup uses zstd; install it with: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+def gzip_member(block, level=6):
+    # mtime=0 keeps the output reproducible
+    return gzip.compress(block, level, mtime=0)
+
+class Compressor:
+    """Codec settings plus a worker pool running at lowered priority.
+
+    zlib, zstandard and hashlib release the GIL while they work, so
+    threads use every core without pickling blocks to another process.
+    """
+
+    def __init__(self, codec="zlib", level=None, threads=None, nice=10, ionice="idle"):
+        if not available(codec):
+            print("\033[33m[WARN]\033[0m zstandard is not installed; using zlib (pip install zstandard)")
+            codec, level = "zlib", None
+        self.codec = codec
+        self.level = level
+        self.threads = threads or default_threads()
+        self.nice = nice
+        self.ionice = ionice
+        self.pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="compress",
+                                       initializer=lower_priority, initargs=(nice, ionice))
+        # Bounds the blocks held in memory while waiting for a worker
+        self.slots = threading.BoundedSemaphore(self.threads * 4)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Compressor configured from config.json values"""
+        return cls(
+            codec=settings.get("backup_compression", "zlib"),
+            level=settings.get("backup_compression_level"),
+            threads=settings.get("backup_threads") or None,
+            nice=settings.get("backup_nice", 10),
+            ionice=settings.get("backup_ionice", "idle")
+        )
+
+    def compress(self, data):
+        return compress(data, self.codec, self.level)
+
+    def submit(self, fn, *args):
+        """Run fn on the pool, blocking while too many blocks are queued"""
+        self.slots.acquire()
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Call fn in a separate thread at the workers' priority and return its result.
+
+        Walking and reading files happens there, so the caller's thread
+        keeps its priority. It must not run on the pool itself, as it
+        waits for the blocks it submits.
+        """
+        result = {}
+
+        def target():
+            lower_priority(self.nice, self.ionice)
+            try:
+                result["value"] = fn(*args)
+            except BaseException as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=target, name="backup")
+        thread.start()
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+class ParallelGzipFile:
+    """Write-only file object producing a gzip stream, compressed in parallel.
+
+    Each block becomes its own gzip member, as with pigz --independent.
+    Concatenated members are a valid gzip file for gzip, tar and Python.
+    """
+
+    def __init__(self, fileobj, compressor, level=6, block_size=GZIP_BLOCK):
+        self.fileobj = fileobj
+        self.compressor = compressor
+        self.level = level
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.pending = deque()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def submit(self, block):
+        self.pending.append(self.compressor.submit(gzip_member, block, self.level))
+        # Write finished members in order so memory stays bounded
+        while self.pending and (self.pending[0].done() or len(self.pending) > self.compressor.threads * 2):
+            self.fileobj.write(self.pending.popleft().result())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.buffer:
+            self.submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        while self.pending:
+            self.fileobj.write(self.pending.popleft().result())
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: compression.py <input> <output.gz> [threads]")
+        sys.exit(1)
+
+    compressor = Compressor(threads=int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    with open(sys.argv[1], "rb") as src, open(sys.argv[2], "wb") as dst:
+        out = ParallelGzipFile(dst, compressor)
+        while True:
+            data = src.read(GZIP_BLOCK)
+            if not data:
+                break
+            out.write(data)
+        out.close()
+    compressor.close()
+    print(f"\033[32m[SUCCESS]\033[0m Wrote {sys.argv[2]} using {compressor.threads} threads")
+
+if __name__ == "__main__":
+    main()
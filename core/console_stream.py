@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Console Stream
+Shared per-server console buffers for the web panel
+"""
+
+import json
+import time
+import threading
+import subprocess
+from collections import deque
+from pathlib import Path
+
+from log_tail import LogTail, ChangeWatcher
+from rcon import get_client, RconError
+from supervisor import SupervisorClient
+
+CONSOLE_BUFFER_LINES = 1000
+
+# Lines replayed to a browser when it opens the console
+BACKLOG_LINES = 200
+
+# Supervised output lives in the supervisor's memory; poll it this often
+SUPERVISOR_POLL = 0.25
+
+# A command's response is the output that follows it until the console
+# has been quiet for RESPONSE_QUIET or RESPONSE_TIMEOUT has passed
+RESPONSE_QUIET = 0.3
+RESPONSE_TIMEOUT = 2.0
+
+KEEPALIVE_INTERVAL = 15
+
+# Reader threads stop once nobody has been watching for this long
+IDLE_TIMEOUT = 30
+
+class ServerConsole:
+    """Ring buffer of one server's console, filled by a single reader thread.
+
+    Output comes from the supervisor when it owns the server, otherwise
+    from logs/latest.log. Each browser keeps its own cursor into the
+    ring, so a slow browser skips lines that fell out of the buffer
+    instead of holding up the reader or the server.
+    """
+
+    def __init__(self, name, server_path):
+        self.name = name
+        self.server_path = Path(server_path)
+        self.supervisor = SupervisorClient()
+        self.lines = deque(maxlen=CONSOLE_BUFFER_LINES)
+        self.seq = 0
+        self.changed = threading.Condition()
+        self.watchers = 0
+        self.last_watched = time.monotonic()
+        self.thread = None
+        # Set once the reader has loaded the backlog
+        self.seeded = threading.Event()
+
+    def append(self, lines):
+        if not lines:
+            return
+        with self.changed:
+            for line in lines:
+                self.seq += 1
+                self.lines.append((self.seq, line))
+            self.changed.notify_all()
+
+    def idle(self):
+        with self.changed:
+            if self.watchers:
+                self.last_watched = time.monotonic()
+                return False
+            if time.monotonic() - self.last_watched < IDLE_TIMEOUT:
+                return False
+            self.thread = None
+            return True
+
+    def supervised(self):
+        status = self.supervisor.status(self.name)
+        return bool(status and status.get("owner") == "supervisor")
+
+    def read_supervisor(self):
+        """Follow supervisor output; False once the supervisor does not know the server"""
+        cursor = None
+        while not self.idle():
+            reply = self.supervisor.request("output", name=self.name, since=cursor or 0)
+            if not reply or not reply.get("ok"):
+                return False
+            if cursor is None:
+                # Seed the ring with the supervisor's own backlog
+                lines = reply["lines"][-BACKLOG_LINES:]
+            else:
+                lines = reply["lines"]
+            self.append([line for _, line in lines])
+            self.seeded.set()
+            cursor = reply["seq"]
+            time.sleep(SUPERVISOR_POLL)
+        return True
+
+    def read_log(self):
+        log_file = self.server_path / "logs" / "latest.log"
+        tail = LogTail(log_file, from_end=False)
+        watcher = ChangeWatcher(log_file)
+        try:
+            lines = tail.read_lines()
+            self.append(lines[-BACKLOG_LINES:])
+            self.seeded.set()
+            while not self.idle():
+                watcher.wait(1.0)
+                self.append(tail.read_lines())
+                # A server started under the supervisor meanwhile
+                if self.supervised():
+                    return False
+        finally:
+            watcher.close()
+        return True
+
+    def run(self):
+        while True:
+            if self.supervised():
+                done = self.read_supervisor()
+            else:
+                done = self.read_log()
+            if done:
+                return
+
+    def ensure_reader(self):
+        with self.changed:
+            if self.thread is None:
+                # The reader reloads the backlog, so drop the stale copy;
+                # seq keeps counting up so cursors stay valid
+                self.lines.clear()
+                self.seeded.clear()
+                self.thread = threading.Thread(target=self.run, name=f"console-{self.name}", daemon=True)
+                self.thread.start()
+
+    def subscribe(self):
+        with self.changed:
+            self.watchers += 1
+            self.last_watched = time.monotonic()
+        self.ensure_reader()
+
+    def unsubscribe(self):
+        with self.changed:
+            self.watchers -= 1
+            self.last_watched = time.monotonic()
+
+    def since(self, seq, timeout=0):
+        """(lines, seq, skipped) after seq, waiting up to timeout for new output"""
+        with self.changed:
+            if timeout and self.seq <= seq:
+                self.changed.wait(timeout)
+            lines = [line for s, line in self.lines if s > seq]
+            oldest = self.lines[0][0] if self.lines else self.seq + 1
+            skipped = max(0, oldest - seq - 1)
+            return lines, self.seq, skipped
+
+    def backlog(self):
+        with self.changed:
+            return [line for _, line in self.lines][-BACKLOG_LINES:], self.seq
+
+    def write(self, command):
+        """Deliver a command to the server's console; (ok, error)"""
+        reply = self.supervisor.request("send", name=self.name, command=command)
+        if reply is not None and reply.get("ok"):
+            return True, None
+
+        try:
+            result = subprocess.run(
+                ["screen", "-S", f"msm-{self.name}", "-X", "stuff", command + "\n"],
+                capture_output=True
+            )
+        except FileNotFoundError:
+            return False, "Server is not running"
+        if result.returncode != 0:
+            return False, "Server is not running"
+        return True, None
+
+    def command(self, command):
+        """Send a command and capture its response.
+
+        RCON returns the exact response; otherwise the response is the
+        console output that follows the command.
+        """
+        client = get_client(self.server_path)
+        if client is not None:
+            try:
+                output = client.command(command)
+                # RCON replies bypass the console, so echo them into it
+                self.append([f"[RCON] {command}"] + output.splitlines())
+                return {"ok": True, "output": output.splitlines()}
+            except RconError:
+                pass
+
+        self.subscribe()
+        try:
+            # Otherwise the backlog would be captured as the response
+            self.seeded.wait(RESPONSE_TIMEOUT)
+            with self.changed:
+                seq = self.seq
+            ok, error = self.write(command)
+            if not ok:
+                return {"ok": False, "error": error}
+
+            # Output from other sources may interleave; this is best effort
+            output = []
+            deadline = time.monotonic() + RESPONSE_TIMEOUT
+            quiet_until = time.monotonic() + RESPONSE_TIMEOUT
+            while time.monotonic() < min(deadline, quiet_until):
+                lines, seq, _ = self.since(seq, timeout=min(deadline, quiet_until) - time.monotonic())
+                if lines:
+                    output.extend(lines)
+                    quiet_until = time.monotonic() + RESPONSE_QUIET
+            return {"ok": True, "output": output}
+        finally:
+            self.unsubscribe()
+
+    def stream(self):
+        """Server-Sent Events body: backlog, then new lines as they arrive"""
+        self.subscribe()
+        try:
+            lines, seq = self.backlog()
+            yield f"event: lines\ndata: {json.dumps({'lines': lines, 'seq': seq})}\n\n"
+            last_sent = time.monotonic()
+            while True:
+                lines, seq, skipped = self.since(seq, timeout=KEEPALIVE_INTERVAL)
+                if lines or skipped:
+                    data = {"lines": lines, "seq": seq, "skipped": skipped}
+                    yield f"event: lines\ndata: {json.dumps(data)}\n\n"
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            self.unsubscribe()
+
+class ConsoleHub:
+    """One ServerConsole per server, shared by every browser"""
+
+    def __init__(self, servers_dir):
+        self.servers_dir = Path(servers_dir)
+        self.lock = threading.Lock()
+        self.consoles = {}
+
+    def get(self, name):
+        with self.lock:
+            if name not in self.consoles:
+                self.consoles[name] = ServerConsole(name, self.servers_dir / name)
+            return self.consoles[name]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+CPU Sampler
+Background /proc/stat sampling so readers never block on CPU usage
+"""
+
+import time
+import threading
+
+import psutil
+
+PROC_STAT = "/proc/stat"
+SAMPLE_INTERVAL = 1.0
+
+def read_proc_stat():
+    """(busy, total) jiffies for the whole CPU followed by each core"""
+    counters = []
+    with open(PROC_STAT) as f:
+        for line in f:
+            if not line.startswith("cpu"):
+                break
+            values = [int(v) for v in line.split()[1:]]
+            # guest time is already counted in user/nice
+            total = sum(values[:8])
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            counters.append((total - idle, total))
+    return counters
+
+def utilisation(previous, current):
+    busy = current[0] - previous[0]
+    total = current[1] - previous[1]
+    if total <= 0:
+        return 0.0
+    return min(100.0, max(0.0, busy * 100.0 / total))
+
+class CpuSampler:
+    """Publishes overall and per-core CPU usage from a daemon thread"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self.previous = None
+        self.use_proc = True
+        self.current = {"overall": 0.0, "per_core": [], "cores": psutil.cpu_count() or 1, "updated": 0}
+
+    def sample(self):
+        """Take one reading and update the published snapshot"""
+        if self.use_proc:
+            try:
+                counters = read_proc_stat()
+            except (OSError, ValueError, IndexError):
+                # Android/Termux restricts /proc/stat
+                self.use_proc = False
+                counters = None
+        else:
+            counters = None
+
+        if counters:
+            # First reading has nothing to diff against: use the since-boot average
+            previous = self.previous or [(0, 0)] * len(counters)
+            if len(previous) != len(counters):
+                previous = [(0, 0)] * len(counters)
+            self.previous = counters
+            overall = utilisation(previous[0], counters[0])
+            per_core = [utilisation(p, c) for p, c in zip(previous[1:], counters[1:])]
+        else:
+            try:
+                # interval=None compares against the previous call and returns at once
+                overall = psutil.cpu_percent(None)
+                per_core = psutil.cpu_percent(None, percpu=True)
+            except (PermissionError, Exception):
+                overall = 0.0
+                per_core = [0.0, 0.0]
+
+        with self.lock:
+            self.current = {
+                "overall": overall,
+                "per_core": per_core,
+                "cores": len(per_core) or self.current["cores"],
+                "updated": time.time()
+            }
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception:
+                pass
+
+    def start(self):
+        """Take an initial reading and start the background thread (idempotent)"""
+        with self.lock:
+            if self.thread is not None:
+                return self
+            self.thread = threading.Thread(target=self.run, name="cpu-sampler", daemon=True)
+        self.sample()
+        self.thread.start()
+        return self
+
+    def snapshot(self):
+        """Latest {"overall", "per_core", "cores", "updated"} without blocking"""
+        with self.lock:
+            return dict(self.current, per_core=list(self.current["per_core"]))
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+def get_sampler():
+    """Process-wide sampler, started on first use"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = CpuSampler()
+        sampler = _sampler
+    return sampler.start()
+
+def cpu_snapshot():
+    return get_sampler().snapshot()
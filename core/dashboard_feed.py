@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Dashboard Feed
+One shared sampler pushing state changes to every connected browser
+"""
+
+import json
+import time
+import queue
+import threading
+
+STREAM_INTERVAL = 2
+KEEPALIVE_INTERVAL = 15
+
+# Events a slow client may fall behind by before it is resynced with a snapshot
+SUBSCRIBER_QUEUE = 32
+
+def merge_patch(old, new):
+    """JSON Merge Patch (RFC 7386) turning old into new; removed keys map to None"""
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested = merge_patch(old[key], value)
+            if nested:
+                patch[key] = nested
+        elif old[key] != value:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch
+
+class DashboardFeed:
+    """Samples the given sources while anyone is subscribed and fans out the diffs.
+
+    sources maps a section name to a callable returning a JSON-able dict.
+    Values must not be None, since None marks a deleted key in a patch.
+    """
+
+    def __init__(self, sources, interval=STREAM_INTERVAL):
+        self.sources = sources
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.state = None
+        self.thread = None
+
+    def collect(self, previous=None):
+        state = {}
+        for name, source in self.sources.items():
+            try:
+                state[name] = source()
+            except Exception:
+                # Keep the last good section rather than blanking the dashboard
+                state[name] = (previous or {}).get(name, {})
+        return state
+
+    def subscribe(self):
+        """Queue of (event, data) pairs, starting with a full snapshot"""
+        with self.lock:
+            state = self.state
+        if state is None:
+            state = self.collect()
+
+        events = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        with self.lock:
+            if self.state is None:
+                self.state = state
+            events.put(("snapshot", self.state))
+            self.subscribers.add(events)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="dashboard-feed", daemon=True)
+                self.thread.start()
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            self.subscribers.discard(events)
+
+    def publish(self, event, data, state):
+        for events in self.subscribers:
+            try:
+                events.put_nowait((event, data))
+            except queue.Full:
+                # Drop the backlog; a snapshot brings the client up to date
+                while True:
+                    try:
+                        events.get_nowait()
+                    except queue.Empty:
+                        break
+                events.put_nowait(("snapshot", state))
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.subscribers:
+                    # Nobody is watching: stop sampling until the next subscriber
+                    self.thread = None
+                    self.state = None
+                    return
+                previous = self.state
+
+            state = self.collect(previous)
+            patch = merge_patch(previous, state)
+            with self.lock:
+                self.state = state
+                if patch:
+                    self.publish("patch", patch, state)
+
+    def stream(self, events):
+        """Server-Sent Events body for one subscriber"""
+        try:
+            while True:
+                try:
+                    event, data = events.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(events)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Disk Usage
+Per-server world size accounting cached by directory mtime
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".msm" / "cache" / "disk_usage"
+
+# Region files grow in place without touching their directory's mtime,
+# so cached totals older than this are re-stat'ed in the background
+REFRESH_AGE = 300
+
+FILE_CLASSES = ("region", "entities", "poi", "playerdata")
+
+# Shared by every WorldUsage in the process: one scan lock and at most
+# one background refresh per cache file
+_locks = {}
+_refreshing = {}
+_state_lock = threading.Lock()
+
+def level_name(server_path):
+    """World folder name from server.properties"""
+    props_file = Path(server_path) / "server.properties"
+    if props_file.exists():
+        with open(props_file) as f:
+            for line in f:
+                if line.startswith("level-name="):
+                    return line.split("=", 1)[1].strip() or "world"
+    return "world"
+
+def dimension_of(parts):
+    """Dimension for a directory path relative to the server"""
+    if "DIM-1" in parts:
+        return "nether"
+    if "DIM1" in parts:
+        return "end"
+    if "dimensions" in parts:
+        i = parts.index("dimensions")
+        if len(parts) > i + 2:
+            return f"{parts[i + 1]}:{parts[i + 2]}"
+    return "overworld"
+
+class WorldUsage:
+    """Disk usage of one server's worlds, broken down by dimension and file class"""
+
+    def __init__(self, server_path):
+        self.server_path = Path(server_path)
+        self.cache_file = CACHE_DIR / f"{self.server_path.name}.json"
+        with _state_lock:
+            self.lock = _locks.setdefault(self.cache_file, threading.Lock())
+
+    def world_roots(self):
+        level = level_name(self.server_path)
+        # Vanilla keeps all dimensions under the level folder,
+        # Bukkit-based servers split nether and end into their own folders
+        return [level, f"{level}_nether", f"{level}_the_end"]
+
+    def load(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, cache):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=CACHE_DIR, prefix=f".{self.cache_file.name}.",
+                                         suffix=".tmp", delete=False) as f:
+            json.dump(cache, f)
+        os.replace(f.name, self.cache_file)
+
+    def scan(self, max_age=REFRESH_AGE):
+        """Rescan directories whose mtime changed or whose totals are older than max_age"""
+        with self.lock:
+            old = (self.load() or {}).get("dirs", {})
+            dirs = {}
+            now = time.time()
+            stack = [root for root in self.world_roots() if (self.server_path / root).is_dir()]
+
+            while stack:
+                rel = stack.pop()
+                path = self.server_path / rel
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+
+                # An unchanged mtime means the same entries; only sizes may have grown
+                cached = old.get(rel)
+                if cached and cached["mtime"] == mtime and now - cached["scanned"] < max_age:
+                    dirs[rel] = cached
+                    stack.extend(cached["subdirs"])
+                    continue
+
+                size = 0
+                subdirs = []
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(f"{rel}/{entry.name}")
+                            elif entry.is_file(follow_symlinks=False):
+                                size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+
+                dirs[rel] = {"mtime": mtime, "bytes": size, "subdirs": subdirs, "scanned": now}
+                stack.extend(subdirs)
+
+            cache = {"dirs": dirs, "updated": now}
+            self.save(cache)
+            return cache
+
+    def refresh_async(self):
+        """Refresh stale entries on a background thread, unless one is already running"""
+        with _state_lock:
+            thread = _refreshing.get(self.cache_file)
+            if thread is not None and thread.is_alive():
+                return thread
+            thread = threading.Thread(target=self.scan, daemon=True)
+            _refreshing[self.cache_file] = thread
+            thread.start()
+        return thread
+
+    def usage(self, background=True):
+        """Current usage totals; served from cache with a background refresh"""
+        cache = self.load()
+        if cache is None or not background:
+            cache = self.scan()
+        else:
+            self.refresh_async()
+        return self.summarize(cache)
+
+    def summarize(self, cache):
+        total = 0
+        dimensions = {}
+        classes = {name: 0 for name in FILE_CLASSES}
+        classes["other"] = 0
+
+        for rel, entry in cache["dirs"].items():
+            size = entry["bytes"]
+            if not size:
+                continue
+            parts = rel.split("/")
+            total += size
+            dimension = dimension_of(parts)
+            dimensions[dimension] = dimensions.get(dimension, 0) + size
+            file_class = parts[-1] if parts[-1] in FILE_CLASSES else "other"
+            classes[file_class] += size
+
+        return {
+            "total": total,
+            "dimensions": dimensions,
+            "classes": classes,
+            "updated": cache["updated"]
+        }
+
+def format_usage(usage):
+    """One-line breakdown, sizes in MB"""
+    mb = lambda n: f"{n / 1024 / 1024:.1f}MB"
+    dims = ", ".join(f"{name} {mb(size)}" for name, size in sorted(usage["dimensions"].items()))
+    classes = ", ".join(f"{name} {mb(size)}" for name, size in usage["classes"].items() if size)
+    return f"{mb(usage['total'])} ({dims}) | {classes}"
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: disk_usage.py <server_name>")
+        sys.exit(1)
+
+    server_path = Path.home() / ".msm" / "servers" / sys.argv[1]
+    if not server_path.exists():
+        print(f"\033[31m[ERROR]\033[0m Server '{sys.argv[1]}' not found")
+        sys.exit(1)
+
+    usage = WorldUsage(server_path).usage(background=False)
+    print(f"  \033[1mWorld size:\033[0m {format_usage(usage)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+GC Analyzer
+Reads unified JVM GC logs and recommends heap and collector settings
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import statistics
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+
+GC_LOG = Path("logs") / "gc.log"
+HISTORY_FILE = "msm_gc.json"
+
+# -Xlog output the analyzer understands; start.sh rotates it on every launch
+XLOG_OPTION = "-Xlog:gc*:file=logs/gc.log:time,uptime,level,tags:filecount=5,filesize=20m"
+
+# Fewer collections than this are not enough to recommend anything
+MIN_CYCLES = 20
+
+# A pause longer than a tick (50ms) is a visible stall
+TICK_BUDGET_MS = 50
+
+# Heap sizing: keep the live set between these fractions of the heap
+HEAP_HIGH_OCCUPANCY = 70
+HEAP_LOW_OCCUPANCY = 30
+HEAP_TARGET_OCCUPANCY = 0.5
+HEAP_STEP_MB = 512
+MIN_HEAP_MB = 2048
+
+MAX_REGION_MB = 32
+
+# Flags that only apply to G1, dropped when switching collector
+G1_ONLY_FLAGS = ("UseG1GC", "MaxGCPauseMillis", "InitiatingHeapOccupancyPercent",
+                 "SurvivorRatio", "MaxTenuringThreshold")
+
+LINE_PATTERN = re.compile(r"^((?:\[[^\]]*\])+)\s*(.*)$")
+TIME_PATTERN = re.compile(r"\[(\d{4}-\d\d-\d\dT[\d:.]+[+-]\d{4})\]")
+UPTIME_PATTERN = re.compile(r"\[([\d.]+)s\]")
+GC_ID_PATTERN = re.compile(r"^GC\((\d+)\) (.*)$")
+
+# G1: "Pause Young (Normal) (G1 Evacuation Pause) 612M->145M(2048M) 8.123ms"
+# ZGC/Shenandoah phases: "Pause Mark Start 0.012ms", "Y: Pause Mark End 0.02ms"
+PAUSE_PATTERN = re.compile(r"^(?:[YyO]: )?Pause (.*?) ([\d.]+)ms$")
+
+# ZGC cycle: "Major Collection (Allocation Rate) 1024M(50%)->256M(12%) 0.456s"
+CYCLE_PATTERN = re.compile(r"^(?:Minor |Major )?(?:Garbage )?Collection \((.*?)\)")
+
+HEAP_PATTERN = re.compile(
+    r"(\d+)([KMG])(?:\((\d+)%\))?->(\d+)([KMG])(?:\((\d+)%\))?(?:\((\d+)([KMG])\))?")
+REGIONS_PATTERN = re.compile(r"^(Old|Humongous) regions: (\d+)->(\d+)")
+
+VERSION_PATTERN = re.compile(r"^Version: (\d+)")
+USING_PATTERN = re.compile(r"^Using (.+)$")
+REGION_SIZE_PATTERN = re.compile(r"^Heap Region Size: (\d+)([KMG])")
+MAX_CAPACITY_PATTERN = re.compile(r"^Heap Max Capacity: (\d+)([KMG])")
+
+UNIT_MB = {"K": 1 / 1024, "M": 1, "G": 1024}
+
+def to_mb(value, unit):
+    return int(value) * UNIT_MB[unit]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
+
+def parse_log(lines):
+    """Collections and JVM facts from unified GC log lines"""
+    info = {"collector": None, "java_version": None, "region_mb": None, "heap_max_mb": None,
+            "started": None}
+    cycles = {}
+
+    for line in lines:
+        match = LINE_PATTERN.match(line.rstrip())
+        if not match:
+            continue
+        decorations, message = match.groups()
+        if info["started"] is None:
+            stamp = TIME_PATTERN.search(decorations)
+            if stamp:
+                info["started"] = datetime.strptime(stamp.group(1), "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+
+        gc_match = GC_ID_PATTERN.match(message)
+        if not gc_match:
+            for pattern, key in ((VERSION_PATTERN, "java_version"), (USING_PATTERN, "collector")):
+                found = pattern.match(message)
+                if found:
+                    info[key] = int(found.group(1)) if key == "java_version" else found.group(1)
+            for pattern, key in ((REGION_SIZE_PATTERN, "region_mb"), (MAX_CAPACITY_PATTERN, "heap_max_mb")):
+                found = pattern.match(message)
+                if found:
+                    info[key] = to_mb(*found.groups())
+            continue
+
+        uptime = UPTIME_PATTERN.search(decorations)
+        gc_id, event = int(gc_match.group(1)), gc_match.group(2)
+        cycle = cycles.setdefault(gc_id, {"id": gc_id, "pauses": [], "kind": None})
+        if uptime and "uptime" not in cycle:
+            cycle["uptime"] = float(uptime.group(1))
+
+        pause = PAUSE_PATTERN.match(event)
+        cycle_match = CYCLE_PATTERN.match(event)
+        regions = REGIONS_PATTERN.match(event)
+        if pause:
+            cycle["pauses"].append(float(pause.group(2)))
+            if cycle["kind"] is None or pause.group(1).startswith(("Full", "Young", "Remark")):
+                cycle["kind"] = pause.group(1)
+        elif cycle_match:
+            cycle["kind"] = event[:cycle_match.end()]
+        elif regions:
+            cycle[f"{regions.group(1).lower()}_before"] = int(regions.group(2))
+            cycle[f"{regions.group(1).lower()}_after"] = int(regions.group(3))
+            continue
+        else:
+            continue
+
+        heap = HEAP_PATTERN.search(event)
+        if heap and "heap_after" not in cycle:
+            before, before_unit, before_pct, after, after_unit, _, capacity, capacity_unit = heap.groups()
+            cycle["heap_before"] = to_mb(before, before_unit)
+            cycle["heap_after"] = to_mb(after, after_unit)
+            if capacity:
+                cycle["capacity"] = to_mb(capacity, capacity_unit)
+            elif before_pct and int(before_pct):
+                cycle["capacity"] = cycle["heap_before"] * 100 / int(before_pct)
+
+    return info, [cycles[gc_id] for gc_id in sorted(cycles) if "uptime" in cycles[gc_id]]
+
+def analyze(lines):
+    """Pause, allocation and occupancy statistics for one GC log, or None when empty"""
+    info, cycles = parse_log(lines)
+    pauses = [p for c in cycles for p in c["pauses"]]
+    if not cycles or not pauses:
+        return None
+
+    span = max(cycles[-1]["uptime"] - cycles[0]["uptime"], 1)
+    sized = [c for c in cycles if "heap_after" in c]
+
+    # Allocated between collections = heap before this GC - heap after the previous one
+    allocated = sum(max(0, cur["heap_before"] - prev["heap_after"]) for prev, cur in zip(sized, sized[1:]))
+    sized_span = sized[-1]["uptime"] - sized[0]["uptime"] if len(sized) > 1 else 0
+
+    promotion_rate = None
+    young = [c for c in cycles if (c["kind"] or "").startswith("Young") and "old_after" in c]
+    if young and info["region_mb"]:
+        promoted = sum(max(0, c["old_after"] - c["old_before"]) for c in young) * info["region_mb"]
+        promotion_rate = promoted / span
+
+    occupancy = [c["heap_after"] * 100 / c["capacity"] for c in sized if c.get("capacity")]
+    # After a full, mixed or major collection the heap holds little besides live data
+    thorough = [c["heap_after"] for c in sized
+                if any(k in (c["kind"] or "") for k in ("Full", "Mixed", "Remark", "Major", "Garbage"))]
+    after = thorough or [c["heap_after"] for c in sized]
+
+    return {
+        "collector": info["collector"],
+        "java_version": info["java_version"],
+        "region_mb": info["region_mb"],
+        "heap_max_mb": info["heap_max_mb"] or max((c.get("capacity", 0) for c in cycles), default=0) or None,
+        "started": info["started"],
+        "cycles": len(cycles),
+        "span": span,
+        "pause_count": len(pauses),
+        "pause_p50": percentile(pauses, 50),
+        "pause_p95": percentile(pauses, 95),
+        "pause_p99": percentile(pauses, 99),
+        "pause_max": max(pauses),
+        "gc_overhead": sum(pauses) / 1000 / span * 100,
+        "allocation_rate": allocated / sized_span if sized_span else None,
+        "promotion_rate": promotion_rate,
+        "occupancy_avg": statistics.mean(occupancy) if occupancy else None,
+        "occupancy_p90": percentile(occupancy, 90) if occupancy else None,
+        "live_set_mb": statistics.median(after) if after else None,
+        "full_gcs": sum(1 for c in cycles if (c["kind"] or "").startswith("Full")),
+        "humongous": sum(1 for c in cycles if "Humongous" in (c["kind"] or "") or c.get("humongous_before"))
+    }
+
+def flag_name(flag):
+    """"-XX:+UseG1GC" -> "UseG1GC", "-XX:MaxGCPauseMillis=200" -> "MaxGCPauseMillis" """
+    name = flag[4:] if flag.startswith("-XX:") else flag
+    return name.lstrip("+-").split("=", 1)[0]
+
+def flag_value(flags, name):
+    for flag in flags:
+        if flag_name(flag) == name:
+            return flag.split("=", 1)[1] if "=" in flag else flag
+    return None
+
+def change_flags(flags, set_flags=(), remove=()):
+    """flags with set_flags replacing same-named ones and names (or G1* prefixes) removed"""
+    replaced = {flag_name(f): f for f in set_flags}
+
+    def dropped(name):
+        return name in remove or (name.startswith("G1") and "G1*" in remove)
+
+    result = []
+    for flag in flags:
+        name = flag_name(flag)
+        if name in replaced:
+            result.append(replaced.pop(name))
+        elif not dropped(name):
+            result.append(flag)
+    return result + list(replaced.values())
+
+def region_mb(flags, analysis):
+    value = flag_value(flags, "G1HeapRegionSize")
+    if value and value[:-1].isdigit():
+        return to_mb(value[:-1], value[-1].upper())
+    return analysis["region_mb"]
+
+def recommend(analysis, flags, ram):
+    """Concrete changes for the measured behaviour; each has title, reason, flags and ram"""
+    recommendations = []
+    collector = analysis["collector"] or ("G1" if flag_value(flags, "UseG1GC") else "")
+
+    live = analysis["live_set_mb"]
+    occupancy = analysis["occupancy_p90"]
+    host_mb = psutil.virtual_memory().total / 1024 / 1024
+    if live and (analysis["full_gcs"] or (occupancy and occupancy > HEAP_HIGH_OCCUPANCY)):
+        target = math.ceil(live / HEAP_TARGET_OCCUPANCY / HEAP_STEP_MB) * HEAP_STEP_MB
+        target = min(target, int(host_mb * 0.75) // HEAP_STEP_MB * HEAP_STEP_MB)
+        if target > ram:
+            recommendations.append({
+                "title": f"Increase heap to {target}MB",
+                "reason": (f"{analysis['full_gcs']} full GCs; heap is {occupancy or 0:.0f}% full after GC "
+                           f"with ~{live:.0f}MB live data"),
+                "flags": flags,
+                "ram": target
+            })
+    elif live and occupancy and occupancy < HEAP_LOW_OCCUPANCY and ram > MIN_HEAP_MB:
+        target = max(MIN_HEAP_MB, math.ceil(live / HEAP_TARGET_OCCUPANCY / HEAP_STEP_MB) * HEAP_STEP_MB)
+        if target < ram:
+            recommendations.append({
+                "title": f"Reduce heap to {target}MB",
+                "reason": f"heap is only {occupancy:.0f}% full after GC; the memory can go to other servers",
+                "flags": flags,
+                "ram": target
+            })
+
+    if collector.startswith("G1"):
+        region = region_mb(flags, analysis)
+        if analysis["humongous"] and region and region < MAX_REGION_MB:
+            # Objects of half a region or more are humongous; bigger regions avoid them
+            recommendations.append({
+                "title": f"Raise G1HeapRegionSize to {int(region * 2)}M",
+                "reason": f"{analysis['humongous']} collections involved humongous allocations",
+                "flags": change_flags(flags, [f"-XX:G1HeapRegionSize={int(region * 2)}M"]),
+                "ram": ram
+            })
+
+        target_pause = flag_value(flags, "MaxGCPauseMillis")
+        if analysis["pause_p99"] > TICK_BUDGET_MS and target_pause and int(target_pause) > TICK_BUDGET_MS:
+            recommendations.append({
+                "title": f"Lower MaxGCPauseMillis to {TICK_BUDGET_MS}",
+                "reason": (f"p99 pause is {analysis['pause_p99']:.0f}ms, longer than a "
+                           f"{TICK_BUDGET_MS}ms tick; the target is {target_pause}ms"),
+                "flags": change_flags(flags, [f"-XX:MaxGCPauseMillis={TICK_BUDGET_MS}"]),
+                "ram": ram
+            })
+
+        if (analysis["java_version"] or 0) >= 21 and (
+                analysis["pause_p99"] > TICK_BUDGET_MS or ram >= 8192):
+            # Generational ZGC keeps pauses under a millisecond at any heap size
+            recommendations.append({
+                "title": "Switch to Generational ZGC",
+                "reason": (f"Java {analysis['java_version']} with p99 pause {analysis['pause_p99']:.0f}ms "
+                           f"and a {ram}MB heap"),
+                "flags": change_flags(flags, ["-XX:+UseZGC", "-XX:+ZGenerational"],
+                                      remove=G1_ONLY_FLAGS + ("G1*",)),
+                "ram": ram
+            })
+
+    return recommendations
+
+class GCAnalyzer:
+    """GC log analysis and applied-change history for one server"""
+
+    def __init__(self, server_path):
+        self.server_path = Path(server_path)
+        self.log_file = self.server_path / GC_LOG
+        self.history_file = self.server_path / HISTORY_FILE
+
+    def analyze(self):
+        """Statistics for the current run (gc.log is rotated on start), or None"""
+        if not self.log_file.exists():
+            return None
+        with open(self.log_file, errors="replace") as f:
+            return analyze(f)
+
+    def flags(self):
+        flags_file = self.server_path / "jvm_flags.txt"
+        return flags_file.read_text().split() if flags_file.exists() else []
+
+    def history(self):
+        try:
+            with open(self.history_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def record_change(self, recommendation, analysis, ram):
+        """Remember the measurements a change was made against for a later comparison"""
+        entry = {
+            "t": time.time(),
+            "title": recommendation["title"],
+            "before": analysis,
+            "flags_before": self.flags(),
+            "flags_after": recommendation["flags"],
+            "ram_before": ram,
+            "ram_after": recommendation["ram"]
+        }
+        with open(self.history_file, "w") as f:
+            json.dump((self.history() + [entry])[-20:], f, indent=2)
+
+    def comparison(self):
+        """(last change, current analysis) once the server has run with it, else None"""
+        history = self.history()
+        analysis = self.analyze()
+        if not history or analysis is None:
+            return None
+        change = history[-1]
+        if analysis["started"] and analysis["started"] < change["t"]:
+            return None
+        return change, analysis
+
+METRICS = (
+    ("pause_p50", "Pause p50", "ms"),
+    ("pause_p95", "Pause p95", "ms"),
+    ("pause_p99", "Pause p99", "ms"),
+    ("pause_max", "Pause max", "ms"),
+    ("gc_overhead", "Time in GC", "%"),
+    ("allocation_rate", "Allocation rate", "MB/s"),
+    ("promotion_rate", "Promotion rate", "MB/s"),
+    ("occupancy_avg", "Heap after GC", "%"),
+    ("live_set_mb", "Live set", "MB"),
+    ("full_gcs", "Full GCs", "")
+)
+
+def format_value(value, unit):
+    if value is None:
+        return "-"
+    return f"{value}{unit}" if isinstance(value, int) else f"{value:.1f}{unit}"
+
+def format_analysis(analysis):
+    """Lines describing a GC analysis for terminal views"""
+    if analysis is None:
+        return ["No GC log yet; restart the server with GC logging enabled"]
+    lines = [f"{analysis['collector'] or 'Unknown collector'}, Java {analysis['java_version'] or '?'}: "
+             f"{analysis['cycles']} collections over {analysis['span'] / 60:.0f} min"]
+    for key, label, unit in METRICS:
+        lines.append(f"  {label:<16} {format_value(analysis[key], unit)}")
+    return lines
+
+def format_comparison(change, after):
+    """Before/after table for an applied change"""
+    before = change["before"]
+    lines = [f"{change['title']} (applied {time.strftime('%Y-%m-%d %H:%M', time.localtime(change['t']))})",
+             f"  {'':<16} {'Before':>10} {'After':>10} {'Change':>8}"]
+    for key, label, unit in METRICS:
+        old, new = before.get(key), after.get(key)
+        delta = f"{(new - old) / old * 100:+.0f}%" if old and new is not None else ""
+        lines.append(f"  {label:<16} {format_value(old, unit):>10} {format_value(new, unit):>10} {delta:>8}")
+    return lines
+
+def format_recommendation(recommendation, flags, ram):
+    """Title, reason and the settings it changes"""
+    lines = [recommendation["title"], f"  Why: {recommendation['reason']}"]
+    if recommendation["ram"] != ram:
+        lines.append(f"  Heap: {ram}MB -> {recommendation['ram']}MB")
+    removed = [f for f in flags if f not in recommendation["flags"]]
+    added = [f for f in recommendation["flags"] if f not in flags]
+    lines += [f"  - {f}" for f in removed] + [f"  + {f}" for f in added]
+    return lines
+
+def gc_log_setup(config):
+    """start.sh lines that fill GC_LOG with the -Xlog option when enabled"""
+    if not config.get("gc_logging"):
+        return "GC_LOG=()\n"
+    return f"""# Unified GC logging for the GC analyzer (Java 9+ only)
+GC_LOG=()
+if java -Xlog:disable -version >/dev/null 2>&1; then
+    mkdir -p logs
+    GC_LOG=("{XLOG_OPTION}")
+fi
+"""
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("report", "compare"):
+        print("Usage: gc_analyzer.py report|compare <server_name>")
+        sys.exit(1)
+
+    server_path = Path.home() / ".msm" / "servers" / sys.argv[2]
+    config_file = server_path / "msm_config.json"
+    if not config_file.exists():
+        print(f"\033[31m[ERROR]\033[0m Server '{sys.argv[2]}' not found")
+        sys.exit(1)
+    with open(config_file) as f:
+        config = json.load(f)
+
+    analyzer = GCAnalyzer(server_path)
+    if sys.argv[1] == "compare":
+        result = analyzer.comparison()
+        if result is None:
+            print("\033[36m[INFO]\033[0m No applied change with measurements from after a restart")
+            return
+        for line in format_comparison(*result):
+            print(line)
+        return
+
+    analysis = analyzer.analyze()
+    for line in format_analysis(analysis):
+        print(line)
+    if analysis and analysis["cycles"] >= MIN_CYCLES:
+        for recommendation in recommend(analysis, analyzer.flags(), config["ram"]):
+            print()
+            for line in format_recommendation(recommendation, analyzer.flags(), config["ram"]):
+                print(line)
+
+if __name__ == "__main__":
+    main()
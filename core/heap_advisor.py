@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Heap Advisor
+Sizes server heaps from measured live sets and the memory the host really has
+"""
+
+import re
+import sys
+import math
+import subprocess
+from pathlib import Path
+
+import psutil
+
+from gc_analyzer import GCAnalyzer, HEAP_TARGET_OCCUPANCY, HEAP_HIGH_OCCUPANCY, HEAP_STEP_MB
+from process_discovery import ProcessDiscovery
+from server_registry import ServerRegistry
+
+# Metaspace, code cache, thread stacks and direct buffers on top of -Xmx
+JVM_OVERHEAD_MB = 384
+JVM_OVERHEAD_RATIO = 0.2
+
+# Left for Android/the OS and everything else on the box
+OS_RESERVE_MB = 1024
+OS_RESERVE_RATIO = 0.15
+
+# Bedrock has no heap; budget its measured RSS or this when stopped
+BEDROCK_RESERVE_MB = 1024
+
+MIN_HEAP_MB = 1024
+MAX_DEFAULT_HEAP_MB = 4096
+FALLBACK_HEAP_MB = 2048
+
+JCMD_TIMEOUT = 5
+
+# "garbage-first heap   total 2097152K, used 1234567K [0x..."
+HEAP_INFO_PATTERN = re.compile(r"heap\s+total (\d+)K, used (\d+)K")
+
+def round_up(mb):
+    return int(math.ceil(mb / HEAP_STEP_MB) * HEAP_STEP_MB)
+
+def round_down(mb):
+    return int(mb // HEAP_STEP_MB * HEAP_STEP_MB)
+
+def footprint(heap_mb):
+    """Resident memory a JVM with this -Xmx ends up using"""
+    return heap_mb + max(JVM_OVERHEAD_MB, heap_mb * JVM_OVERHEAD_RATIO)
+
+def host_budget():
+    """(total MB, MB usable by servers) for this host"""
+    total = psutil.virtual_memory().total / 1024 / 1024
+    return total, total - max(OS_RESERVE_MB, total * OS_RESERVE_RATIO)
+
+def jcmd_heap_used(pid):
+    """Heap in use (MB) reported by jcmd GC.heap_info, or None"""
+    try:
+        result = subprocess.run(["jcmd", str(pid), "GC.heap_info"], capture_output=True,
+                                text=True, timeout=JCMD_TIMEOUT)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    match = HEAP_INFO_PATTERN.search(result.stdout)
+    return int(match.group(2)) / 1024 if match else None
+
+class HeapAdvisor:
+    """Proposes -Xmx for every server so that all of them fit in host memory.
+
+    Each heap should hold its live set at HEAP_TARGET_OCCUPANCY. A live
+    set filling more than HEAP_HIGH_OCCUPANCY of the heap means GC
+    thrash. When the wanted heaps do not fit, every heap shrinks
+    towards that floor, in proportion to what it can spare.
+    """
+
+    def __init__(self, servers_dir=None):
+        self.servers_dir = Path(servers_dir) if servers_dir else Path.home() / ".msm" / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
+        self.discovery = ProcessDiscovery(self.servers_dir)
+
+    def measure(self, name, config, proc):
+        """(live set MB, source) for one server, or (None, None) when unmeasured"""
+        analysis = GCAnalyzer(self.servers_dir / name).analyze()
+        if analysis and analysis["live_set_mb"]:
+            return analysis["live_set_mb"], "GC log"
+        if proc is not None:
+            # Heap in use includes garbage, so this overstates the live set
+            used = jcmd_heap_used(proc.pid)
+            if used:
+                return used, "jcmd"
+        return None, None
+
+    def servers(self):
+        """Per-server measurements and wanted heap"""
+        configs = self.registry.all()
+        processes = self.discovery.refresh(list(configs))
+        servers = []
+        for name, config in configs.items():
+            proc = processes.get(name)
+            entry = {"name": name, "type": config.get("type"), "ram": config.get("ram", 0),
+                     "running": proc is not None, "rss": None}
+            if proc is not None:
+                try:
+                    entry["rss"] = proc.memory_info().rss / 1024 / 1024
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+
+            if config.get("type") == "Bedrock":
+                entry.update(live=None, source=None, fixed=entry["rss"] or BEDROCK_RESERVE_MB)
+            else:
+                live, source = self.measure(name, config, proc)
+                entry.update(live=live, source=source)
+                if live:
+                    entry["floor"] = max(MIN_HEAP_MB, round_up(live * 100 / HEAP_HIGH_OCCUPANCY))
+                    entry["want"] = max(entry["floor"], round_up(live / HEAP_TARGET_OCCUPANCY))
+                else:
+                    # Nothing measured yet: keep what it has
+                    entry["floor"] = entry["want"] = entry["ram"] or FALLBACK_HEAP_MB
+            servers.append(entry)
+        return servers
+
+    def plan(self):
+        """Proposed heaps and overcommit findings for all servers"""
+        total, usable = host_budget()
+        servers = self.servers()
+        java = [s for s in servers if "fixed" not in s]
+        fixed = sum(s["fixed"] for s in servers if "fixed" in s)
+
+        # footprint(heap) <= heap * (1 + ratio) + overhead, so this total always fits
+        heap_budget = max(0, (usable - fixed - len(java) * JVM_OVERHEAD_MB) / (1 + JVM_OVERHEAD_RATIO))
+        wanted = sum(s["want"] for s in java)
+        floors = sum(s["floor"] for s in java)
+        if wanted <= heap_budget or wanted == floors:
+            for s in java:
+                s["proposed"] = s["want"]
+        else:
+            # Shrink each heap between its floor and what it wants
+            share = max(0, heap_budget - floors) / (wanted - floors)
+            for s in java:
+                s["proposed"] = max(s["floor"], round_down(s["floor"] + (s["want"] - s["floor"]) * share))
+
+        configured = sum(footprint(s["ram"]) for s in java) + fixed
+        running = sum(footprint(s["ram"]) for s in java if s["running"]) + sum(
+            s["fixed"] for s in servers if "fixed" in s and s["running"])
+        proposed = sum(footprint(s["proposed"]) for s in java) + fixed
+        return {
+            "total": total,
+            "usable": usable,
+            "available": psutil.virtual_memory().available / 1024 / 1024,
+            "swap_used": psutil.swap_memory().used / 1024 / 1024,
+            "servers": servers,
+            "configured": configured,
+            "running": running,
+            "proposed": proposed,
+            "overcommitted": configured > usable,
+            "fits": proposed <= usable
+        }
+
+    def default_heap(self):
+        """Heap for a new server: what is left after the existing ones, within limits"""
+        plan = self.plan()
+        left = plan["usable"] - plan["proposed"]
+        heap = round_down((left - JVM_OVERHEAD_MB) / (1 + JVM_OVERHEAD_RATIO))
+        return min(MAX_DEFAULT_HEAP_MB, max(MIN_HEAP_MB, heap))
+
+    def advice(self, name):
+        """Planned entry for one server, or None"""
+        for server in self.plan()["servers"]:
+            if server["name"] == name:
+                return server
+        return None
+
+def format_plan(plan):
+    """Lines describing a heap plan for terminal views"""
+    lines = [f"Host RAM: {plan['total']:.0f}MB, {plan['usable']:.0f}MB usable by servers, "
+             f"{plan['available']:.0f}MB free now"]
+    if plan["swap_used"] > 0:
+        lines.append(f"\033[33mSwap in use: {plan['swap_used']:.0f}MB\033[0m")
+    lines.append("")
+    lines.append(f"  {'Server':<20} {'Live set':>12} {'-Xmx':>8} {'Proposed':>9}")
+    for s in plan["servers"]:
+        if "fixed" in s:
+            lines.append(f"  {s['name']:<20} {'(Bedrock)':>12} {'-':>8} {s['fixed']:>7.0f}MB")
+            continue
+        live = f"{s['live']:.0f}MB" if s["live"] else "unmeasured"
+        marker = "" if s["proposed"] == s["ram"] else " *"
+        lines.append(f"  {s['name']:<20} {live:>12} {s['ram']:>6}MB {s['proposed']:>7}MB{marker}")
+    lines.append("")
+    lines.append(f"Memory for running servers: {plan['running']:.0f}MB")
+    lines.append(f"Memory if every server runs: {plan['configured']:.0f}MB now, "
+                 f"{plan['proposed']:.0f}MB with proposed heaps (* = changed)")
+    if plan["overcommitted"]:
+        lines.append(f"\033[33m[WARN]\033[0m Heaps are overcommitted by "
+                     f"{plan['configured'] - plan['usable']:.0f}MB; running them all will swap")
+    if not plan["fits"]:
+        lines.append("\033[33m[WARN]\033[0m Even minimum heaps do not fit; run fewer servers at once")
+    return lines
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("report", "suggest"):
+        print("Usage: heap_advisor.py report | suggest")
+        sys.exit(1)
+
+    advisor = HeapAdvisor()
+    if sys.argv[1] == "suggest":
+        print(advisor.default_heap())
+        return
+    for line in format_plan(advisor.plan()):
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Hot Backup
+Consistent snapshots of running servers, with world saving paused only for a reflink copy
+"""
+
+import os
+import re
+import sys
+import stat
+import time
+import errno
+import fcntl
+import shutil
+from pathlib import Path
+
+from backup_store import BackupStore, format_stats, unchanged
+from log_tail import LogTail
+from server_manager import ServerManager
+from server_registry import ServerRegistry
+
+# ioctl(2) that shares a file's extents with another (Btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+# Errors meaning the filesystem cannot clone
+NO_REFLINK_ERRORS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EBADF)
+
+# Vanilla and Paper log "Saved the game"; older versions "Saved the world"
+SAVED_PATTERN = re.compile(r"Saved the (?:game|world)")
+
+SAVE_TIMEOUT = 60
+
+# Types without a Java world to flush
+NO_FREEZE_TYPES = ("Bedrock", "BungeeCord", "Velocity")
+
+class ReflinkUnsupported(Exception):
+    pass
+
+def clone_file(src, dst):
+    """Copy src to dst by sharing its extents; raises ReflinkUnsupported"""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        try:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        except OSError as e:
+            if e.errno in NO_REFLINK_ERRORS:
+                raise ReflinkUnsupported(str(e))
+            raise
+
+def copy_tree(src, dst, copy_file=clone_file, previous=None, trusted_before=0):
+    """Copy every file under src into dst with copy_file, keeping modes and mtimes.
+
+    Files that previous (the last snapshot's entries) still describes
+    are left out; returns those entries, keyed by path.
+    """
+    carried = {}
+    for root, dirnames, filenames in os.walk(src):
+        rel_root = Path(root).relative_to(src)
+        (dst / rel_root).mkdir(parents=True, exist_ok=True)
+        for filename in filenames:
+            path = Path(root) / filename
+            target = dst / rel_root / filename
+            rel = str(rel_root / filename)
+            try:
+                st = path.lstat()
+                if stat.S_ISLNK(st.st_mode):
+                    os.symlink(os.readlink(path), target)
+                    continue
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                if previous and unchanged(previous.get(rel), st, trusted_before):
+                    carried[rel] = previous[rel]
+                    continue
+                copy_file(path, target)
+            except FileNotFoundError:
+                # Rotated log or temp file removed since the walk listed it
+                continue
+            os.chmod(target, st.st_mode & 0o7777)
+            os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return carried
+
+class HotBackup:
+    """Snapshots a server while it runs without catching half-written regions.
+
+    Saving is turned off and the world flushed, then the server
+    directory is reflinked to a frozen copy and saving turned back on.
+    The frozen copy is snapshotted afterwards, so writes pause for
+    the time it takes to clone, not to read and compress. Where the
+    filesystem cannot reflink, only files changed since the last
+    snapshot are copied, at normal priority so the pause stays short;
+    unchanged ones are carried over from that snapshot. Chunking and
+    compression always run after save-on, at the store's low priority.
+    """
+
+    def __init__(self, store=None, manager=None):
+        self.data_dir = Path.home() / ".msm"
+        self.servers_dir = self.data_dir / "servers"
+        self.frozen_dir = self.data_dir / "backups" / "frozen"
+        self.store = store or BackupStore()
+        self.manager = manager or ServerManager()
+        self.registry = ServerRegistry(self.servers_dir)
+
+    def command(self, server_name, command):
+        result = self.manager.send_command(server_name, command)
+        if not result["ok"]:
+            raise RuntimeError(f"Could not send '{command}' to {server_name}")
+        return result
+
+    def resume_saving(self, server_name, raise_error=True):
+        """Turn world saving back on, warning loudly when that fails"""
+        try:
+            self.command(server_name, "save-on")
+        except Exception as e:
+            print(f"\033[31m[ERROR]\033[0m Could not turn saving back on for {server_name}: {e}")
+            print(f"\033[31m[ERROR]\033[0m Autosave is still DISABLED on {server_name}; "
+                  f"run 'save-on' in its console")
+            if raise_error:
+                raise
+
+    def flush(self, server_name):
+        """Run save-all flush and wait until the server reports the save done"""
+        log_tail = LogTail(self.servers_dir / server_name / "logs" / "latest.log")
+        result = self.command(server_name, "save-all flush")
+        # Over RCON the command returns once the save has finished
+        if result["output"] and SAVED_PATTERN.search(result["output"]):
+            return
+        deadline = time.monotonic() + SAVE_TIMEOUT
+        while time.monotonic() < deadline:
+            if any(SAVED_PATTERN.search(line) for line in log_tail.read_lines()):
+                return
+            time.sleep(0.05)
+        raise RuntimeError(f"{server_name} did not finish saving within {SAVE_TIMEOUT}s")
+
+    def backup(self, server_name):
+        """Snapshot a server, freezing it first when it is running.
+
+        Returns (manifest path, stats); stats["paused"] is how long
+        world saving was off, in seconds.
+        """
+        server_path = self.servers_dir / server_name
+        config = self.registry.get(server_name) or {}
+        if config.get("type") in NO_FREEZE_TYPES or not self.manager.is_running(server_name):
+            return self.store.snapshot(server_path)
+
+        frozen = self.frozen_dir / server_name
+        if frozen.exists():
+            shutil.rmtree(frozen)
+        frozen.parent.mkdir(parents=True, exist_ok=True)
+
+        self.command(server_name, "save-off")
+        paused = time.monotonic()
+        try:
+            self.flush(server_name)
+            taken_ns = time.time_ns()
+            carried = None
+            try:
+                copy_tree(server_path, frozen)
+            except ReflinkUnsupported:
+                shutil.rmtree(frozen, ignore_errors=True)
+                previous, trusted_before = self.store.previous(server_name)
+                carried = copy_tree(server_path, frozen, shutil.copyfile, previous, trusted_before)
+        except BaseException:
+            shutil.rmtree(frozen, ignore_errors=True)
+            # Report a failed save-on without hiding why the backup failed
+            self.resume_saving(server_name, raise_error=False)
+            raise
+        try:
+            self.resume_saving(server_name)
+        except BaseException:
+            shutil.rmtree(frozen, ignore_errors=True)
+            raise
+
+        paused = round(time.monotonic() - paused, 3)
+        try:
+            manifest_path, stats = self.store.snapshot(frozen, taken_ns, carried)
+        finally:
+            shutil.rmtree(frozen, ignore_errors=True)
+        stats["paused"] = paused
+        return manifest_path, stats
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: hot_backup.py <server>")
+        sys.exit(1)
+
+    server_name = sys.argv[1]
+    if not (Path.home() / ".msm" / "servers" / server_name).exists():
+        print("\033[31m[ERROR]\033[0m Server not found")
+        sys.exit(1)
+
+    try:
+        manifest_path, stats = HotBackup().backup(server_name)
+    except RuntimeError as e:
+        print(f"\033[31m[ERROR]\033[0m {e}")
+        sys.exit(1)
+    print(f"\033[32m[SUCCESS]\033[0m Snapshot {manifest_path.stem}: {format_stats(stats)}")
+    if "paused" in stats:
+        print(f"\033[36m[INFO]\033[0m World saving was paused for {stats['paused'] * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Job Queue
+Runs server actions in the background and tracks them by job id
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = 4
+
+# Finished jobs kept for status lookups
+JOB_HISTORY = 100
+
+ACTIVE_STATES = ("queued", "running")
+
+class Job:
+    def __init__(self, server, action):
+        self.id = uuid.uuid4().hex[:12]
+        self.server = server
+        self.action = action
+        self.state = "queued"
+        self.ok = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def info(self):
+        return {
+            "id": self.id,
+            "server": self.server,
+            "action": self.action,
+            "state": self.state,
+            "ok": self.ok,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished
+        }
+
+class JobQueue:
+    """Bounded executor for server actions.
+
+    handlers maps an action name to a callable taking the server name and
+    returning True on success. A request for an action that is already
+    queued or running on the same server returns the existing job, and
+    jobs for one server run one at a time in submission order.
+    """
+
+    def __init__(self, handlers, workers=JOB_WORKERS, on_finish=None):
+        self.handlers = handlers
+        self.on_finish = on_finish
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.server_locks = {}
+
+    def submit(self, server, action):
+        if action not in self.handlers:
+            raise ValueError(f"Unknown action: {action}")
+
+        with self.lock:
+            for job in self.jobs.values():
+                if job.server == server and job.action == action and job.state in ACTIVE_STATES:
+                    return job
+
+            job = Job(server, action)
+            self.jobs[job.id] = job
+            self.server_locks.setdefault(server, threading.Lock())
+            self.trim()
+
+        self.pool.submit(self.run, job)
+        return job
+
+    def trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state not in ACTIVE_STATES]
+        for job_id in finished[:max(0, len(self.jobs) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    def run(self, job):
+        with self.server_locks[job.server]:
+            job.state = "running"
+            job.started = time.time()
+            try:
+                job.ok = bool(self.handlers[job.action](job.server))
+            except Exception as e:
+                job.ok = False
+                job.error = str(e)
+            job.finished = time.time()
+            job.state = "done" if job.ok else "failed"
+
+        if self.on_finish:
+            self.on_finish(job)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def recent(self, limit=20):
+        """Newest jobs first"""
+        with self.lock:
+            return list(reversed(self.jobs.values()))[:limit]
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Log Tail
+Incremental reader for server log files that survives rotation
+"""
+
+import os
+import time
+import select
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+# inotify(7) event mask: writes, and the file being recreated at rotation
+IN_MODIFY = 0x002
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+WATCH_MASK = IN_MODIFY | IN_MOVED_TO | IN_CREATE
+
+# Used where inotify is unavailable (non-Linux, restricted sandboxes)
+POLL_INTERVAL = 0.5
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    _libc.inotify_init1
+except (OSError, AttributeError):
+    _libc = None
+
+class LogTail:
+    """Returns only the lines appended to a log file since the last read"""
+
+    def __init__(self, path, from_end=True):
+        self.path = Path(path)
+        self.inode = None
+        self.offset = 0
+        self.partial = b""
+        if from_end:
+            self.seek_end()
+
+    def seek_end(self):
+        """Skip everything currently in the file"""
+        try:
+            st = self.path.stat()
+            self.inode = st.st_ino
+            self.offset = st.st_size
+        except FileNotFoundError:
+            self.inode = None
+            self.offset = 0
+        self.partial = b""
+
+    def read_lines(self):
+        """Read complete new lines, restarting on rotation or truncation"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return []
+
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            # latest.log is renamed and recreated at each server start
+            self.inode = st.st_ino
+            self.offset = 0
+            self.partial = b""
+
+        if st.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+
+        data = self.partial + data
+        lines = data.split(b"\n")
+        self.partial = lines.pop()
+        return [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines]
+
+class ChangeWatcher:
+    """Blocks until something in a log file's directory changes.
+
+    The directory is watched rather than the file so that rotation,
+    which replaces latest.log, still wakes the reader. Falls back to
+    sleeping POLL_INTERVAL when inotify is not available.
+    """
+
+    def __init__(self, path):
+        self.directory = Path(path).parent
+        self.fd = None
+        self.watching = False
+        if _libc is not None:
+            fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self.fd = fd
+
+    def add_watch(self):
+        # The directory may not exist until the server first starts
+        if self.fd is not None and not self.watching:
+            wd = _libc.inotify_add_watch(self.fd, str(self.directory).encode(), WATCH_MASK)
+            self.watching = wd >= 0
+        return self.watching
+
+    def wait(self, timeout):
+        """Return after a change or timeout seconds, whichever comes first"""
+        if not self.add_watch():
+            time.sleep(min(timeout, POLL_INTERVAL))
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            # Drain queued events; the caller re-reads the file anyway
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Metrics Store
+Fixed-size on-disk ring buffers for per-server time series
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+from pathlib import Path
+
+METRICS_DIR = Path.home() / ".msm" / "metrics"
+
+# (name, seconds per slot, slots): 10 minutes at 1s, 1 day at 1min, 30 days at 1h
+TIERS = (
+    ("1s", 1, 600),
+    ("1m", 60, 1440),
+    ("1h", 3600, 720),
+)
+
+SERVER_FIELDS = ("cpu", "rss", "threads", "fds", "read_rate", "write_rate")
+SYSTEM_FIELDS = ("cpu", "memory", "net_sent_rate", "net_recv_rate", "read_rate", "write_rate")
+SYSTEM_SERIES = "_system"
+
+class SeriesLayoutError(ValueError):
+    """A series exists on disk with a different field or tier layout"""
+
+class RingFile:
+    """One tier of a series: slots of [bucket, count, field...] doubles in an mmap"""
+
+    def __init__(self, path, step, slots, width):
+        self.step = step
+        self.slots = slots
+        self.width = width + 2
+        size = slots * self.width * 8
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            current = os.fstat(fd).st_size
+            if current == 0:
+                os.ftruncate(fd, size)
+            elif current != size:
+                raise SeriesLayoutError(f"{path} is {current} bytes, expected {size}")
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.data = memoryview(self.mm).cast("d")
+
+    def add(self, ts, values):
+        """Fold a sample into the bucket for ts (running mean)"""
+        bucket = int(ts // self.step) * self.step
+        base = (int(ts // self.step) % self.slots) * self.width
+        data = self.data
+
+        if data[base] != bucket:
+            # Slot holds an older bucket from a previous lap of the ring
+            data[base] = bucket
+            data[base + 1] = 0
+            for i in range(len(values)):
+                data[base + 2 + i] = 0.0
+
+        count = data[base + 1] + 1
+        data[base + 1] = count
+        for i, value in enumerate(values):
+            data[base + 2 + i] += (value - data[base + 2 + i]) / count
+
+    def read(self, since=0, until=None):
+        """(bucket, values) pairs in time order"""
+        until = until if until is not None else time.time()
+        oldest = until - self.step * self.slots
+        rows = []
+        data = self.data
+        for slot in range(self.slots):
+            base = slot * self.width
+            bucket = data[base]
+            if data[base + 1] and bucket >= max(since, oldest) and bucket <= until:
+                rows.append((bucket, list(data[base + 2:base + self.width])))
+        rows.sort()
+        return rows
+
+    def close(self):
+        self.data.release()
+        self.mm.close()
+
+class Series:
+    """A named set of fields recorded into every tier at once"""
+
+    def __init__(self, directory, name, fields):
+        self.name = name
+        self.fields = tuple(fields)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # Ring files are only valid for the layout they were written with.
+        # A mismatch is an error rather than a reset, so a typo or version
+        # skew never wipes collected history; MetricsStore.drop() resets.
+        meta_file = directory / f"{name}.json"
+        meta = {"fields": list(self.fields), "tiers": [list(t) for t in TIERS]}
+        try:
+            with open(meta_file) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            if any((directory / f"{name}.{tier}.ring").exists() for tier, _, _ in TIERS):
+                raise SeriesLayoutError(f"Series '{name}' has ring files but no {meta_file.name}")
+            with open(meta_file, "w") as f:
+                json.dump(meta, f)
+        except ValueError:
+            raise SeriesLayoutError(f"Series '{name}' has an unreadable {meta_file.name}")
+        else:
+            if stored != meta:
+                raise SeriesLayoutError(f"Series '{name}' was recorded with fields {stored.get('fields')}, "
+                                        f"not {list(self.fields)}")
+
+        self.tiers = {
+            tier: RingFile(directory / f"{name}.{tier}.ring", step, slots, len(self.fields))
+            for tier, step, slots in TIERS
+        }
+
+    def record(self, sample, ts=None):
+        """Record a dict of field values; missing fields count as 0"""
+        ts = ts if ts is not None else time.time()
+        values = [float(sample.get(field) or 0) for field in self.fields]
+        for ring in self.tiers.values():
+            ring.add(ts, values)
+
+    def query(self, tier="1s", since=0, until=None):
+        """List of {"t": timestamp, field: value, ...} dicts"""
+        return [
+            dict(zip(self.fields, values), t=bucket)
+            for bucket, values in self.tiers[tier].read(since, until)
+        ]
+
+    def close(self):
+        for ring in self.tiers.values():
+            ring.close()
+
+class MetricsStore:
+    """Opens and caches series under ~/.msm/metrics"""
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = Path(directory)
+        self.open_series = {}
+        self.warned = set()
+
+    def series(self, name, fields=SERVER_FIELDS):
+        if name not in self.open_series:
+            self.open_series[name] = Series(self.directory, name, fields)
+        return self.open_series[name]
+
+    def fields(self, name):
+        """Field layout a series was recorded with, or None if it does not exist"""
+        try:
+            with open(self.directory / f"{name}.json") as f:
+                return tuple(json.load(f)["fields"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def drop(self, name):
+        """Delete a series and its history, e.g. to record it with new fields"""
+        series = self.open_series.pop(name, None)
+        if series is not None:
+            series.close()
+        for tier, _, _ in TIERS:
+            (self.directory / f"{name}.{tier}.ring").unlink(missing_ok=True)
+        (self.directory / f"{name}.json").unlink(missing_ok=True)
+        self.warned.discard(name)
+
+    def warn_layout(self, name, error):
+        """Say once per series that it is being skipped and how to reset it"""
+        if name in self.warned:
+            return
+        self.warned.add(name)
+        print(f"\033[33m[WARN]\033[0m Skipping metrics series '{name}': {error}. "
+              f"Run 'python3 core/metrics_store.py drop {name}' to reset it")
+
+    def names(self):
+        """Names of all recorded series"""
+        if not self.directory.exists():
+            return []
+        return sorted(p.stem for p in self.directory.glob("*.json"))
+
+    def close(self):
+        for series in self.open_series.values():
+            series.close()
+        self.open_series = {}
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("list", "drop") or (sys.argv[1] == "drop" and len(sys.argv) < 3):
+        print("Usage: metrics_store.py list | drop <series>")
+        sys.exit(1)
+
+    store = MetricsStore()
+    if sys.argv[1] == "list":
+        for name in store.names():
+            print(f"  {name:<24} {', '.join(store.fields(name) or ('unreadable',))}")
+        return
+
+    name = sys.argv[2]
+    if name not in store.names() and not list(store.directory.glob(f"{name}.*.ring")):
+        print(f"\033[31m[ERROR]\033[0m No metrics series '{name}'")
+        sys.exit(1)
+    store.drop(name)
+    print(f"\033[32m[SUCCESS]\033[0m Dropped series '{name}'; it starts afresh on the next sample")
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,18 @@ import sys
 import json
 from pathlib import Path
 
+from server_registry import ServerRegistry
+from tick_monitor import TickMonitor, format_summary
+from auto_tuner import AutoTuner, format_status
+from gc_analyzer import (GCAnalyzer, MIN_CYCLES, recommend, gc_log_setup, format_analysis,
+                         format_comparison, format_recommendation)
+from heap_advisor import HeapAdvisor, format_plan
+
 class PerformanceTuner:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
         self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
     
     def show_menu(self):
         """Display performance tuner menu"""
@@ -31,6 +39,9 @@ class PerformanceTuner:
             print("  \033[32m[4]\033[0m Server Properties Tuning")
             print("  \033[32m[5]\033[0m View Recommendations")
             print("  \033[32m[6]\033[0m Apply Performance Presets")
+            print("  \033[32m[7]\033[0m Tick Performance Report")
+            print("  \033[32m[8]\033[0m Auto-Tune View Distance")
+            print("  \033[32m[9]\033[0m GC Analysis & JVM Recommendations")
             print("  \033[31m[0]\033[0m Back")
             print()
             
@@ -48,12 +59,18 @@ class PerformanceTuner:
                 self.show_recommendations()
             elif choice == "6":
                 self.apply_presets()
+            elif choice == "7":
+                self.tick_report()
+            elif choice == "8":
+                self.auto_tune()
+            elif choice == "9":
+                self.gc_analysis()
             elif choice == "0":
                 break
     
     def select_server(self):
         """Helper to select a server"""
-        servers = list(self.servers_dir.iterdir())
+        servers = [self.registry.path(name) for name in self.registry.names()]
         if not servers:
             print("\033[31m[ERROR]\033[0m No servers found")
             input("\nPress Enter to continue...")
@@ -91,10 +108,15 @@ class PerformanceTuner:
         print()
         print(f"Current RAM: {config['ram']}MB")
         print()
-        print("\033[33mRecommended allocations:\033[0m")
-        print("  • Vanilla/Small server: 2048-3072 MB")
-        print("  • Modded/Medium server: 4096-6144 MB")
-        print("  • Heavy modded/Large server: 8192+ MB")
+        # Sized from the measured live set and what the other servers need
+        plan = HeapAdvisor(self.servers_dir).plan()
+        print("\033[33mHeap plan for this host:\033[0m")
+        for line in format_plan(plan):
+            print(f"  {line}")
+        advice = next(s for s in plan['servers'] if s['name'] == server_path.name)
+        if 'proposed' in advice:
+            print()
+            print(f"\033[36m[INFO]\033[0m Recommended for {server_path.name}: {advice['proposed']}MB")
         print()
         
         new_ram = input("Enter new RAM allocation (MB): ")
@@ -285,6 +307,142 @@ class PerformanceTuner:
 -XX:InitiatingHeapOccupancyPercent=15
 -XX:MaxTenuringThreshold=1"""
     
+    def show_tick_summary(self, server_path):
+        """Print measured tick performance for the last hour"""
+        print("\033[1m\033[33mMeasured tick performance (last hour):\033[0m")
+        for line in format_summary(TickMonitor(server_path.name).summary()):
+            print(f"  {line}")
+    
+    def tick_report(self):
+        """Show measured TPS/MSPT and recent lag spikes"""
+        os.system('clear')
+        print("\033[1m\033[36m═══ TICK PERFORMANCE REPORT ═══\033[0m")
+        print()
+        
+        server_path = self.select_server()
+        if not server_path:
+            return
+        
+        print()
+        self.show_tick_summary(server_path)
+        input("\nPress Enter to continue...")
+    
+    def auto_tune(self):
+        """Enable or disable closed-loop view/simulation distance tuning"""
+        os.system('clear')
+        print("\033[1m\033[36m═══ AUTO-TUNE VIEW DISTANCE ═══\033[0m")
+        print()
+        
+        server_path = self.select_server()
+        if not server_path:
+            return
+        
+        tuner = AutoTuner()
+        enabled = self.registry.get(server_path.name).get("autotune", False)
+        print()
+        for line in format_status(tuner.load_state(server_path), enabled):
+            print(f"  {line}")
+        print()
+        print("\033[36m[INFO]\033[0m Distances step down under sustained lag and back up to the ceiling when idle")
+        
+        action = "Disable" if enabled else "Enable"
+        if input(f"\n{action} auto-tune? (y/n): ").lower() != 'y':
+            return
+        
+        tuner.set_enabled(server_path.name, not enabled)
+        self.registry.invalidate()
+        print(f"\033[32m[SUCCESS]\033[0m Auto-tune {action.lower()}d")
+        if not enabled:
+            print("\033[36m[INFO]\033[0m Keep the tuner running: python3 core/auto_tuner.py run")
+        input("\nPress Enter to continue...")
+    
+    def gc_analysis(self):
+        """Analyze GC logs and apply a recommended JVM change"""
+        os.system('clear')
+        print("\033[1m\033[36m═══ GC ANALYSIS ═══\033[0m")
+        print()
+        
+        server_path = self.select_server()
+        if not server_path:
+            return
+        
+        config_file = server_path / "msm_config.json"
+        with open(config_file) as f:
+            config = json.load(f)
+        
+        if config.get('type') == 'Bedrock':
+            print("\033[33m[WARN]\033[0m Bedrock servers do not run on the JVM")
+            input("\nPress Enter to continue...")
+            return
+        
+        if not config.get('gc_logging'):
+            print()
+            print("\033[33m[WARN]\033[0m GC logging is not enabled for this server")
+            if input("Enable it in start.sh? (y/n): ").lower() == 'y':
+                config['gc_logging'] = True
+                with open(config_file, 'w') as f:
+                    json.dump(config, f, indent=2)
+                self.update_start_script(server_path, config)
+                print("\033[32m[SUCCESS]\033[0m GC logging enabled")
+                print("\033[36m[INFO]\033[0m Restart the server and let it run before analyzing")
+            input("\nPress Enter to continue...")
+            return
+        
+        analyzer = GCAnalyzer(server_path)
+        analysis = analyzer.analyze()
+        print()
+        for line in format_analysis(analysis):
+            print(f"  {line}")
+        
+        comparison = analyzer.comparison()
+        if comparison:
+            print()
+            print("\033[1m\033[33mLast change:\033[0m")
+            for line in format_comparison(*comparison):
+                print(f"  {line}")
+        
+        if analysis is None or analysis['cycles'] < MIN_CYCLES:
+            print()
+            print(f"\033[36m[INFO]\033[0m Need at least {MIN_CYCLES} collections before recommending changes")
+            input("\nPress Enter to continue...")
+            return
+        
+        flags = analyzer.flags()
+        recommendations = recommend(analysis, flags, config['ram'])
+        if not recommendations:
+            print()
+            print("\033[32m[SUCCESS]\033[0m GC behaviour looks healthy; no changes recommended")
+            input("\nPress Enter to continue...")
+            return
+        
+        print()
+        print("\033[1m\033[33mRecommendations:\033[0m")
+        for i, recommendation in enumerate(recommendations, 1):
+            print()
+            lines = format_recommendation(recommendation, flags, config['ram'])
+            print(f"  \033[32m[{i}]\033[0m {lines[0]}")
+            for line in lines[1:]:
+                print(f"      {line}")
+        print()
+        
+        choice = input("Apply recommendation (0 to skip): ")
+        if not choice.isdigit() or not 1 <= int(choice) <= len(recommendations):
+            return
+        
+        recommendation = recommendations[int(choice) - 1]
+        analyzer.record_change(recommendation, analysis, config['ram'])
+        with open(server_path / "jvm_flags.txt", 'w') as f:
+            f.write("\n".join(recommendation['flags']) + "\n")
+        config['ram'] = recommendation['ram']
+        with open(config_file, 'w') as f:
+            json.dump(config, f, indent=2)
+        self.update_start_script(server_path, config)
+        
+        print()
+        print(f"\033[32m[SUCCESS]\033[0m {recommendation['title']}")
+        print("\033[36m[INFO]\033[0m Restart the server; this screen then compares before and after")
+        input("\nPress Enter to continue...")
+    
     def tune_properties(self):
         """Tune server.properties"""
         os.system('clear')
@@ -295,6 +453,9 @@ class PerformanceTuner:
         if not server_path:
             return
         
+        # Judge the change against what the server actually achieves
+        print()
+        self.show_tick_summary(server_path)
         print()
         print("\033[33mSelect optimization preset:\033[0m")
         print()
@@ -428,8 +589,12 @@ class PerformanceTuner:
         
         self.update_start_script(server_path, config)
         
+        plan = HeapAdvisor(self.servers_dir).plan()
         print()
         print(f"\033[32m[SUCCESS]\033[0m Preset applied successfully!")
+        if plan['overcommitted']:
+            print(f"\033[33m[WARN]\033[0m All servers together now need {plan['configured']:.0f}MB "
+                  f"of {plan['usable']:.0f}MB usable; see Adjust RAM Allocation")
         print("\033[36m[INFO]\033[0m Restart server for changes to take effect")
         
         input("\nPress Enter to continue...")
@@ -533,8 +698,12 @@ cd "{server_path}"
 # Load JVM flags
 JVM_FLAGS=$(cat jvm_flags.txt 2>/dev/null || echo "")
 
+{gc_log_setup(config)}
+# Record the server PID; exec keeps it the same for the JVM
+echo $$ > msm.pid
+
 # Start server (taskset not available on Termux)
-java $JVM_FLAGS \\
+exec java $JVM_FLAGS "${{GC_LOG[@]}}" \\
     -Xms{config['ram']}M \\
     -Xmx{config['ram']}M \\
     -jar {config['jar_file']} \\
@@ -11,10 +11,13 @@ import requests
 from pathlib import Path
 from tqdm import tqdm
 
+from server_registry import ServerRegistry
+
 class PluginManager:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
         self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
         self.plugins_cache = self.data_dir / "plugins"
         self.plugins_cache.mkdir(parents=True, exist_ok=True)
         
@@ -154,7 +157,7 @@ class PluginManager:
         print()
         
         # Select server
-        servers = list(self.servers_dir.iterdir())
+        servers = [self.registry.path(name) for name in self.registry.names()]
         if not servers:
             print("\033[31m[ERROR]\033[0m No servers found")
             input("\nPress Enter to continue...")
@@ -235,7 +238,7 @@ class PluginManager:
         print()
         
         # Select server
-        servers = list(self.servers_dir.iterdir())
+        servers = [self.registry.path(name) for name in self.registry.names()]
         if not servers:
             print("\033[31m[ERROR]\033[0m No servers found")
             input("\nPress Enter to continue...")
@@ -300,7 +303,7 @@ class PluginManager:
         print()
         
         # Select server
-        servers = list(self.servers_dir.iterdir())
+        servers = [self.registry.path(name) for name in self.registry.names()]
         if not servers:
             print("\033[31m[ERROR]\033[0m No servers found")
             input("\nPress Enter to continue...")
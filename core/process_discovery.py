@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Process Discovery
+Maps server names to their server processes and caches the mapping
+"""
+
+import time
+from pathlib import Path
+
+import psutil
+
+from supervisor import SupervisorClient, screen_session_pids
+
+PID_FILE = "msm.pid"
+
+# Servers started outside a pid-writing start.sh are picked up by a
+# full rescan at most this often
+RESCAN_INTERVAL = 30
+
+SERVER_PROCESS_NAMES = ("java", "bedrock_server")
+
+def is_server_process(proc):
+    name = proc.name().lower()
+    return any(n in name for n in SERVER_PROCESS_NAMES)
+
+class ProcessDiscovery:
+    """Cached server name -> psutil.Process mapping.
+
+    Cached processes are kept as long as they are alive, so repeated
+    cpu_percent(None) calls measure the delta since the previous refresh
+    without blocking.
+    """
+
+    def __init__(self, servers_dir=None):
+        self.servers_dir = Path(servers_dir) if servers_dir else Path.home() / ".msm" / "servers"
+        self.processes = {}
+        self.last_rescan = None
+
+    def from_pid_file(self, name):
+        """Process recorded in the server's pid file, if it is still that process"""
+        pid_file = self.servers_dir / name / PID_FILE
+        try:
+            pid = int(pid_file.read_text().strip())
+            written = pid_file.stat().st_mtime
+            proc = psutil.Process(pid)
+            # A recycled PID belongs to a process created after the file was written
+            if proc.create_time() <= written + 1 and is_server_process(proc):
+                return proc
+        except (OSError, ValueError, psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        return None
+
+    def from_process_tree(self, root_pid):
+        """Server process at or below root_pid (screen session or start.sh shell)"""
+        if not root_pid:
+            return None
+        try:
+            root = psutil.Process(root_pid)
+            for proc in [root] + root.children(recursive=True):
+                if is_server_process(proc):
+                    return proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        return None
+
+    def find(self, name, session_pid=None):
+        """Look up one server's process without consulting the cache"""
+        proc = self.from_pid_file(name)
+        if proc is None and session_pid:
+            proc = self.from_process_tree(session_pid)
+        if proc is None:
+            status = SupervisorClient().status(name)
+            if status and status.get("pid"):
+                proc = self.from_process_tree(status["pid"])
+        return proc
+
+    def rescan(self, names):
+        """Resolve every uncached server via screen sessions and the supervisor"""
+        sessions = screen_session_pids()
+        supervised = {}
+        reply = SupervisorClient().request("list")
+        if reply:
+            supervised = {s["name"]: s["pid"] for s in reply["servers"] if s.get("pid")}
+
+        for name in names:
+            if name in self.processes:
+                continue
+            proc = self.from_process_tree(sessions.get(name)) or self.from_process_tree(supervised.get(name))
+            if proc is not None:
+                self.processes[name] = proc
+        self.last_rescan = time.monotonic()
+
+    def refresh(self, names):
+        """Update the mapping for the given server names"""
+        lost = False
+        for name in list(self.processes):
+            if name not in names or not self.processes[name].is_running():
+                del self.processes[name]
+                lost = True
+
+        # Pid files are a cheap read, so check them every time
+        for name in names:
+            if name not in self.processes:
+                proc = self.from_pid_file(name)
+                if proc is not None:
+                    self.processes[name] = proc
+
+        missing = [name for name in names if name not in self.processes]
+        if missing and (lost or self.last_rescan is None
+                        or time.monotonic() - self.last_rescan >= RESCAN_INTERVAL):
+            self.rescan(missing)
+
+        return self.processes
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+RCON Client
+Source RCON protocol client with pooled persistent connections
+"""
+
+import sys
+import socket
+import time
+import struct
+import threading
+import itertools
+from pathlib import Path
+
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH = 3
+
+DEFAULT_TIMEOUT = 5.0
+
+# Connections kept open per server
+POOL_SIZE = 2
+
+QUICKACK = getattr(socket, "TCP_QUICKACK", None)
+
+class RconError(Exception):
+    pass
+
+def read_properties(server_path):
+    """server.properties as a dict"""
+    properties = {}
+    props_file = Path(server_path) / "server.properties"
+    if props_file.exists():
+        with open(props_file) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, value = line.split("=", 1)
+                    properties[key.strip()] = value.strip()
+    return properties
+
+def rcon_settings(server_path):
+    """(port, password) when RCON is enabled for the server, else None"""
+    properties = read_properties(server_path)
+    if properties.get("enable-rcon") != "true" or not properties.get("rcon.password"):
+        return None
+    try:
+        return int(properties.get("rcon.port", 25575)), properties["rcon.password"]
+    except ValueError:
+        return None
+
+def encode_packet(request_id, packet_type, payload):
+    body = struct.pack("<ii", request_id, packet_type) + payload.encode("utf-8") + b"\x00\x00"
+    return struct.pack("<i", len(body)) + body
+
+class Pending:
+    def __init__(self):
+        self.parts = []
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+
+class RconConnection:
+    """One authenticated connection running one command at a time.
+
+    Vanilla and Paper read a single packet per read() and drop the
+    connection when more bytes arrive, so every packet goes out in its
+    own write and only after the server has answered the one before.
+    Once the first response fragment is in, an empty RESPONSE_VALUE
+    packet is sent; the server answers in order, so the reply to that
+    marker shows that every fragment of a long (split) response has
+    arrived.
+    """
+
+    def __init__(self, host, port, password, timeout=DEFAULT_TIMEOUT):
+        self.ids = itertools.count(1)
+        self.busy = threading.Lock()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.markers = {}
+        self.alive = True
+
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            auth_id = next(self.ids)
+            self.sock.sendall(encode_packet(auth_id, SERVERDATA_AUTH, password))
+            # Some servers send an empty RESPONSE_VALUE before the auth reply
+            while True:
+                request_id, packet_type, _ = self.read_packet()
+                if packet_type == SERVERDATA_EXECCOMMAND or request_id == -1:
+                    break
+            if request_id == -1:
+                raise RconError("RCON authentication failed")
+        except (OSError, RconError):
+            self.sock.close()
+            raise
+
+        self.sock.settimeout(None)
+        threading.Thread(target=self.read_loop, name=f"rcon-{port}", daemon=True).start()
+
+    def read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise RconError("RCON connection closed")
+            data += chunk
+            if QUICKACK:
+                # The server's marker reply is held by Nagle until our ACK;
+                # Linux clears quick-ACK mode after each use, so re-arm it
+                self.sock.setsockopt(socket.IPPROTO_TCP, QUICKACK, 1)
+        return data
+
+    def read_packet(self):
+        (length,) = struct.unpack("<i", self.read_exact(4))
+        if length < 10:
+            raise RconError("Malformed RCON packet")
+        body = self.read_exact(length)
+        request_id, packet_type = struct.unpack("<ii", body[:8])
+        return request_id, packet_type, body[8:-2].decode("utf-8", errors="replace")
+
+    def read_loop(self):
+        try:
+            while True:
+                request_id, _, payload = self.read_packet()
+                with self.lock:
+                    if request_id in self.markers:
+                        pending = self.pending.pop(self.markers.pop(request_id), None)
+                        if pending:
+                            pending.done.set()
+                    elif request_id in self.pending:
+                        pending = self.pending[request_id]
+                        pending.parts.append(payload)
+                        pending.started.set()
+        except (OSError, RconError, struct.error) as e:
+            self.fail(str(e) or "RCON connection lost")
+
+    def fail(self, error):
+        with self.lock:
+            self.alive = False
+            for pending in self.pending.values():
+                pending.error = error
+                pending.started.set()
+                pending.done.set()
+            self.pending = {}
+            self.markers = {}
+        self.close()
+
+    def send(self, request_id, packet_type, payload):
+        try:
+            self.sock.sendall(encode_packet(request_id, packet_type, payload))
+        except OSError as e:
+            self.fail(str(e))
+            raise RconError(f"RCON send failed: {e}")
+
+    def command(self, command, timeout=DEFAULT_TIMEOUT):
+        """Run a command and return the server's response text"""
+        deadline = time.monotonic() + timeout
+        if not self.busy.acquire(timeout=timeout):
+            raise RconError(f"RCON connection busy for {timeout}s")
+        try:
+            pending = Pending()
+            with self.lock:
+                if not self.alive:
+                    raise RconError("RCON connection lost")
+                request_id = next(self.ids)
+                marker_id = next(self.ids)
+                self.pending[request_id] = pending
+
+            self.send(request_id, SERVERDATA_EXECCOMMAND, command)
+            if pending.started.wait(max(0, deadline - time.monotonic())) and not pending.error:
+                with self.lock:
+                    if request_id in self.pending:
+                        self.markers[marker_id] = request_id
+                self.send(marker_id, SERVERDATA_RESPONSE_VALUE, "")
+                pending.done.wait(max(0, deadline - time.monotonic()))
+
+            if not pending.done.is_set():
+                # A late reply would be taken for the next command's
+                self.fail(f"RCON command timed out after {timeout}s")
+                raise RconError(f"RCON command timed out after {timeout}s")
+            if pending.error:
+                raise RconError(pending.error)
+            return "".join(pending.parts)
+        finally:
+            self.busy.release()
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class RconPool:
+    """Up to POOL_SIZE persistent connections to one server.
+
+    A connection is lent to one command at a time; when all are busy
+    the caller waits for one to come back.
+    """
+
+    def __init__(self, host, port, password, size=POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Condition()
+        self.connections = []
+        self.in_use = set()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while True:
+                self.connections = [c for c in self.connections if c.alive]
+                idle = [c for c in self.connections if c not in self.in_use]
+                if idle:
+                    connection = idle[0]
+                    break
+                if len(self.connections) < self.size:
+                    connection = RconConnection(self.host, self.port, self.password, self.timeout)
+                    self.connections.append(connection)
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RconError(f"All RCON connections busy for {timeout}s")
+                self.lock.wait(remaining)
+            self.in_use.add(connection)
+            return connection
+
+    def release(self, connection):
+        with self.lock:
+            self.in_use.discard(connection)
+            self.lock.notify()
+
+    def command(self, command, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            connection = self.acquire(timeout)
+        except OSError as e:
+            raise RconError(f"RCON connection failed: {e}")
+        try:
+            return connection.command(command, timeout)
+        finally:
+            self.release(connection)
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+            self.in_use = set()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_client(server_path, host="127.0.0.1"):
+    """Shared RconPool for a server, or None when RCON is not enabled"""
+    settings = rcon_settings(server_path)
+    if settings is None:
+        return None
+    port, password = settings
+    key = (host, port, password)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = RconPool(host, port, password)
+        return _pools[key]
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: rcon.py <server_name> <command...>")
+        sys.exit(1)
+
+    server_path = Path.home() / ".msm" / "servers" / sys.argv[1]
+    client = get_client(server_path)
+    if client is None:
+        print(f"\033[31m[ERROR]\033[0m RCON is not enabled for '{sys.argv[1]}'")
+        sys.exit(1)
+
+    try:
+        print(client.command(" ".join(sys.argv[2:])))
+    except RconError as e:
+        print(f"\033[31m[ERROR]\033[0m {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -8,57 +8,47 @@ import os
 import sys
 import time
 import psutil
-import subprocess
 from pathlib import Path
 import json
 
+from cpu_sampler import cpu_snapshot
+from metrics_store import MetricsStore, SeriesLayoutError, SERVER_FIELDS, SYSTEM_FIELDS, SYSTEM_SERIES
+from process_discovery import ProcessDiscovery
+from server_registry import ServerRegistry
+
 class ResourceMonitor:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
         self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
+        self.discovery = ProcessDiscovery(self.servers_dir)
+        self.metrics = MetricsStore()
+        self.counters = {}
     
     def get_server_processes(self):
         """Get all running Minecraft server processes"""
         servers = {}
+        processes = self.discovery.refresh(self.registry.names())
         
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'cpu_percent', 'memory_info']):
+        for server_name, proc in processes.items():
             try:
-                cmdline = proc.info['cmdline']
-                if cmdline and 'java' in proc.info['name'].lower():
-                    # Check if it's a Minecraft server
-                    cmdline_str = ' '.join(cmdline)
-                    if 'server.jar' in cmdline_str or 'minecraft' in cmdline_str.lower():
-                        # Extract server name from screen session
-                        result = subprocess.run(
-                            ["screen", "-list"],
-                            capture_output=True,
-                            text=True
-                        )
-                        
-                        for line in result.stdout.split('\n'):
-                            if 'msm-' in line and str(proc.info['pid']) in line:
-                                server_name = line.split('msm-')[1].split('\t')[0].strip()
-                                servers[server_name] = {
-                                    'pid': proc.info['pid'],
-                                    'cpu': proc.cpu_percent(interval=0.1),
-                                    'memory': proc.info['memory_info'].rss / 1024 / 1024,  # MB
-                                    'process': proc
-                                }
-                                break
-            except (psutil.NoSuchProcess, psutil.AccessDenied, IndexError):
+                with proc.oneshot():
+                    servers[server_name] = {
+                        'pid': proc.pid,
+                        # Non-blocking: CPU used since the previous refresh
+                        'cpu': proc.cpu_percent(None),
+                        'memory': proc.memory_info().rss / 1024 / 1024,  # MB
+                        'process': proc
+                    }
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
         
         return servers
     
     def get_system_stats(self):
         """Get overall system statistics"""
-        try:
-            cpu_percent = psutil.cpu_percent(interval=0.5, percpu=False)
-            cpu_per_core = psutil.cpu_percent(interval=0.5, percpu=True)
-        except (PermissionError, Exception):
-            # Fallback for Android/Termux
-            cpu_percent = 0
-            cpu_per_core = [0, 0]
+        # Sampled in the background; falls back to zeros on Android/Termux
+        cpu = cpu_snapshot()
         
         try:
             memory = psutil.virtual_memory()
@@ -83,9 +73,9 @@ class ResourceMonitor:
         
         return {
             'cpu': {
-                'overall': cpu_percent,
-                'per_core': cpu_per_core,
-                'cores': len(cpu_per_core)
+                'overall': cpu['overall'],
+                'per_core': cpu['per_core'],
+                'cores': cpu['cores']
             },
             'memory': {
                 'total': memory.total / 1024 / 1024,  # MB
@@ -101,6 +91,81 @@ class ResourceMonitor:
             }
         }
     
+    def rate(self, key, value, now):
+        """Per-second rate of a monotonically increasing counter"""
+        previous = self.counters.get(key)
+        self.counters[key] = (value, now)
+        if previous is None or value < previous[0] or now <= previous[1]:
+            return 0
+        return (value - previous[0]) / (now - previous[1])
+    
+    def record_metrics(self, stats, servers):
+        """Append one sample per server, plus host-wide totals, to the metrics store"""
+        now = time.time()
+        system = {'cpu': stats['cpu']['overall'], 'memory': stats['memory']['percent']}
+        try:
+            net_io = psutil.net_io_counters()
+            system['net_sent_rate'] = self.rate('net_sent', net_io.bytes_sent, now)
+            system['net_recv_rate'] = self.rate('net_recv', net_io.bytes_recv, now)
+        except (PermissionError, Exception):
+            pass
+        try:
+            disk_io = psutil.disk_io_counters()
+            system['read_rate'] = self.rate('disk_read', disk_io.read_bytes, now)
+            system['write_rate'] = self.rate('disk_write', disk_io.write_bytes, now)
+        except (PermissionError, Exception):
+            pass
+        self.record(SYSTEM_SERIES, system, now, SYSTEM_FIELDS)
+        
+        # Per-process network counters do not exist; network is recorded host-wide above
+        for server_name, info in servers.items():
+            proc = info['process']
+            sample = {'cpu': info['cpu'], 'rss': info['memory']}
+            try:
+                with proc.oneshot():
+                    sample['threads'] = proc.num_threads()
+                    sample['fds'] = proc.num_fds()
+                    io = proc.io_counters()
+                    sample['read_rate'] = self.rate((server_name, 'read'), io.read_bytes, now)
+                    sample['write_rate'] = self.rate((server_name, 'write'), io.write_bytes, now)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
+                pass
+            self.record(server_name, sample, now)
+    
+    def record(self, series_name, sample, now, fields=SERVER_FIELDS):
+        """Record into one series; a series with an old layout is skipped"""
+        try:
+            self.metrics.series(series_name, fields).record(sample, now)
+        except SeriesLayoutError as e:
+            self.metrics.warn_layout(series_name, e)
+    
+    def sparkline(self, series_name, field, width=40):
+        """Sparkline of a field over the 1s tier (last 10 minutes)"""
+        try:
+            rows = self.metrics.series(series_name).query("1s")
+        except SeriesLayoutError as e:
+            self.metrics.warn_layout(series_name, e)
+            return ""
+        if not rows:
+            return ""
+        values = [row[field] for row in rows]
+        # Downsample to the requested width by taking the max of each bucket
+        step = max(1, len(values) // width + (len(values) % width > 0))
+        values = [max(values[i:i + step]) for i in range(0, len(values), step)]
+        top = max(max(values), 1)
+        blocks = "▁▂▃▄▅▆▇█"
+        return ''.join(blocks[min(int(v / top * (len(blocks) - 1)), len(blocks) - 1)] for v in values)
+    
+    def record_loop(self, interval=2):
+        """Record metrics without drawing the live view"""
+        print(f"\033[36m[INFO]\033[0m Recording metrics every {interval}s to {self.metrics.directory}")
+        try:
+            while True:
+                self.record_metrics(self.get_system_stats(), self.get_server_processes())
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\n\033[32m[INFO]\033[0m Stopped recording")
+    
     def display_monitor(self):
         """Display real-time resource monitor"""
         try:
@@ -141,6 +206,7 @@ class ResourceMonitor:
                 
                 # Server processes
                 servers = self.get_server_processes()
+                self.record_metrics(stats, servers)
                 
                 if servers:
                     print("\033[1m\033[33m═══ MINECRAFT SERVERS ═══\033[0m")
@@ -151,6 +217,7 @@ class ResourceMonitor:
                         print(f"    PID: {info['pid']}")
                         print(f"    CPU: {info['cpu']:.1f}%")
                         print(f"    RAM: {info['memory']:.0f}MB")
+                        print(f"    \033[90mCPU (10 min): {self.sparkline(server_name, 'cpu')}\033[0m")
                         
                         # Get network connections
                         try:
@@ -206,7 +273,10 @@ class ResourceMonitor:
 
 def main():
     monitor = ResourceMonitor()
-    monitor.display_monitor()
+    if "--record" in sys.argv:
+        monitor.record_loop()
+    else:
+        monitor.display_monitor()
 
 if __name__ == "__main__":
     main()
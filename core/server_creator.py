@@ -8,10 +8,18 @@ import os
 import sys
 import json
 import argparse
+import secrets
 import requests
 from pathlib import Path
 from tqdm import tqdm
 
+from gc_analyzer import gc_log_setup
+from heap_advisor import HeapAdvisor
+from server_registry import ServerRegistry
+
+# rcon.port = server port + offset, e.g. 25565 -> 35565
+RCON_PORT_OFFSET = 10000
+
 class ServerCreator:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
@@ -63,7 +71,8 @@ class ServerCreator:
             "cores": cores,
             "jar_file": jar_path.name,
             "port": self.get_next_port(),
-            "created": str(Path.cwd())
+            "created": str(Path.cwd()),
+            "gc_logging": self.server_types[server_type]['name'] != 'Bedrock'
         }
         
         with open(server_path / "msm_config.json", "w") as f:
@@ -433,8 +442,11 @@ class ServerCreator:
 cd "{server_path}"
 export LD_LIBRARY_PATH=.
 
+# Record the server PID; exec keeps it the same for the server
+echo $$ > msm.pid
+
 # Start Bedrock server
-./bedrock_server
+exec ./bedrock_server
 """
         else:
             # Java server start script
@@ -446,8 +458,12 @@ cd "{server_path}"
 # Load JVM flags
 JVM_FLAGS=$(cat jvm_flags.txt 2>/dev/null || echo "")
 
+{gc_log_setup(config)}
+# Record the server PID; exec keeps it the same for the JVM
+echo $$ > msm.pid
+
 # Start server (taskset not available on Termux)
-java $JVM_FLAGS \\
+exec java $JVM_FLAGS "${{GC_LOG[@]}}" \\
     -Xms{config['ram']}M \\
     -Xmx{config['ram']}M \\
     -jar {config['jar_file']} \\
@@ -479,6 +495,13 @@ enable-status=true
 enable-query=true
 query.port={config['port']}
 motd=Termux Minecraft Server - {config['name']}
+"""
+        if config['type'] != 'Bedrock':
+            # RCON lets the manager run commands and read their output
+            properties += f"""enable-rcon=true
+rcon.port={config['port'] + RCON_PORT_OFFSET}
+rcon.password={secrets.token_urlsafe(18)}
+broadcast-rcon-to-ops=false
 """
         with open(server_path / "server.properties", "w") as f:
             f.write(properties)
@@ -502,14 +525,7 @@ motd=Termux Minecraft Server - {config['name']}
     
     def get_next_port(self):
         """Get next available server port"""
-        ports = []
-        for server_dir in self.servers_dir.iterdir():
-            if server_dir.is_dir():
-                config_file = server_dir / "msm_config.json"
-                if config_file.exists():
-                    with open(config_file) as f:
-                        config = json.load(f)
-                        ports.append(config.get("port", 25565))
+        ports = ServerRegistry(self.servers_dir).used_ports()
         
         base_port = 25565
         while base_port in ports:
@@ -521,13 +537,14 @@ def main():
     parser.add_argument('--name', required=True, help='Server name')
     parser.add_argument('--type', required=True, help='Server type (1-9)')
     parser.add_argument('--version', default='latest', help='Minecraft version')
-    parser.add_argument('--ram', type=int, default=2048, help='RAM in MB')
+    parser.add_argument('--ram', type=int, help='RAM in MB (default: sized for this host)')
     parser.add_argument('--cores', type=int, default=2, help='CPU cores')
     
     args = parser.parse_args()
     
     creator = ServerCreator()
-    creator.create_server(args.name, args.type, args.version, args.ram, args.cores)
+    ram = args.ram or HeapAdvisor(creator.servers_dir).default_heap()
+    creator.create_server(args.name, args.type, args.version, ram, args.cores)
 
 if __name__ == "__main__":
     main()
@@ -7,161 +7,421 @@ Handles starting, stopping, and managing servers
 import os
 import sys
 import json
+import socket
 import subprocess
 import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from log_tail import LogTail
+from process_discovery import ProcessDiscovery
+from rcon import get_client, RconError
+from server_registry import ServerRegistry
+from shutdown_watcher import watch_shutdown, learned_budget, MAX_BUDGET, SIGNAL_GRACE
+from supervisor import SupervisorClient, READY_PATTERN, screen_sessions, screen_session_pids
+
+# Bedrock listens on UDP, proxies bind their own port from config.yml/velocity.toml
+NO_TCP_PROBE_TYPES = ("Bedrock", "BungeeCord", "Velocity")
+
+PROXY_TYPES = ("BungeeCord", "Velocity")
+
+STATS_HISTORY = 20
+
+def port_open(port, host="127.0.0.1"):
+    """Check whether a TCP port accepts connections"""
+    try:
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
 
 class ServerManager:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
         self.servers_dir = self.data_dir / "servers"
         self.servers_dir.mkdir(parents=True, exist_ok=True)
+        self.supervisor = SupervisorClient()
+        self.registry = ServerRegistry(self.servers_dir)
+    
+    def get_running_servers(self):
+        """Names of running servers (supervisor state table, else one screen scan)"""
+        running = self.supervisor.running_servers()
+        if running is None:
+            running = screen_sessions()
+        return running
+    
+    def is_running(self, server_name):
+        """Check whether a server is running"""
+        status = self.supervisor.status(server_name)
+        if status is not None:
+            return status["state"] in ("starting", "running", "stopping")
+        return server_name in screen_sessions()
     
-    def start_server(self, server_name):
-        """Start a Minecraft server"""
+    def is_supervised(self, server_name):
+        """Check whether the supervisor owns this server's process"""
+        status = self.supervisor.status(server_name)
+        return bool(status and status.get("owner") == "supervisor")
+    
+    def send_command(self, server_name, command):
+        """Run a console command, preferring RCON so the response comes back.
+        
+        Returns {"ok", "output", "via"}; output is None when the command
+        went to stdin or screen, which do not report a response.
+        """
+        client = get_client(self.servers_dir / server_name)
+        if client is not None:
+            try:
+                return {"ok": True, "output": client.command(command), "via": "rcon"}
+            except RconError:
+                # Not listening yet (starting) or disabled at runtime
+                pass
+        
+        reply = self.supervisor.request("send", name=server_name, command=command)
+        if reply is not None and reply.get("ok"):
+            return {"ok": True, "output": None, "via": "supervisor"}
+        
+        if server_name in screen_sessions():
+            subprocess.run([
+                "screen", "-S", f"msm-{server_name}",
+                "-X", "stuff", command + "\n"
+            ])
+            return {"ok": True, "output": None, "via": "screen"}
+        return {"ok": False, "output": None, "via": None}
+    
+    def start_server(self, server_name, timeout=None):
+        """Start a Minecraft server and wait until it accepts players"""
         server_path = self.servers_dir / server_name
         
         if not server_path.exists():
             print(f"\033[31m[ERROR]\033[0m Server '{server_name}' not found")
             return False
         
-        config_file = server_path / "msm_config.json"
-        if not config_file.exists():
+        config = self.registry.get(server_name)
+        if config is None:
             print(f"\033[31m[ERROR]\033[0m Server configuration not found")
             return False
         
-        with open(config_file) as f:
-            config = json.load(f)
-        
         # Check if already running
-        result = subprocess.run(
-            ["screen", "-list"],
-            capture_output=True,
-            text=True
-        )
-        
-        if f"msm-{server_name}" in result.stdout:
+        if self.is_running(server_name):
             print(f"\033[33m[WARN]\033[0m Server is already running")
             return False
         
-        # Start server in screen session
         print(f"\033[36m[INFO]\033[0m Starting server '{server_name}'...")
         print(f"\033[36m[INFO]\033[0m RAM: {config['ram']}MB")
         print(f"\033[36m[INFO]\033[0m Cores: {config['cores']}")
         print(f"\033[36m[INFO]\033[0m Port: {config['port']}")
         
-        start_script = server_path / "start.sh"
+        timeout = timeout or config.get("startup_timeout") or self.get_setting("startup_timeout", 180)
+        log_tail = LogTail(server_path / "logs" / "latest.log")
         
-        subprocess.run([
-            "screen", "-dmS", f"msm-{server_name}",
-            "bash", str(start_script)
-        ])
+        # Hand the process to the supervisor when it is running
+        reply = self.supervisor.request("start", name=server_name)
+        if reply is not None:
+            if not reply.get("ok"):
+                print(f"\033[31m[ERROR]\033[0m {reply.get('error', 'Failed to start server')}")
+                return False
+            print(f"\033[36m[INFO]\033[0m Supervised PID: {reply['server']['pid']}")
+        else:
+            # Start server in screen session
+            start_script = server_path / "start.sh"
+            
+            subprocess.run([
+                "screen", "-dmS", f"msm-{server_name}",
+                "bash", str(start_script)
+            ])
         
-        time.sleep(2)
+        print(f"\033[36m[INFO]\033[0m Waiting for server to become ready (timeout {timeout}s)...")
+        ready_time = self.wait_until_ready(server_name, config, log_tail, timeout, supervised=reply is not None)
         
-        # Verify server started
-        result = subprocess.run(
-            ["screen", "-list"],
-            capture_output=True,
-            text=True
-        )
+        if ready_time is None:
+            if self.is_running(server_name):
+                print(f"\033[33m[WARN]\033[0m Server not ready after {timeout}s, still starting in the background")
+            else:
+                print(f"\033[31m[ERROR]\033[0m Failed to start server")
+            return False
         
-        if f"msm-{server_name}" in result.stdout:
-            print(f"\033[32m[SUCCESS]\033[0m Server started successfully!")
+        self.record_startup(server_path, ready_time)
+        print(f"\033[32m[SUCCESS]\033[0m Server ready in {ready_time:.1f}s!")
+        if reply is not None:
+            print(f"\033[36m[INFO]\033[0m To attach: python3 core/supervisor.py console {server_name}")
+        else:
             print(f"\033[36m[INFO]\033[0m Screen session: msm-{server_name}")
             print(f"\033[36m[INFO]\033[0m To attach: screen -r msm-{server_name}")
-            return True
-        else:
-            print(f"\033[31m[ERROR]\033[0m Failed to start server")
-            return False
+        return True
+    
+    def wait_until_ready(self, server_name, config, log_tail, timeout, supervised=False):
+        """Wait for the startup-complete log line and an open port.
+        
+        Returns seconds until ready, or None on timeout or exit.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        probe_port = config.get("type") not in NO_TCP_PROBE_TYPES
+        output_seq = 0
+        last_alive_check = started
+        log_ready = False
+        
+        while time.monotonic() < deadline:
+            # Supervised servers are read from their stdout, others from latest.log
+            if supervised:
+                reply = self.supervisor.request("output", name=server_name, since=output_seq)
+                if not reply or not reply.get("ok"):
+                    return None
+                lines = [line for seq, line in reply["lines"]]
+                output_seq = reply["seq"]
+            else:
+                lines = log_tail.read_lines()
+            
+            if not log_ready and any(READY_PATTERN.search(line) for line in lines):
+                log_ready = True
+            
+            if log_ready and (not probe_port or port_open(config["port"])):
+                return time.monotonic() - started
+            
+            now = time.monotonic()
+            if supervised or now - last_alive_check >= 2:
+                last_alive_check = now
+                if not self.is_running(server_name):
+                    return None
+            
+            time.sleep(0.25)
+        
+        return None
+    
+    def get_setting(self, key, default=None):
+        """Read a value from the global config.json"""
+        config_file = self.data_dir / "config.json"
+        if config_file.exists():
+            with open(config_file) as f:
+                return json.load(f).get(key, default)
+        return default
+    
+    def load_stats(self, server_path):
+        """Load measured runtime statistics for a server"""
+        stats_file = server_path / "msm_stats.json"
+        if stats_file.exists():
+            try:
+                with open(stats_file) as f:
+                    return json.load(f)
+            except ValueError:
+                pass
+        return {}
+    
+    def save_stats(self, server_path, stats):
+        """Save measured runtime statistics for a server"""
+        with open(server_path / "msm_stats.json", "w") as f:
+            json.dump(stats, f, indent=2)
+    
+    def record_startup(self, server_path, ready_time):
+        """Record a measured time-to-ready"""
+        stats = self.load_stats(server_path)
+        startup = stats.setdefault("startup", {"history": []})
+        startup["last"] = round(ready_time, 2)
+        startup["last_ready"] = time.time()
+        startup["history"] = (startup["history"] + [round(ready_time, 2)])[-STATS_HISTORY:]
+        self.save_stats(server_path, stats)
     
     def stop_server(self, server_name):
-        """Stop a Minecraft server"""
+        """Stop a Minecraft server, waiting on the process itself"""
         # Check if running
-        result = subprocess.run(
-            ["screen", "-list"],
-            capture_output=True,
-            text=True
-        )
-        
-        if f"msm-{server_name}" not in result.stdout:
+        if not self.is_running(server_name):
             print(f"\033[33m[WARN]\033[0m Server is not running")
             return False
         
         print(f"\033[36m[INFO]\033[0m Stopping server '{server_name}'...")
         
+        server_path = self.servers_dir / server_name
+        stats = self.load_stats(server_path)
+        budget = learned_budget(stats.get("shutdown", {}).get("history"))
+        
+        print(f"\033[36m[INFO]\033[0m Waiting for server to shut down (budget {budget}s)...")
+        if self.is_supervised(server_name):
+            reply = self.supervisor.request(
+                "stop",
+                timeout=MAX_BUDGET + 3 * SIGNAL_GRACE,
+                name=server_name,
+                grace=budget
+            )
+            if not reply or not reply.get("ok"):
+                print(f"\033[31m[ERROR]\033[0m Failed to stop server")
+                return False
+            result = reply
+        else:
+            result = self.stop_screen_server(server_name, server_path, budget)
+        
+        if not result["exited"]:
+            print(f"\033[31m[ERROR]\033[0m Server did not exit after SIGKILL")
+            return False
+        
+        self.record_shutdown(server_path, result)
+        if result["forced"]:
+            print(f"\033[33m[WARN]\033[0m Server did not stop gracefully, sent {result['forced']}")
+        print(f"\033[32m[SUCCESS]\033[0m Server stopped in {result['duration']:.1f}s!")
+        return True
+    
+    def stop_screen_server(self, server_name, server_path, budget):
+        """Stop a server running in a screen session"""
+        session_pid = screen_session_pids().get(server_name)
+        process = ProcessDiscovery(self.servers_dir).find(server_name, session_pid)
+        log_tail = LogTail(server_path / "logs" / "latest.log")
+        
         # Send stop command to server
         subprocess.run([
             "screen", "-S", f"msm-{server_name}",
             "-X", "stuff", "stop\n"
         ])
         
-        # Wait for server to stop
-        print(f"\033[36m[INFO]\033[0m Waiting for server to shut down...")
-        for i in range(30):
-            time.sleep(1)
-            result = subprocess.run(
-                ["screen", "-list"],
-                capture_output=True,
-                text=True
-            )
-            if f"msm-{server_name}" not in result.stdout:
-                print(f"\033[32m[SUCCESS]\033[0m Server stopped successfully!")
-                return True
+        if process is None:
+            # Nothing to wait on; fall back to watching the session
+            def wait(timeout):
+                time.sleep(max(timeout, 1))
+                return server_name not in screen_sessions()
+            send_signal = lambda sig: subprocess.run(["screen", "-S", f"msm-{server_name}", "-X", "quit"])
+        else:
+            def wait(timeout):
+                try:
+                    process.wait(timeout)
+                    return True
+                except psutil.TimeoutExpired:
+                    return False
+                except psutil.NoSuchProcess:
+                    return True
+            send_signal = process.send_signal
         
-        # Force kill if not stopped
-        print(f"\033[33m[WARN]\033[0m Server did not stop gracefully, forcing...")
-        subprocess.run([
-            "screen", "-S", f"msm-{server_name}", "-X", "quit"
-        ])
+        result = watch_shutdown(wait, log_tail.read_lines, send_signal, budget)
         
-        print(f"\033[32m[SUCCESS]\033[0m Server stopped!")
-        return True
+        # The session ends with its shell; make sure it does not linger
+        if result["exited"] and server_name in screen_sessions():
+            subprocess.run(["screen", "-S", f"msm-{server_name}", "-X", "quit"])
+        return result
+    
+    def record_shutdown(self, server_path, result):
+        """Record a shutdown duration; only graceful stops train the budget"""
+        stats = self.load_stats(server_path)
+        shutdown = stats.setdefault("shutdown", {"history": [], "forced": 0})
+        shutdown["last"] = round(result["duration"], 2)
+        if result["forced"]:
+            shutdown["forced"] = shutdown.get("forced", 0) + 1
+        else:
+            shutdown["history"] = (shutdown["history"] + [round(result["duration"], 2)])[-STATS_HISTORY:]
+        self.save_stats(server_path, stats)
     
     def restart_server(self, server_name):
         """Restart a Minecraft server"""
         print(f"\033[36m[INFO]\033[0m Restarting server '{server_name}'...")
-        self.stop_server(server_name)
-        time.sleep(3)
-        self.start_server(server_name)
+        # stop_server returns once the process has exited; starting beside
+        # a process that is still up would clash over the port and world
+        if self.is_running(server_name) and not self.stop_server(server_name):
+            print(f"\033[31m[ERROR]\033[0m Server did not stop, restart aborted")
+            return False
+        return self.start_server(server_name)
+    
+    def get_all_servers(self):
+        """Configs of every server, keyed by name"""
+        return self.registry.all()
+    
+    def split_proxies(self, servers):
+        """Split server names into (backends, proxies)"""
+        backends = [name for name, config in servers.items() if config.get("type") not in PROXY_TYPES]
+        proxies = [name for name, config in servers.items() if config.get("type") in PROXY_TYPES]
+        return backends, proxies
+    
+    def run_parallel(self, action, server_names, max_parallel):
+        """Run action(server_name) over servers with at most max_parallel at once"""
+        if not server_names:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            results = pool.map(lambda name: bool(action(name)), server_names)
+            return dict(zip(server_names, results))
+    
+    def start_all(self, max_parallel=None):
+        """Start every stopped server, backends before proxies"""
+        max_parallel = max_parallel or self.get_setting("fleet_parallel", 2)
+        running = self.get_running_servers()
+        servers = {name: config for name, config in self.get_all_servers().items() if name not in running}
+        backends, proxies = self.split_proxies(servers)
+        
+        print(f"\033[36m[INFO]\033[0m Starting {len(servers)} server(s), {max_parallel} at a time...")
+        # start_server returns once a server is ready, so proxies only start
+        # after their backends accept connections
+        results = self.run_parallel(self.start_server, backends, max_parallel)
+        results.update(self.run_parallel(self.start_server, proxies, max_parallel))
+        return self.report_fleet("started", results)
+    
+    def stop_all(self, max_parallel=None):
+        """Stop every running server, proxies before backends"""
+        max_parallel = max_parallel or self.get_setting("fleet_parallel", 2)
+        running = self.get_running_servers()
+        servers = {name: config for name, config in self.get_all_servers().items() if name in running}
+        backends, proxies = self.split_proxies(servers)
+        
+        print(f"\033[36m[INFO]\033[0m Stopping {len(servers)} server(s), {max_parallel} at a time...")
+        # Shutdown is mostly waiting on world saves, so the cap only bounds disk contention
+        results = self.run_parallel(self.stop_server, proxies, max_parallel)
+        results.update(self.run_parallel(self.stop_server, backends, max_parallel))
+        return self.report_fleet("stopped", results)
+    
+    def rolling_restart(self, max_parallel=None):
+        """Restart running servers in batches, backends first and proxies last"""
+        max_parallel = max_parallel or 1
+        running = self.get_running_servers()
+        servers = {name: config for name, config in self.get_all_servers().items() if name in running}
+        backends, proxies = self.split_proxies(servers)
+        
+        print(f"\033[36m[INFO]\033[0m Rolling restart of {len(servers)} server(s), {max_parallel} at a time...")
+        results = self.run_parallel(self.restart_server, backends, max_parallel)
+        results.update(self.run_parallel(self.restart_server, proxies, max_parallel))
+        return self.report_fleet("restarted", results)
+    
+    def report_fleet(self, verb, results):
+        """Print a summary of a fleet operation"""
+        failed = sorted(name for name, ok in results.items() if not ok)
+        print()
+        if failed:
+            print(f"\033[33m[WARN]\033[0m {len(results) - len(failed)}/{len(results)} server(s) {verb}, failed: {', '.join(failed)}")
+        else:
+            print(f"\033[32m[SUCCESS]\033[0m {len(results)} server(s) {verb}")
+        return not failed
     
     def list_servers(self):
         """List all servers and their status"""
-        if not self.servers_dir.exists() or not any(self.servers_dir.iterdir()):
+        servers = self.registry.all()
+        if not servers:
             print(f"\033[33m[WARN]\033[0m No servers found")
             return
         
         # Get running servers
-        result = subprocess.run(
-            ["screen", "-list"],
-            capture_output=True,
-            text=True
-        )
-        running_servers = result.stdout
+        running_servers = self.get_running_servers()
         
         print("\n\033[1m\033[36m═══════════ SERVER LIST ═══════════\033[0m\n")
         
-        for server_dir in sorted(self.servers_dir.iterdir()):
-            if server_dir.is_dir():
-                server_name = server_dir.name
-                config_file = server_dir / "msm_config.json"
-                
-                if config_file.exists():
-                    with open(config_file) as f:
-                        config = json.load(f)
-                    
-                    status = "\033[32m[RUNNING]\033[0m" if f"msm-{server_name}" in running_servers else "\033[31m[STOPPED]\033[0m"
-                    
-                    print(f"  \033[1m{server_name}\033[0m {status}")
-                    print(f"    Type: {config['type']}")
-                    print(f"    Version: {config['version']}")
-                    print(f"    RAM: {config['ram']}MB")
-                    print(f"    Port: {config['port']}")
-                    print()
+        for server_name, config in servers.items():
+            status = "\033[32m[RUNNING]\033[0m" if server_name in running_servers else "\033[31m[STOPPED]\033[0m"
+            
+            print(f"  \033[1m{server_name}\033[0m {status}")
+            print(f"    Type: {config['type']}")
+            print(f"    Version: {config['version']}")
+            print(f"    RAM: {config['ram']}MB")
+            print(f"    Port: {config['port']}")
+            print()
+
+def int_option(flag):
+    """Read an integer command-line option, or None if absent"""
+    if flag not in sys.argv:
+        return None
+    try:
+        return int(sys.argv[sys.argv.index(flag) + 1])
+    except (IndexError, ValueError):
+        print(f"\033[31m[ERROR]\033[0m {flag} needs a number")
+        sys.exit(1)
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: server_manager.py <start|stop|restart|list|manage> [server_name]")
+        print("Usage: server_manager.py <start|stop|restart|status|list|manage> [server_name] [--timeout SECONDS]")
+        print("       server_manager.py <start-all|stop-all|rolling-restart> [--parallel N]")
+        print("       server_manager.py command <server_name> <command...>")
         sys.exit(1)
     
     manager = ServerManager()
@@ -169,19 +429,42 @@ def main():
     
     if command == "list" or command == "manage":
         manager.list_servers()
-    elif command in ["start", "stop", "restart"]:
+    elif command in ["start-all", "stop-all", "rolling-restart"]:
+        max_parallel = int_option("--parallel")
+        if command == "start-all":
+            ok = manager.start_all(max_parallel)
+        elif command == "stop-all":
+            ok = manager.stop_all(max_parallel)
+        else:
+            ok = manager.rolling_restart(max_parallel)
+        sys.exit(0 if ok else 1)
+    elif command == "command":
+        if len(sys.argv) < 4:
+            print(f"\033[31m[ERROR]\033[0m Server name and command required")
+            sys.exit(1)
+        result = manager.send_command(sys.argv[2], " ".join(sys.argv[3:]))
+        if not result["ok"]:
+            print(f"\033[31m[ERROR]\033[0m Server is not running")
+            sys.exit(1)
+        if result["output"]:
+            print(result["output"])
+    elif command in ["start", "stop", "restart", "status"]:
         if len(sys.argv) < 3:
             print(f"\033[31m[ERROR]\033[0m Server name required")
             sys.exit(1)
         
         server_name = sys.argv[2]
+        timeout = int_option("--timeout")
         
         if command == "start":
-            manager.start_server(server_name)
+            if not manager.start_server(server_name, timeout):
+                sys.exit(1)
         elif command == "stop":
             manager.stop_server(server_name)
         elif command == "restart":
             manager.restart_server(server_name)
+        elif command == "status":
+            sys.exit(0 if manager.is_running(server_name) else 1)
     else:
         print(f"\033[31m[ERROR]\033[0m Unknown command: {command}")
         sys.exit(1)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Server Probe
+Asks running servers for players, MOTD and latency over their own protocols
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import asyncio
+import threading
+from pathlib import Path
+
+from rcon import read_properties
+
+PROBE_TIMEOUT = 2.0
+
+# Probe results are reused for this long
+PROBE_TTL = 5.0
+
+# Sent in the handshake; servers answer status requests for any version
+PROTOCOL_VERSION = -1
+
+# RakNet "offline message" magic used by Bedrock unconnected pings
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+
+def pack_varint(value):
+    value &= 0xFFFFFFFF
+    out = b""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+def pack_string(text):
+    data = text.encode("utf-8")
+    return pack_varint(len(data)) + data
+
+def pack_packet(packet_id, payload=b""):
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+async def read_varint(reader):
+    value = 0
+    for i in range(5):
+        (byte,) = await reader.readexactly(1)
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt too long")
+
+def unpack_varint(data, offset):
+    value = 0
+    for i in range(5):
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, offset
+    raise ValueError("VarInt too long")
+
+def chat_text(component):
+    """Plain text of a chat component (string, dict or list)"""
+    if isinstance(component, str):
+        return component
+    if isinstance(component, list):
+        return "".join(chat_text(part) for part in component)
+    if isinstance(component, dict):
+        return component.get("text", "") + "".join(chat_text(part) for part in component.get("extra", []))
+    return ""
+
+async def slp_status(host, port, timeout=PROBE_TIMEOUT):
+    """Java Server List Ping: status JSON plus a ping/pong round trip"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        handshake = (pack_varint(PROTOCOL_VERSION) + pack_string(host)
+                     + struct.pack(">H", port) + pack_varint(1))
+        writer.write(pack_packet(0x00, handshake) + pack_packet(0x00))
+        await writer.drain()
+
+        async def read_status():
+            length = await read_varint(reader)
+            data = await reader.readexactly(length)
+            packet_id, offset = unpack_varint(data, 0)
+            if packet_id != 0x00:
+                raise ValueError(f"Unexpected packet 0x{packet_id:02x}")
+            size, offset = unpack_varint(data, offset)
+            return json.loads(data[offset:offset + size].decode("utf-8"))
+
+        status = await asyncio.wait_for(read_status(), timeout)
+
+        sent = time.perf_counter()
+        writer.write(pack_packet(0x01, struct.pack(">q", int(time.time() * 1000))))
+        await writer.drain()
+
+        async def read_pong():
+            length = await read_varint(reader)
+            await reader.readexactly(length)
+
+        await asyncio.wait_for(read_pong(), timeout)
+        latency = (time.perf_counter() - sent) * 1000
+    finally:
+        writer.close()
+
+    players = status.get("players", {})
+    return {
+        "online": True,
+        "latency_ms": round(latency, 2),
+        "motd": chat_text(status.get("description", "")),
+        "version": status.get("version", {}).get("name", ""),
+        "protocol": status.get("version", {}).get("protocol", 0),
+        "players": {
+            "online": players.get("online", 0),
+            "max": players.get("max", 0),
+            "sample": [p.get("name", "") for p in players.get("sample", [])]
+        }
+    }
+
+class DatagramProbe(asyncio.DatagramProtocol):
+    """Collects replies for a request/response exchange over UDP"""
+
+    def __init__(self):
+        self.replies = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.replies.put_nowait(data)
+
+    def error_received(self, exc):
+        self.replies.put_nowait(exc)
+
+    async def reply(self, timeout):
+        data = await asyncio.wait_for(self.replies.get(), timeout)
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+async def udp_exchange(host, port, timeout, exchange):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(DatagramProbe, remote_addr=(host, port))
+    try:
+        return await exchange(transport, protocol)
+    finally:
+        transport.close()
+
+async def query_stat(host, port, timeout=PROBE_TIMEOUT):
+    """UDP Query full stat: map, plugins and the complete player list"""
+    session = int.from_bytes(os.urandom(4), "big") & 0x0F0F0F0F
+
+    async def exchange(transport, protocol):
+        transport.sendto(b"\xfe\xfd\x09" + struct.pack(">i", session))
+        data = await protocol.reply(timeout)
+        token = int(data[5:].split(b"\x00", 1)[0])
+
+        transport.sendto(b"\xfe\xfd\x00" + struct.pack(">ii", session, token) + b"\x00" * 4)
+        return await protocol.reply(timeout)
+
+    data = await udp_exchange(host, port, timeout, exchange)
+
+    # 5 byte header, 11 bytes of "splitnum" padding, then key\0value\0 ... \0
+    body = data[16:]
+    kv_part, _, players_part = body.partition(b"\x00\x00\x01player_\x00\x00")
+    fields = kv_part.split(b"\x00")
+    info = {
+        fields[i].decode("utf-8", errors="replace"): fields[i + 1].decode("utf-8", errors="replace")
+        for i in range(0, len(fields) - 1, 2)
+    }
+    players = [p.decode("utf-8", errors="replace") for p in players_part.split(b"\x00") if p]
+    return {
+        "map": info.get("map", ""),
+        "plugins": info.get("plugins", ""),
+        "software": info.get("version", ""),
+        "player_list": players
+    }
+
+async def bedrock_ping(host, port, timeout=PROBE_TIMEOUT):
+    """RakNet unconnected ping answered by Bedrock servers"""
+    async def exchange(transport, protocol):
+        sent = time.perf_counter()
+        transport.sendto(b"\x01" + struct.pack(">q", int(time.time() * 1000)) + RAKNET_MAGIC
+                         + os.urandom(8))
+        data = await protocol.reply(timeout)
+        return data, (time.perf_counter() - sent) * 1000
+
+    data, latency = await udp_exchange(host, port, timeout, exchange)
+    if data[:1] != b"\x1c":
+        raise ValueError("Unexpected RakNet reply")
+    # id, time, server guid, magic, then a length-prefixed "MCPE;motd;protocol;version;online;max;..."
+    (length,) = struct.unpack(">H", data[33:35])
+    parts = data[35:35 + length].decode("utf-8", errors="replace").split(";")
+    parts += [""] * (6 - len(parts))
+    return {
+        "online": True,
+        "latency_ms": round(latency, 2),
+        "motd": parts[1],
+        "version": parts[3],
+        "protocol": int(parts[2] or 0),
+        "players": {"online": int(parts[4] or 0), "max": int(parts[5] or 0), "sample": []}
+    }
+
+async def probe_server(config, server_path, host="127.0.0.1", timeout=PROBE_TIMEOUT):
+    """Probe one server; never raises, failures come back as online=False"""
+    port = int(config.get("port", 25565))
+    try:
+        if config.get("type") == "Bedrock":
+            return await bedrock_ping(host, port, timeout)
+
+        properties = read_properties(server_path)
+        tasks = [slp_status(host, port, timeout)]
+        if properties.get("enable-query") == "true":
+            query_port = int(properties.get("query.port") or port)
+            tasks.append(query_stat(host, query_port, timeout))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        if isinstance(results[0], Exception):
+            raise results[0]
+        result = results[0]
+        # Query is optional extra detail; SLP alone decides health
+        if len(results) > 1 and not isinstance(results[1], Exception):
+            result.update(results[1])
+        return result
+    except (OSError, ValueError, IndexError, struct.error, asyncio.TimeoutError,
+            asyncio.IncompleteReadError) as e:
+        return {"online": False, "error": str(e) or type(e).__name__}
+
+async def probe_all(targets, timeout=PROBE_TIMEOUT):
+    """targets: {name: (config, server_path)} -> {name: result}, probed concurrently"""
+    names = list(targets)
+    results = await asyncio.gather(*(probe_server(*targets[name], timeout=timeout) for name in names))
+    return dict(zip(names, results))
+
+class ServerProbe:
+    """Probe results cached for PROBE_TTL, shared between threads.
+
+    The lock only guards the cache: probes run outside it, so one
+    unresponsive server never blocks callers that want cached results.
+    A server already being probed by another thread is served its last
+    result instead of being probed again.
+    """
+
+    def __init__(self, servers_dir=None, ttl=PROBE_TTL):
+        self.servers_dir = Path(servers_dir) if servers_dir else Path.home() / ".msm" / "servers"
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.probing = set()
+
+    def results(self, configs):
+        """{name: result} for the given {name: config}, probing only stale entries"""
+        now = time.monotonic()
+        with self.lock:
+            stale = {
+                name: (config, self.servers_dir / name)
+                for name, config in configs.items()
+                if (name not in self.cache or now - self.cache[name][0] >= self.ttl)
+                and not (name in self.probing and name in self.cache)
+            }
+            self.probing.update(stale)
+
+        if stale:
+            try:
+                fresh = asyncio.run(probe_all(stale))
+            finally:
+                with self.lock:
+                    self.probing.difference_update(stale)
+            now = time.monotonic()
+            with self.lock:
+                for name, result in fresh.items():
+                    self.cache[name] = (now, result)
+
+        with self.lock:
+            return {name: self.cache[name][1] for name in configs}
+
+def format_probe(result):
+    """One-line summary for terminal views"""
+    if not result.get("online"):
+        return f"\033[31mNot answering\033[0m ({result.get('error', 'no reply')})"
+    players = result["players"]
+    line = f"Players: {players['online']}/{players['max']} | Ping: {result['latency_ms']:.1f}ms"
+    names = result.get("player_list") or players["sample"]
+    if names:
+        line += f" | {', '.join(names[:10])}"
+    return line
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: server_probe.py <server_name>")
+        sys.exit(1)
+
+    server_path = Path.home() / ".msm" / "servers" / sys.argv[1]
+    config_file = server_path / "msm_config.json"
+    if not config_file.exists():
+        print(f"\033[31m[ERROR]\033[0m Server '{sys.argv[1]}' not found")
+        sys.exit(1)
+    with open(config_file) as f:
+        config = json.load(f)
+
+    result = asyncio.run(probe_server(config, server_path))
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["online"] else 1)
+
+if __name__ == "__main__":
+    main()
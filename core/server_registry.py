@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Server Registry
+Cached index of server configurations in ~/.msm/servers
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# In-process lookups within this window skip even the mtime checks
+REFRESH_INTERVAL = 1.0
+
+class ServerRegistry:
+    """Index of msm_config.json files, invalidated by directory/config mtime.
+
+    One instance is shared by the web panel's request threads, so refreshes
+    build a new servers dict and swap it in under the lock.
+    """
+
+    def __init__(self, servers_dir=None):
+        self.data_dir = Path.home() / ".msm"
+        self.servers_dir = Path(servers_dir) if servers_dir else self.data_dir / "servers"
+        self.index_file = self.data_dir / "registry.json"
+        self.index = None
+        self.ports = {}
+        self.checked = 0
+        self.lock = threading.RLock()
+
+    def load_index(self):
+        """Load the on-disk index, or start an empty one"""
+        try:
+            with open(self.index_file) as f:
+                index = json.load(f)
+            if index.get("servers_dir") == str(self.servers_dir):
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"servers_dir": str(self.servers_dir), "dir_mtime": None, "servers": {}}
+
+    def save_index(self):
+        """Write the index atomically so concurrent readers never see half a file"""
+        tmp_file = None
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=self.data_dir, prefix=".registry.",
+                                             suffix=".tmp", delete=False) as f:
+                tmp_file = f.name
+                json.dump(self.index, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError:
+            if tmp_file:
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
+
+    def refresh(self, force=False):
+        """Bring the index up to date, re-reading only changed configs"""
+        with self.lock:
+            if not force and self.index is not None and time.monotonic() - self.checked < REFRESH_INTERVAL:
+                return
+            if self.index is None:
+                self.index = self.load_index()
+
+            try:
+                dir_mtime = self.servers_dir.stat().st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime = None
+
+            # Readers may still hold the old dict; never modify it in place
+            servers = {name: dict(entry) for name, entry in self.index["servers"].items()}
+            changed = False
+
+            # Adding or removing a server changes the directory's own mtime
+            if dir_mtime != self.index["dir_mtime"]:
+                names = set()
+                if dir_mtime is not None:
+                    with os.scandir(self.servers_dir) as entries:
+                        names = {e.name for e in entries if e.is_dir()}
+                for name in set(servers) - names:
+                    del servers[name]
+                for name in names - set(servers):
+                    servers[name] = {"mtime": None, "config": None}
+                changed = True
+
+            # Edits to an existing config only change that file's mtime
+            for name, entry in servers.items():
+                config_file = self.servers_dir / name / "msm_config.json"
+                try:
+                    mtime = config_file.stat().st_mtime_ns
+                except FileNotFoundError:
+                    mtime = None
+                if mtime == entry["mtime"]:
+                    continue
+
+                config = None
+                if mtime is not None:
+                    try:
+                        with open(config_file) as f:
+                            config = json.load(f)
+                    except (OSError, ValueError):
+                        mtime = None
+                entry["mtime"] = mtime
+                entry["config"] = config
+                changed = True
+
+            if changed:
+                self.index = {"servers_dir": str(self.servers_dir), "dir_mtime": dir_mtime, "servers": servers}
+                self.save_index()
+            self.ports = {entry["config"].get("port"): name
+                          for name, entry in servers.items() if entry["config"]}
+            self.checked = time.monotonic()
+
+    def invalidate(self):
+        """Force the next lookup to re-check mtimes"""
+        self.checked = 0
+
+    def all(self):
+        """Configs of every server, keyed by name in sorted order"""
+        with self.lock:
+            self.refresh()
+            servers = self.index["servers"]
+            return {name: servers[name]["config"] for name in sorted(servers) if servers[name]["config"]}
+
+    def names(self):
+        """Sorted names of servers that have a config"""
+        return list(self.all())
+
+    def get(self, name):
+        """Config for one server, or None"""
+        with self.lock:
+            self.refresh()
+            entry = self.index["servers"].get(name)
+            return entry["config"] if entry else None
+
+    def find_by_port(self, port):
+        """Name of the server configured on a port, or None"""
+        with self.lock:
+            self.refresh()
+            return self.ports.get(port)
+
+    def used_ports(self):
+        """Set of ports assigned to servers"""
+        with self.lock:
+            self.refresh()
+            return set(self.ports)
+
+    def path(self, name):
+        return self.servers_dir / name
@@ -6,16 +6,28 @@ Show detailed server status and information
 
 import os
 import sys
-import json
 import subprocess
+import time
 import psutil
 from pathlib import Path
 from datetime import datetime
 
+from cpu_sampler import get_sampler
+from disk_usage import WorldUsage, format_usage
+from process_discovery import ProcessDiscovery
+from server_manager import ServerManager
+from server_probe import ServerProbe, format_probe
+from server_registry import ServerRegistry
+
+# This is a one-shot view: CPU readings are taken this far apart
+CPU_SAMPLE_WAIT = 0.5
+
 class ServerStatus:
     def __init__(self):
         self.data_dir = Path.home() / ".msm"
         self.servers_dir = self.data_dir / "servers"
+        self.registry = ServerRegistry(self.servers_dir)
+        self.discovery = ProcessDiscovery(self.servers_dir)
     
     def display_status(self):
         """Display comprehensive server status"""
@@ -26,12 +38,24 @@ class ServerStatus:
         print("\033[1m\033[36m╚══════════════════════════════════════════════════════════════╝\033[0m")
         print()
         
+        # Prime the host and per-process CPU counters. A first reading
+        # covers everything since boot, so wait and read again
+        sampler = get_sampler()
+        processes = self.discovery.refresh(self.registry.names())
+        for proc in processes.values():
+            try:
+                proc.cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        time.sleep(CPU_SAMPLE_WAIT)
+        sampler.sample()
+        
         # System info
         print("\033[1m\033[33m═══ SYSTEM INFORMATION ═══\033[0m")
         print()
         
         cpu_count = psutil.cpu_count()
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = sampler.snapshot()['overall']
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage(str(Path.home()))
         
@@ -40,16 +64,12 @@ class ServerStatus:
         print(f"  \033[1mDisk:\033[0m {disk.used/1024/1024/1024:.1f}GB / {disk.total/1024/1024/1024:.1f}GB ({disk.percent:.1f}%)")
         print()
         
-        # Get running screen sessions
-        result = subprocess.run(
-            ["screen", "-list"],
-            capture_output=True,
-            text=True
-        )
-        running_sessions = result.stdout
+        # Get running servers
+        running_servers = ServerManager().get_running_servers()
         
         # Server information
-        if not self.servers_dir.exists() or not any(self.servers_dir.iterdir()):
+        configs = self.registry.all()
+        if not configs:
             print("\033[1m\033[33m═══ SERVERS ═══\033[0m")
             print()
             print("\033[90m  No servers found\033[0m")
@@ -58,23 +78,22 @@ class ServerStatus:
             servers = []
             running_count = 0
             
-            for server_dir in sorted(self.servers_dir.iterdir()):
-                if server_dir.is_dir():
-                    config_file = server_dir / "msm_config.json"
-                    if config_file.exists():
-                        with open(config_file) as f:
-                            config = json.load(f)
-                        
-                        is_running = f"msm-{server_dir.name}" in running_sessions
-                        if is_running:
-                            running_count += 1
-                        
-                        servers.append({
-                            'name': server_dir.name,
-                            'config': config,
-                            'running': is_running,
-                            'path': server_dir
-                        })
+            for name, config in configs.items():
+                is_running = name in running_servers
+                if is_running:
+                    running_count += 1
+                
+                servers.append({
+                    'name': name,
+                    'config': config,
+                    'running': is_running,
+                    'path': self.registry.path(name)
+                })
+            
+            # Ask every running server for players and latency at once
+            probes = ServerProbe(self.servers_dir).results(
+                {s['name']: s['config'] for s in servers if s['running']}
+            )
             
             print("\033[1m\033[33m═══ SERVERS ═══\033[0m")
             print()
@@ -87,26 +106,21 @@ class ServerStatus:
                 print(f"    Type: {server['config']['type']} | Version: {server['config']['version']}")
                 print(f"    RAM: {server['config']['ram']}MB | Cores: {server['config']['cores']} | Port: {server['config']['port']}")
                 
-                if server['running']:
-                    # Try to get process info
-                    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_info']):
-                        try:
-                            if 'java' in proc.info['name'].lower():
-                                cmdline = ' '.join(proc.cmdline())
-                                if server['name'] in cmdline or str(server['path']) in cmdline:
-                                    cpu = proc.cpu_percent(interval=0.1)
-                                    mem = proc.info['memory_info'].rss / 1024 / 1024
-                                    print(f"    \033[90mCPU: {cpu:.1f}% | RAM: {mem:.0f}MB | PID: {proc.info['pid']}\033[0m")
-                                    break
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
+                proc = processes.get(server['name'])
+                if server['running'] and proc is not None:
+                    try:
+                        cpu = proc.cpu_percent(None)
+                        mem = proc.memory_info().rss / 1024 / 1024
+                        print(f"    \033[90mCPU: {cpu:.1f}% | RAM: {mem:.0f}MB | PID: {proc.pid}\033[0m")
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        pass
+                if server['name'] in probes:
+                    print(f"    \033[90m{format_probe(probes[server['name']])}\033[0m")
                 
-                # Check world size
-                world_dir = server['path'] / "world"
-                if world_dir.exists():
-                    size = sum(f.stat().st_size for f in world_dir.rglob('*') if f.is_file())
-                    size_mb = size / 1024 / 1024
-                    print(f"    \033[90mWorld size: {size_mb:.1f}MB\033[0m")
+                # Check world size (cached, refreshed in the background)
+                usage = WorldUsage(server['path']).usage()
+                if usage['total']:
+                    print(f"    \033[90mWorld size: {format_usage(usage)}\033[0m")
                 
                 print()
         
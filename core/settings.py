@@ -38,11 +38,24 @@ class SettingsManager:
             "auto_backup": True,
             "backup_interval": 3600,
             "max_backups": 5,
+            "backup_keep_hourly": 24,
+            "backup_keep_daily": 7,
+            "backup_keep_weekly": 4,
+            "backup_region_headers": True,
+            "backup_compression": "zlib",
+            "backup_compression_level": None,
+            "backup_threads": 0,
+            "backup_nice": 10,
+            "backup_ionice": "idle",
             "monitoring": True,
             "web_interface": True,
             "web_port": 8080,
+            "web_threads": 16,
+            "web_cors_origins": [],
             "auto_restart": False,
-            "restart_on_crash": True
+            "restart_on_crash": True,
+            "startup_timeout": 180,
+            "fleet_parallel": 2
         }
     
     def show_menu(self):
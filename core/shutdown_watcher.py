@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Shutdown Watcher
+Waits for a stopping server to exit and escalates only when it stalls
+"""
+
+import re
+import time
+import signal
+
+# "Saving worlds" / "Saving chunks for level ..." begin the final save,
+# "All dimensions are saved" (1.18+) or "All chunks are saved" end it
+SAVE_STARTED_PATTERN = re.compile(r'Saving worlds|Saving chunks for level')
+SAVE_COMPLETE_PATTERN = re.compile(r'All dimensions are saved|All chunks are saved')
+
+DEFAULT_BUDGET = 30
+MIN_BUDGET = 10
+MAX_BUDGET = 300
+SIGNAL_GRACE = 10
+POLL_INTERVAL = 0.1
+
+def learned_budget(history):
+    """Graceful-stop budget from previous shutdown durations"""
+    if not history:
+        return DEFAULT_BUDGET
+    return int(min(max(max(history[-10:]) * 2 + 5, MIN_BUDGET), MAX_BUDGET))
+
+def watch_shutdown(wait, read_lines, send_signal, budget, max_budget=MAX_BUDGET):
+    """Wait for a server that was sent `stop` to exit.
+
+    wait(timeout) returns True once the process has exited, read_lines()
+    returns console lines written since the last call and send_signal(sig)
+    signals the server. The budget is extended up to max_budget while a
+    world save is in progress, so large worlds are not killed mid-save.
+    """
+    started = time.monotonic()
+    deadline = started + budget
+    saving = saved = False
+
+    while True:
+        if wait(POLL_INTERVAL):
+            return {"exited": True, "forced": None, "saved": saved,
+                    "duration": time.monotonic() - started}
+
+        for line in read_lines():
+            if SAVE_STARTED_PATTERN.search(line):
+                saving = True
+            elif SAVE_COMPLETE_PATTERN.search(line):
+                saved = True
+
+        now = time.monotonic()
+        if now >= deadline:
+            if saving and not saved and now < started + max_budget:
+                continue
+            break
+
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            send_signal(sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        if wait(SIGNAL_GRACE):
+            return {"exited": True, "forced": sig.name, "saved": saved,
+                    "duration": time.monotonic() - started}
+
+    return {"exited": False, "forced": "SIGKILL", "saved": saved,
+            "duration": time.monotonic() - started}
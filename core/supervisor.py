@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Server Supervisor
+Long-lived daemon that owns server processes and answers status queries
+over a local Unix socket
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import socket
+import threading
+import subprocess
+import socketserver
+from pathlib import Path
+from collections import deque
+
+from shutdown_watcher import watch_shutdown, DEFAULT_BUDGET, MAX_BUDGET
+
+DATA_DIR = Path.home() / ".msm"
+SERVERS_DIR = DATA_DIR / "servers"
+SOCKET_PATH = DATA_DIR / "supervisor.sock"
+LOG_FILE = DATA_DIR / "logs" / "supervisor.log"
+
+OUTPUT_BUFFER_LINES = 1000
+EXTERNAL_REFRESH_INTERVAL = 10
+
+# Status queries re-scan screen at most this often; start always re-scans
+SCREEN_RESCAN_INTERVAL = 2
+
+# Vanilla/Paper/Velocity print "Done (12.3s)!", Bedrock "Server started.",
+# BungeeCord "Listening on /0.0.0.0:25577"
+READY_PATTERN = re.compile(r'Done \(\d+(?:[.,]\d+)?s\)!|Server started\.|Listening on /')
+
+class ManagedServer:
+    """State for a single server known to the supervisor"""
+
+    def __init__(self, name, path, owner="supervisor"):
+        self.name = name
+        self.path = path
+        self.owner = owner
+        self.process = None
+        self.state = "stopped"
+        self.started = None
+        self.stopped = None
+        self.exit_code = None
+        self.output = deque(maxlen=OUTPUT_BUFFER_LINES)
+        self.output_seq = 0
+        self.stdin_lock = threading.Lock()
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def info(self):
+        """Snapshot of this server's state"""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "owner": self.owner,
+            "pid": self.pid,
+            "started": self.started,
+            "stopped": self.stopped,
+            "exit_code": self.exit_code,
+        }
+
+class Supervisor:
+    """Owns server child processes and keeps an in-memory state table"""
+
+    RUNNING_STATES = ("starting", "running", "stopping")
+
+    def __init__(self):
+        self.servers = {}
+        self.lock = threading.Lock()
+        self.server = None
+        self.watching_external = False
+        self.last_screen_scan = 0
+        self.adopt_screen_sessions()
+
+    def get(self, name):
+        with self.lock:
+            return self.servers.get(name)
+
+    def adopt_screen_sessions(self, max_age=0):
+        """Record servers running in screen sessions the supervisor does not own.
+
+        Servers can be started in screen after the supervisor is up (the
+        fallback path, or by hand), so this runs again before a server is
+        reported stopped or started.
+        """
+        if max_age and time.monotonic() - self.last_screen_scan < max_age:
+            return
+        self.last_screen_scan = time.monotonic()
+        names = screen_sessions()
+        adopted = False
+        with self.lock:
+            for name in names:
+                entry = self.servers.get(name)
+                if entry and entry.state in self.RUNNING_STATES:
+                    continue
+                entry = ManagedServer(name, SERVERS_DIR / name, owner="screen")
+                entry.state = "running"
+                self.servers[name] = entry
+                adopted = True
+            if adopted and not self.watching_external:
+                self.watching_external = True
+                threading.Thread(target=self.watch_external, daemon=True).start()
+
+    def watch_external(self):
+        """Refresh screen-owned entries with one screen fork per interval"""
+        while True:
+            time.sleep(EXTERNAL_REFRESH_INTERVAL)
+            names = screen_sessions()
+            with self.lock:
+                external = [s for s in self.servers.values() if s.owner == "screen"]
+                for entry in external:
+                    if entry.state in self.RUNNING_STATES and entry.name not in names:
+                        entry.state = "stopped"
+                        entry.stopped = time.time()
+                if not any(s.state in self.RUNNING_STATES for s in external):
+                    self.watching_external = False
+                    return
+
+    def start(self, name):
+        """Spawn a server's start script as a child process"""
+        server_path = SERVERS_DIR / name
+        if not (server_path / "msm_config.json").exists():
+            return {"ok": False, "error": f"Server '{name}' not found"}
+
+        self.adopt_screen_sessions()
+        with self.lock:
+            entry = self.servers.get(name)
+            if entry and entry.state in self.RUNNING_STATES:
+                return {"ok": False, "error": "Server is already running"}
+
+            entry = ManagedServer(name, server_path)
+            entry.process = subprocess.Popen(
+                ["bash", str(server_path / "start.sh")],
+                cwd=str(server_path),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                start_new_session=True
+            )
+            # pump_output moves it to "running" at the startup-complete line
+            entry.state = "starting"
+            entry.started = time.time()
+            self.servers[name] = entry
+
+        threading.Thread(target=self.pump_output, args=(entry,), daemon=True).start()
+        return {"ok": True, "server": entry.info()}
+
+    def pump_output(self, entry):
+        """Drain a child's stdout into its ring buffer until it exits"""
+        for line in entry.process.stdout:
+            entry.output_seq += 1
+            entry.output.append((entry.output_seq, line.rstrip("\n")))
+            if entry.state == "starting" and READY_PATTERN.search(line):
+                with self.lock:
+                    if entry.state == "starting":
+                        entry.state = "running"
+
+        exit_code = entry.process.wait()
+        with self.lock:
+            entry.exit_code = exit_code
+            entry.stopped = time.time()
+            entry.state = "stopped" if entry.state == "stopping" or exit_code == 0 else "crashed"
+
+    def send(self, name, command):
+        """Write a console command to a server's stdin"""
+        entry = self.get(name)
+        if not entry or entry.state not in self.RUNNING_STATES:
+            return {"ok": False, "error": "Server is not running"}
+        if entry.owner != "supervisor":
+            return {"ok": False, "error": "Server is not owned by the supervisor"}
+
+        try:
+            with entry.stdin_lock:
+                entry.process.stdin.write(command.rstrip("\n") + "\n")
+                entry.process.stdin.flush()
+        except (BrokenPipeError, ValueError, OSError) as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True}
+
+    def stop(self, name, grace=DEFAULT_BUDGET, max_grace=MAX_BUDGET):
+        """Ask a server to stop, escalating to signals only if it stalls"""
+        entry = self.get(name)
+        if not entry or entry.state not in self.RUNNING_STATES:
+            return {"ok": False, "error": "Server is not running"}
+        if entry.owner != "supervisor":
+            return {"ok": False, "error": "Server is not owned by the supervisor"}
+
+        cursor = {"seq": entry.output_seq}
+
+        def wait(timeout):
+            try:
+                entry.process.wait(timeout=timeout)
+                return True
+            except subprocess.TimeoutExpired:
+                return False
+
+        def read_lines():
+            lines = [line for seq, line in list(entry.output) if seq > cursor["seq"]]
+            cursor["seq"] = entry.output_seq
+            return lines
+
+        entry.state = "stopping"
+        self.send(name, "stop")
+        result = watch_shutdown(wait, read_lines,
+                                lambda sig: os.killpg(entry.process.pid, sig),
+                                grace, max_grace)
+
+        result.update({"ok": True, "server": entry.info()})
+        return result
+
+    def status(self, name):
+        entry = self.get(name)
+        if not entry or entry.state not in self.RUNNING_STATES:
+            self.adopt_screen_sessions(SCREEN_RESCAN_INTERVAL)
+            entry = self.get(name)
+        if not entry:
+            return {"ok": True, "server": {"name": name, "state": "stopped"}}
+        return {"ok": True, "server": entry.info()}
+
+    def list(self):
+        self.adopt_screen_sessions(SCREEN_RESCAN_INTERVAL)
+        with self.lock:
+            servers = [entry.info() for entry in self.servers.values()]
+        return {"ok": True, "servers": servers}
+
+    def output(self, name, since=0):
+        """Buffered console lines with a sequence number above `since`"""
+        entry = self.get(name)
+        if not entry:
+            return {"ok": False, "error": "Server is not known to the supervisor"}
+        lines = [[seq, line] for seq, line in list(entry.output) if seq > since]
+        return {"ok": True, "lines": lines, "seq": entry.output_seq}
+
+    def handle(self, request):
+        """Dispatch one decoded request"""
+        action = request.get("action")
+        name = request.get("name")
+
+        if action == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if action == "list":
+            return self.list()
+        if action == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        if not name:
+            return {"ok": False, "error": "Server name required"}
+        if action == "status":
+            return self.status(name)
+        if action == "start":
+            return self.start(name)
+        if action == "stop":
+            return self.stop(name, request.get("grace", DEFAULT_BUDGET),
+                             request.get("max_grace", MAX_BUDGET))
+        if action == "send":
+            return self.send(name, request.get("command", ""))
+        if action == "output":
+            return self.output(name, request.get("since", 0))
+        return {"ok": False, "error": f"Unknown action: {action}"}
+
+    def serve(self):
+        """Listen on the Unix socket until shut down"""
+        if SOCKET_PATH.exists():
+            if SupervisorClient().ping():
+                print(f"\033[33m[WARN]\033[0m Supervisor is already running")
+                return False
+            SOCKET_PATH.unlink()
+
+        supervisor = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    response = supervisor.handle(json.loads(line))
+                except (ValueError, AttributeError) as e:
+                    response = {"ok": False, "error": f"Bad request: {e}"}
+                self.wfile.write((json.dumps(response) + "\n").encode())
+
+        socketserver.ThreadingUnixStreamServer.daemon_threads = True
+        self.server = socketserver.ThreadingUnixStreamServer(str(SOCKET_PATH), Handler)
+        os.chmod(SOCKET_PATH, 0o600)
+
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.shutdown).start())
+        signal.signal(signal.SIGINT, lambda *_: threading.Thread(target=self.shutdown).start())
+
+        print(f"\033[36m[INFO]\033[0m Supervisor listening on {SOCKET_PATH}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if SOCKET_PATH.exists():
+                SOCKET_PATH.unlink()
+        return True
+
+    def shutdown(self):
+        """Stop all owned servers, then the socket server"""
+        with self.lock:
+            names = [s.name for s in self.servers.values()
+                     if s.owner == "supervisor" and s.state in self.RUNNING_STATES]
+        for name in names:
+            print(f"\033[36m[INFO]\033[0m Stopping server '{name}'...")
+            self.stop(name)
+        if self.server:
+            self.server.shutdown()
+
+class SupervisorClient:
+    """Talks to a running supervisor over its Unix socket"""
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=5):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, action, timeout=None, **params):
+        """Send one request; returns the decoded reply or None if unreachable"""
+        if not Path(self.socket_path).exists():
+            return None
+
+        params["action"] = action
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(str(self.socket_path))
+                sock.sendall((json.dumps(params) + "\n").encode())
+                data = b""
+                while not data.endswith(b"\n"):
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+            return json.loads(data)
+        except (OSError, ValueError):
+            return None
+
+    def ping(self):
+        reply = self.request("ping", timeout=1)
+        return bool(reply and reply.get("ok"))
+
+    def running_servers(self):
+        """Names of running servers, or None if the supervisor is down"""
+        reply = self.request("list")
+        if not reply:
+            return None
+        return {s["name"] for s in reply["servers"] if s["state"] in Supervisor.RUNNING_STATES}
+
+    def status(self, name):
+        reply = self.request("status", name=name)
+        return reply["server"] if reply and reply.get("ok") else None
+
+def screen_session_pids():
+    """Map server name to screen session PID for msm- sessions"""
+    try:
+        result = subprocess.run(
+            ["screen", "-list"],
+            capture_output=True,
+            text=True
+        )
+    except FileNotFoundError:
+        return {}
+
+    sessions = {}
+    for line in result.stdout.split('\n'):
+        if 'msm-' in line:
+            session = line.strip().split('\t')[0]
+            pid, _, session_name = session.partition('.')
+            name = session_name.split('msm-', 1)[-1]
+            sessions[name] = int(pid) if pid.isdigit() else None
+    return sessions
+
+def screen_sessions():
+    """Names of servers with an msm- screen session"""
+    return set(screen_session_pids())
+
+def daemonize():
+    """Start the supervisor in the background"""
+    if SupervisorClient().ping():
+        print(f"\033[33m[WARN]\033[0m Supervisor is already running")
+        return False
+
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG_FILE, "a") as log:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "run"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+
+    for _ in range(50):
+        if SupervisorClient().ping():
+            print(f"\033[32m[SUCCESS]\033[0m Supervisor started")
+            print(f"\033[36m[INFO]\033[0m Log: {LOG_FILE}")
+            return True
+        time.sleep(0.1)
+
+    print(f"\033[31m[ERROR]\033[0m Supervisor failed to start, see {LOG_FILE}")
+    return False
+
+def console(name):
+    """Follow a supervised server's output and forward typed commands"""
+    client = SupervisorClient()
+    reply = client.request("output", name=name)
+    if not reply or not reply.get("ok"):
+        print(f"\033[31m[ERROR]\033[0m Server '{name}' is not supervised")
+        return
+
+    state = {"seq": 0, "done": False}
+
+    def follow():
+        while not state["done"]:
+            reply = client.request("output", name=name, since=state["seq"])
+            if reply and reply.get("ok"):
+                for seq, line in reply["lines"]:
+                    print(line)
+                state["seq"] = reply["seq"]
+            time.sleep(0.5)
+
+    print(f"\033[36m[INFO]\033[0m Attached to '{name}'. Type commands, Ctrl+D to detach")
+    threading.Thread(target=follow, daemon=True).start()
+    try:
+        while True:
+            command = input()
+            if command:
+                client.request("send", name=name, command=command)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    state["done"] = True
+    print(f"\n\033[36m[INFO]\033[0m Detached")
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: supervisor.py <run|start|stop|status|console> [server_name]")
+        sys.exit(1)
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    command = sys.argv[1]
+
+    if command == "run":
+        Supervisor().serve()
+    elif command == "start":
+        daemonize()
+    elif command == "stop":
+        if SupervisorClient().request("shutdown"):
+            print(f"\033[32m[SUCCESS]\033[0m Supervisor shutting down")
+        else:
+            print(f"\033[33m[WARN]\033[0m Supervisor is not running")
+    elif command == "status":
+        reply = SupervisorClient().request("list")
+        if not reply:
+            print(f"\033[33m[WARN]\033[0m Supervisor is not running")
+            sys.exit(1)
+        print(f"\033[32m[RUNNING]\033[0m Supervisor on {SOCKET_PATH}")
+        for server in sorted(reply["servers"], key=lambda s: s["name"]):
+            pid = f" (PID {server['pid']})" if server["pid"] else ""
+            print(f"  {server['name']}: {server['state']} [{server['owner']}]{pid}")
+    elif command == "console":
+        if len(sys.argv) < 3:
+            print(f"\033[31m[ERROR]\033[0m Server name required")
+            sys.exit(1)
+        console(sys.argv[2])
+    else:
+        print(f"\033[31m[ERROR]\033[0m Unknown command: {command}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
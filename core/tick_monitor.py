@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Tick Monitor
+Measures TPS/MSPT from server logs and RCON, and flags lag spikes
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import statistics
+from pathlib import Path
+
+from log_tail import LogTail
+from metrics_store import MetricsStore, SeriesLayoutError, SERVER_FIELDS, SYSTEM_FIELDS, SYSTEM_SERIES
+from rcon import get_client, RconError
+from server_manager import ServerManager
+from server_registry import ServerRegistry
+
+CANT_KEEP_UP_PATTERN = re.compile(r"Can't keep up!.*?Running (\d+)ms or (\d+) ticks behind")
+
+# Section-sign colour codes in command output
+FORMATTING_PATTERN = re.compile(r"§[0-9a-fk-orx]", re.IGNORECASE)
+
+# Paper/Purpur: "TPS from last 1m, 5m, 15m: 20.0, 20.0, 20.0" (* marks a capped value)
+TPS_PATTERN = re.compile(r"TPS from last 1m, 5m, 15m: \*?([\d.]+), \*?([\d.]+), \*?([\d.]+)")
+
+# Paper: "Server tick times (avg/min/max) from last 5s, 10s, 1m:\n◴ 1.2/0.5/3.0, ..."
+MSPT_PATTERN = re.compile(r"([\d.]+)/([\d.]+)/([\d.]+)")
+
+# Vanilla 1.20.3+ "/tick query": "Average time per tick: 2.3ms (Target: 50.0ms)"
+TICK_QUERY_PATTERN = re.compile(r"Average time per tick: ([\d.]+)ms")
+
+TICK_FIELDS = ("tps", "mspt", "mspt_max", "behind_ms")
+TICK_BUDGET_MS = 50
+
+SAMPLE_INTERVAL = 10
+
+# A sample is a spike when a tick overran its budget or TPS dropped below this
+SPIKE_TPS = 18.0
+SPIKE_HISTORY = 100
+
+# Resource samples this close to a spike are compared with the 10 minute median
+CORRELATION_WINDOW = 5
+ELEVATED_RATIO = 1.5
+
+def tick_series_name(server_name):
+    return f"{server_name}.tick"
+
+def strip_formatting(text):
+    return FORMATTING_PATTERN.sub("", text)
+
+def parse_tps(text):
+    """1 minute TPS from Paper's /tps output"""
+    match = TPS_PATTERN.search(strip_formatting(text))
+    return float(match.group(1)) if match else None
+
+def parse_mspt(text):
+    """(avg, max) over the last 5s from Paper's /mspt output"""
+    text = strip_formatting(text)
+    if "tick times" not in text:
+        return None
+    match = MSPT_PATTERN.search(text.split(":", 1)[-1])
+    return (float(match.group(1)), float(match.group(3))) if match else None
+
+def parse_tick_query(text):
+    """Average MSPT from vanilla's /tick query output"""
+    match = TICK_QUERY_PATTERN.search(strip_formatting(text))
+    return float(match.group(1)) if match else None
+
+class TickMonitor:
+    """Tick performance of one server.
+
+    Paper and Purpur report TPS and MSPT over RCON. Vanilla 1.20.3+
+    reports MSPT through /tick query. Otherwise TPS is estimated from the
+    "Can't keep up!" warnings in the log, and MSPT is left unrecorded (0).
+    """
+
+    def __init__(self, server_name, store=None):
+        self.name = server_name
+        self.server_path = Path.home() / ".msm" / "servers" / server_name
+        self.store = store or MetricsStore()
+        self.series_name = tick_series_name(server_name)
+        self.spikes_file = self.store.directory / "spikes" / f"{server_name}.json"
+        self.log_tail = LogTail(self.server_path / "logs" / "latest.log")
+        self.behind_ms = 0
+        self.last_sample = time.time()
+        # Which query works on this server: "paper", "vanilla" or None (log only)
+        self.mode = "unknown"
+
+    def read_log(self):
+        for line in self.log_tail.read_lines():
+            match = CANT_KEEP_UP_PATTERN.search(line)
+            if match:
+                self.behind_ms += int(match.group(1))
+
+    def query_rcon(self):
+        """{"tps", "mspt", "mspt_max"} reported by the server, or None"""
+        client = get_client(self.server_path)
+        if client is None or self.mode is None:
+            return None
+        try:
+            if self.mode in ("unknown", "paper"):
+                tps = parse_tps(client.command("tps"))
+                mspt = parse_mspt(client.command("mspt"))
+                if tps is not None:
+                    self.mode = "paper"
+                    result = {"tps": min(tps, 20.0)}
+                    if mspt:
+                        result["mspt"], result["mspt_max"] = mspt
+                    return result
+            mspt = parse_tick_query(client.command("tick query"))
+            if mspt is not None:
+                self.mode = "vanilla"
+                # TPS is capped at 20; slower ticks lower it proportionally
+                return {"tps": min(20.0, 1000 / max(mspt, TICK_BUDGET_MS)), "mspt": mspt, "mspt_max": mspt}
+            self.mode = None
+        except RconError:
+            # Not up yet, or RCON restarted; try again next sample
+            pass
+        return None
+
+    def sample(self):
+        """Take one sample, record it, and return it with any detected spike"""
+        now = time.time()
+        self.read_log()
+        interval = max(now - self.last_sample, 1)
+        self.last_sample = now
+
+        sample = self.query_rcon() or {}
+        sample["behind_ms"] = self.behind_ms
+        if "tps" not in sample:
+            # Time spent behind stretches the interval's ticks
+            sample["tps"] = 20.0 * interval / (interval + self.behind_ms / 1000)
+        self.behind_ms = 0
+        try:
+            self.store.series(self.series_name, TICK_FIELDS).record(sample, now)
+        except SeriesLayoutError as e:
+            self.store.warn_layout(self.series_name, e)
+
+        spike = None
+        if (sample["tps"] < SPIKE_TPS or sample.get("mspt_max", 0) > TICK_BUDGET_MS
+                or sample["behind_ms"] > 0):
+            spike = dict(sample, t=now, causes=self.correlate(now))
+            self.save_spike(spike)
+        return sample, spike
+
+    def correlate(self, ts):
+        """Resource fields that were elevated around ts compared to the last 10 minutes"""
+        causes = []
+        for series_name, fields in ((self.name, SERVER_FIELDS), (SYSTEM_SERIES, SYSTEM_FIELDS)):
+            if self.store.fields(series_name) is None:
+                continue
+            try:
+                rows = self.store.series(series_name, fields).query("1s", ts - 600, ts + CORRELATION_WINDOW)
+            except SeriesLayoutError as e:
+                self.store.warn_layout(series_name, e)
+                continue
+            baseline = [r for r in rows if r["t"] < ts - CORRELATION_WINDOW]
+            window = [r for r in rows if r["t"] >= ts - CORRELATION_WINDOW]
+            if not baseline or not window:
+                continue
+            for field in fields:
+                typical = statistics.median(r[field] for r in baseline)
+                peak = max(r[field] for r in window)
+                if peak > 0 and peak > typical * ELEVATED_RATIO:
+                    label = field if series_name == self.name else f"host {field}"
+                    causes.append(f"{label} {peak:.1f} (usually {typical:.1f})")
+        return causes
+
+    def spikes(self):
+        try:
+            with open(self.spikes_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def save_spike(self, spike):
+        spikes = (self.spikes() + [spike])[-SPIKE_HISTORY:]
+        self.spikes_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.spikes_file.with_name(f".{self.spikes_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(spikes, f)
+        os.replace(tmp_file, self.spikes_file)
+
+    def summary(self, since=3600):
+        """Tick statistics over the last `since` seconds, or None without data"""
+        start = time.time() - since
+        try:
+            rows = self.store.series(self.series_name, TICK_FIELDS).query("1m", start)
+        except SeriesLayoutError as e:
+            self.store.warn_layout(self.series_name, e)
+            return None
+        if not rows:
+            return None
+        mspt = [r["mspt"] for r in rows if r["mspt"]]
+        return {
+            "samples": len(rows),
+            "tps_avg": statistics.mean(r["tps"] for r in rows),
+            "tps_min": min(r["tps"] for r in rows),
+            "mspt_avg": statistics.mean(mspt) if mspt else None,
+            "mspt_max": max((r["mspt_max"] for r in rows), default=0) or None,
+            "spikes": [s for s in self.spikes() if s["t"] >= start]
+        }
+
+def format_summary(summary):
+    """Lines describing a tick summary for terminal views"""
+    if summary is None:
+        return ["No tick measurements yet (run: python3 core/tick_monitor.py run)"]
+    lines = [f"TPS: avg {summary['tps_avg']:.1f}, min {summary['tps_min']:.1f}"]
+    if summary["mspt_avg"] is not None:
+        lines.append(f"MSPT: avg {summary['mspt_avg']:.1f}ms, worst {summary['mspt_max']:.1f}ms (budget {TICK_BUDGET_MS}ms)")
+    lines.append(f"Lag spikes: {len(summary['spikes'])}")
+    for spike in summary["spikes"][-5:]:
+        when = time.strftime("%H:%M:%S", time.localtime(spike["t"]))
+        causes = ", ".join(spike["causes"]) or "no resource outlier"
+        lines.append(f"  {when} TPS {spike['tps']:.1f} behind {spike['behind_ms']:.0f}ms - {causes}")
+    return lines
+
+def run(interval=SAMPLE_INTERVAL):
+    """Sample every running server until interrupted"""
+    manager = ServerManager()
+    registry = ServerRegistry()
+    store = MetricsStore()
+    monitors = {}
+    print(f"\033[36m[INFO]\033[0m Sampling tick performance every {interval}s")
+    try:
+        while True:
+            running = manager.get_running_servers()
+            for name in registry.names():
+                if name not in running:
+                    monitors.pop(name, None)
+                    continue
+                if name not in monitors:
+                    monitors[name] = TickMonitor(name, store)
+                    continue
+                sample, spike = monitors[name].sample()
+                if spike:
+                    causes = ", ".join(spike["causes"]) or "no resource outlier"
+                    print(f"\033[33m[WARN]\033[0m {name}: lag spike, TPS {sample['tps']:.1f}, "
+                          f"{sample['behind_ms']:.0f}ms behind - {causes}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n\033[32m[INFO]\033[0m Stopped tick monitor")
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "report"):
+        print("Usage: tick_monitor.py run | report <server_name>")
+        sys.exit(1)
+
+    if sys.argv[1] == "run":
+        run()
+        return
+
+    if len(sys.argv) < 3 or not (Path.home() / ".msm" / "servers" / sys.argv[2]).exists():
+        print(f"\033[31m[ERROR]\033[0m Server not found")
+        sys.exit(1)
+    for line in format_summary(TickMonitor(sys.argv[2]).summary()):
+        print(f"  {line}")
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,83 @@ Web-based interface for server management
 """
 
 import os
+import re
 import sys
-import json
-import subprocess
+import hmac
+import secrets
+import tempfile
+import threading
+import time
 from pathlib import Path
-from flask import Flask, render_template_string, jsonify, request
+from urllib.parse import urlsplit
+from flask import Flask, Response, render_template_string, jsonify, request, stream_with_context
 from flask_cors import CORS
 
+from cpu_sampler import cpu_snapshot, get_sampler
+from console_stream import ConsoleHub
+from dashboard_feed import DashboardFeed
+from job_queue import JobQueue
+from metrics_store import MetricsStore, SeriesLayoutError, TIERS
+from server_manager import ServerManager
+from server_probe import ServerProbe
+from server_registry import ServerRegistry
+from web_server import DEFAULT_THREADS, enable_compression, serve, waitress
+
 app = Flask(__name__)
-CORS(app)
+enable_compression(app)
 
 DATA_DIR = Path.home() / ".msm"
 SERVERS_DIR = DATA_DIR / "servers"
+REGISTRY = ServerRegistry(SERVERS_DIR)
+METRICS = MetricsStore()
+MANAGER = ServerManager()
+PROBE = ServerProbe(SERVERS_DIR)
+
+TOKEN_FILE = DATA_DIR / "web_token"
+
+# Routes that change server state; never shared cross-origin and
+# only accepted with the panel token
+PROTECTED_ROUTES = re.compile(r"^/api/(server/[^/]+|console/[^/]+/command)$")
+
+# Read-only listings other origins may fetch when listed in web_cors_origins
+CORS_ROUTES = r"^/api/(servers|stats|stream|metrics/[^/]+|jobs(/[^/]+)?)$"
+
+def load_token():
+    """Token the user gives the panel page for state-changing requests, created on first use"""
+    try:
+        return TOKEN_FILE.read_text().strip()
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=TOKEN_FILE.parent, prefix=".web_token.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(token)
+        # Linking only succeeds when no other panel process got there
+        # first, and the file appears with its token already written
+        os.link(temp_path, TOKEN_FILE)
+    except FileExistsError:
+        return TOKEN_FILE.read_text().strip()
+    finally:
+        os.unlink(temp_path)
+    return token
+
+WEB_TOKEN = load_token()
+CORS_ORIGINS = list(MANAGER.get_setting("web_cors_origins", []))
+CORS(app, resources={CORS_ROUTES: {"origins": CORS_ORIGINS}})
+
+@app.before_request
+def check_protected():
+    """Reject cross-origin or tokenless requests to routes that change state"""
+    if request.method != "POST" or not PROTECTED_ROUTES.match(request.path):
+        return None
+    origin = request.headers.get("Origin")
+    if origin and urlsplit(origin).netloc != request.host and origin not in CORS_ORIGINS:
+        return jsonify({"ok": False, "error": "Cross-origin request refused"}), 403
+    if not hmac.compare_digest(request.headers.get("X-MSM-Token", ""), WEB_TOKEN):
+        return jsonify({"ok": False, "error": "Missing or invalid panel token"}), 403
+    return None
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -159,6 +224,46 @@ HTML_TEMPLATE = """
             opacity: 0.5;
             cursor: not-allowed;
         }
+        .console {
+            display: none;
+            position: fixed;
+            inset: 0;
+            background: rgba(0,0,0,0.7);
+            padding: 20px;
+        }
+        .console-window {
+            max-width: 1000px;
+            height: 100%;
+            margin: 0 auto;
+            display: flex;
+            flex-direction: column;
+            background: #111827;
+            border-radius: 15px;
+            padding: 20px;
+        }
+        .console-header {
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 10px;
+        }
+        .console-output {
+            flex: 1;
+            overflow-y: auto;
+            font-family: monospace;
+            font-size: 0.85em;
+            white-space: pre-wrap;
+            background: #000;
+            padding: 10px;
+            border-radius: 8px;
+        }
+        .console-input {
+            margin-top: 10px;
+            padding: 10px;
+            font-family: monospace;
+            border: none;
+            border-radius: 8px;
+        }
         @media (max-width: 768px) {
             .header h1 { font-size: 1.8em; }
             .stats { grid-template-columns: 1fr; }
@@ -196,107 +301,302 @@ HTML_TEMPLATE = """
         </div>
     </div>
     
+    <div class="console" id="console">
+        <div class="console-window">
+            <div class="console-header">
+                <div class="server-name" id="console-title"></div>
+                <button class="btn btn-stop" onclick="closeConsole()">Close</button>
+            </div>
+            <div class="console-output" id="console-output"></div>
+            <input class="console-input" id="console-input" placeholder="Enter a command and press Enter"
+                   onkeydown="if (event.key === 'Enter') sendCommand()">
+        </div>
+    </div>
+    
     <script>
+        let state = {servers: {}, stats: null, jobs: {}};
+        
+        const ACTION_LABELS = {start: 'STARTING', stop: 'STOPPING', restart: 'RESTARTING'};
+        
+        function latestJob(name) {
+            return Object.values(state.jobs || {})
+                .filter(job => job.server === name)
+                .sort((a, b) => b.created - a.created)[0];
+        }
+        let streaming = false;
+        
+        function renderServers(servers) {
+            const container = document.getElementById('servers');
+            container.innerHTML = '';
+            
+            servers.forEach(server => {
+                const card = document.createElement('div');
+                card.className = 'server-card';
+                
+                let statusClass = server.running ? 'status-running' : 'status-stopped';
+                let statusText = server.running ? 'RUNNING' : 'STOPPED';
+                const job = latestJob(server.name);
+                if (job && (job.state === 'queued' || job.state === 'running')) {
+                    statusText = ACTION_LABELS[job.action] + '...';
+                } else if (job && job.state === 'failed') {
+                    statusClass = 'status-stopped';
+                    statusText = job.action.toUpperCase() + ' FAILED';
+                }
+                
+                card.innerHTML = `
+                    <div class="server-header">
+                        <div class="server-name">${server.name}</div>
+                        <div class="status-badge ${statusClass}">${statusText}</div>
+                    </div>
+                    <div class="server-info">
+                        <div class="info-item">
+                            <div class="info-label">Type</div>
+                            <div class="info-value">${server.type}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Version</div>
+                            <div class="info-value">${server.version}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">RAM</div>
+                            <div class="info-value">${server.ram} MB</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Port</div>
+                            <div class="info-value">${server.port}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Players</div>
+                            <div class="info-value">${server.responding ? server.players + ' / ' + server.max_players : '-'}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Ping</div>
+                            <div class="info-value">${server.responding ? server.latency + ' ms' : '-'}</div>
+                        </div>
+                    </div>
+                    <div class="actions">
+                        <button class="btn btn-start" onclick="startServer('${server.name}')" ${server.running ? 'disabled' : ''}>
+                            Start
+                        </button>
+                        <button class="btn btn-stop" onclick="stopServer('${server.name}')" ${!server.running ? 'disabled' : ''}>
+                            Stop
+                        </button>
+                        <button class="btn btn-restart" onclick="restartServer('${server.name}')" ${!server.running ? 'disabled' : ''}>
+                            Restart
+                        </button>
+                        <button class="btn btn-console" onclick="openConsole('${server.name}')" ${!server.running ? 'disabled' : ''}>
+                            Console
+                        </button>
+                    </div>
+                `;
+                
+                container.appendChild(card);
+            });
+            
+            document.getElementById('total-servers').textContent = servers.length;
+            document.getElementById('active-servers').textContent = 
+                servers.filter(s => s.running).length;
+        }
+        
+        function renderStats(stats) {
+            document.getElementById('cpu').textContent = stats.cpu.toFixed(1) + '%';
+            document.getElementById('memory').textContent = 
+                stats.memory.used.toFixed(0) + ' / ' + stats.memory.total.toFixed(0) + ' MB';
+        }
+        
         function loadServers() {
             fetch('/api/servers')
                 .then(r => r.json())
-                .then(data => {
-                    const container = document.getElementById('servers');
-                    container.innerHTML = '';
-                    
-                    data.servers.forEach(server => {
-                        const card = document.createElement('div');
-                        card.className = 'server-card';
-                        
-                        const statusClass = server.running ? 'status-running' : 'status-stopped';
-                        const statusText = server.running ? 'RUNNING' : 'STOPPED';
-                        
-                        card.innerHTML = `
-                            <div class="server-header">
-                                <div class="server-name">${server.name}</div>
-                                <div class="status-badge ${statusClass}">${statusText}</div>
-                            </div>
-                            <div class="server-info">
-                                <div class="info-item">
-                                    <div class="info-label">Type</div>
-                                    <div class="info-value">${server.type}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Version</div>
-                                    <div class="info-value">${server.version}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">RAM</div>
-                                    <div class="info-value">${server.ram} MB</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Port</div>
-                                    <div class="info-value">${server.port}</div>
-                                </div>
-                            </div>
-                            <div class="actions">
-                                <button class="btn btn-start" onclick="startServer('${server.name}')" ${server.running ? 'disabled' : ''}>
-                                    Start
-                                </button>
-                                <button class="btn btn-stop" onclick="stopServer('${server.name}')" ${!server.running ? 'disabled' : ''}>
-                                    Stop
-                                </button>
-                                <button class="btn btn-restart" onclick="restartServer('${server.name}')" ${!server.running ? 'disabled' : ''}>
-                                    Restart
-                                </button>
-                                <button class="btn btn-console" ${!server.running ? 'disabled' : ''}>
-                                    Console
-                                </button>
-                            </div>
-                        `;
-                        
-                        container.appendChild(card);
-                    });
-                    
-                    document.getElementById('total-servers').textContent = data.servers.length;
-                    document.getElementById('active-servers').textContent = 
-                        data.servers.filter(s => s.running).length;
-                });
+                .then(data => renderServers(data.servers));
         }
         
         function loadStats() {
             fetch('/api/stats')
                 .then(r => r.json())
+                .then(renderStats);
+        }
+        
+        // JSON Merge Patch: null removes a key, objects merge, anything else replaces
+        function applyPatch(target, patch) {
+            for (const key in patch) {
+                const value = patch[key];
+                if (value === null) {
+                    delete target[key];
+                } else if (typeof value === 'object' && !Array.isArray(value) &&
+                           typeof target[key] === 'object' && target[key] !== null) {
+                    applyPatch(target[key], value);
+                } else {
+                    target[key] = value;
+                }
+            }
+        }
+        
+        function render(changed) {
+            if (!changed || 'servers' in changed || 'jobs' in changed) {
+                renderServers(Object.values(state.servers).sort((a, b) => a.name.localeCompare(b.name)));
+            }
+            if ((!changed || 'stats' in changed) && state.stats) {
+                renderStats(state.stats);
+            }
+        }
+        
+        function connect() {
+            const source = new EventSource('/api/stream');
+            source.addEventListener('snapshot', e => {
+                streaming = true;
+                state = JSON.parse(e.data);
+                render();
+            });
+            source.addEventListener('patch', e => {
+                const patch = JSON.parse(e.data);
+                applyPatch(state, patch);
+                render(patch);
+            });
+            // EventSource reconnects on its own; the next snapshot resyncs
+            source.onerror = () => { streaming = false; };
+        }
+        
+        // Without the event stream, follow the job until it finishes
+        function watchJob(job) {
+            state.jobs[job.id] = job;
+            if (job.state === 'queued' || job.state === 'running') {
+                setTimeout(() => fetch('/api/jobs/' + job.id).then(r => r.json()).then(watchJob), 1000);
+            }
+            loadServers();
+        }
+        
+        function panelToken(ask) {
+            // Supplied by the user, never sent with the page
+            let token = localStorage.getItem('msmToken');
+            if (!token || ask) {
+                token = (prompt('Panel token (from ~/.msm/web_token on the server)') || '').trim();
+                localStorage.setItem('msmToken', token);
+            }
+            return token;
+        }
+        
+        function post(url, body, retried) {
+            return fetch(url, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json', 'X-MSM-Token': panelToken(retried)},
+                body: JSON.stringify(body)
+            })
+                .then(r => r.status === 403 && !retried ? post(url, body, true) : r.json());
+        }
+        
+        function runAction(action, name) {
+            post('/api/server/' + action, {name: name})
                 .then(data => {
-                    document.getElementById('cpu').textContent = data.cpu.toFixed(1) + '%';
-                    document.getElementById('memory').textContent = 
-                        data.memory.used.toFixed(0) + ' / ' + data.memory.total.toFixed(0) + ' MB';
+                    if (data.job && !streaming) {
+                        watchJob(data.job);
+                    }
                 });
         }
         
         function startServer(name) {
-            fetch('/api/server/start', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({name: name})
-            }).then(() => setTimeout(loadServers, 2000));
+            runAction('start', name);
         }
         
         function stopServer(name) {
-            fetch('/api/server/stop', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({name: name})
-            }).then(() => setTimeout(loadServers, 2000));
+            runAction('stop', name);
         }
         
         function restartServer(name) {
-            stopServer(name);
-            setTimeout(() => startServer(name), 5000);
+            runAction('restart', name);
+        }
+        
+        // Console: keeps at most this many lines in the page
+        const CONSOLE_LINES = 1000;
+        let consoleName = null;
+        let consoleSource = null;
+        let consoleSeq = 0;
+        
+        function appendConsole(lines, skipped) {
+            const output = document.getElementById('console-output');
+            const atBottom = output.scrollTop + output.clientHeight >= output.scrollHeight - 5;
+            if (skipped) {
+                lines = [`... ${skipped} lines skipped ...`].concat(lines);
+            }
+            lines.forEach(line => {
+                const div = document.createElement('div');
+                div.textContent = line;
+                output.appendChild(div);
+            });
+            while (output.childElementCount > CONSOLE_LINES) {
+                output.removeChild(output.firstChild);
+            }
+            if (atBottom) {
+                output.scrollTop = output.scrollHeight;
+            }
         }
         
-        // Load data
-        loadServers();
-        loadStats();
+        function pollConsole(name) {
+            if (consoleName !== name) {
+                return;
+            }
+            fetch('/api/console/' + encodeURIComponent(name) + '?since=' + consoleSeq)
+                .then(r => r.json())
+                .then(data => {
+                    consoleSeq = data.seq;
+                    appendConsole(data.lines, data.skipped);
+                    setTimeout(() => pollConsole(name), 500);
+                });
+        }
+        
+        function openConsole(name) {
+            closeConsole();
+            consoleName = name;
+            consoleSeq = 0;
+            document.getElementById('console-title').textContent = name;
+            document.getElementById('console-output').innerHTML = '';
+            document.getElementById('console').style.display = 'block';
+            document.getElementById('console-input').focus();
+            
+            if (window.EventSource) {
+                consoleSource = new EventSource('/api/console/' + encodeURIComponent(name) + '/stream');
+                consoleSource.addEventListener('lines', e => {
+                    const data = JSON.parse(e.data);
+                    appendConsole(data.lines, data.skipped);
+                });
+            } else {
+                pollConsole(name);
+            }
+        }
         
-        // Refresh every 5 seconds
-        setInterval(loadServers, 5000);
-        setInterval(loadStats, 2000);
+        function closeConsole() {
+            if (consoleSource) {
+                consoleSource.close();
+                consoleSource = null;
+            }
+            consoleName = null;
+            document.getElementById('console').style.display = 'none';
+        }
+        
+        function sendCommand() {
+            const input = document.getElementById('console-input');
+            const command = input.value.trim();
+            if (!command || !consoleName) {
+                return;
+            }
+            input.value = '';
+            appendConsole(['> ' + command]);
+            post('/api/console/' + encodeURIComponent(consoleName) + '/command', {command: command})
+                .then(data => {
+                    if (!data.ok) {
+                        appendConsole(['[ERROR] ' + data.error]);
+                    }
+                });
+        }
+        
+        if (window.EventSource) {
+            // Changes are pushed; no polling
+            connect();
+        } else {
+            loadServers();
+            loadStats();
+            setInterval(loadServers, 5000);
+            setInterval(loadStats, 2000);
+        }
     </script>
 </body>
 </html>
@@ -306,107 +606,279 @@ HTML_TEMPLATE = """
 def index():
     return render_template_string(HTML_TEMPLATE)
 
-@app.route('/api/servers')
-def api_servers():
+# Listings younger than this are served from the shared snapshot
+STATUS_TTL = 2
+
+class StatusSnapshot:
+    """Server listing rebuilt at most once per ttl.
+
+    One request rebuilds at a time. While it does, others get the
+    previous listing instead of waiting on its status reads and probes;
+    they only wait when there is no listing yet.
+    """
+    
+    def __init__(self, ttl=STATUS_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.servers = None
+        self.taken = 0
+    
+    def fresh(self):
+        return self.servers is not None and time.monotonic() - self.taken < self.ttl
+    
+    def get(self):
+        with self.lock:
+            if self.fresh():
+                return self.servers
+            previous = self.servers
+        
+        if not self.build_lock.acquire(blocking=previous is None):
+            return previous
+        try:
+            with self.lock:
+                # Built by another request while this one waited
+                if self.fresh():
+                    return self.servers
+            servers = build_server_list()
+            with self.lock:
+                self.servers = servers
+                self.taken = time.monotonic()
+            return servers
+        finally:
+            self.build_lock.release()
+    
+    def invalidate(self):
+        with self.lock:
+            self.servers = None
+
+def build_server_list():
     servers = []
+    running_servers = MANAGER.get_running_servers()
+    configs = REGISTRY.all()
+    probes = PROBE.results({name: configs[name] for name in configs if name in running_servers})
     
-    if SERVERS_DIR.exists():
-        for server_dir in SERVERS_DIR.iterdir():
-            if server_dir.is_dir():
-                config_file = server_dir / "msm_config.json"
-                if config_file.exists():
-                    with open(config_file) as f:
-                        config = json.load(f)
-                    
-                    # Check if running
-                    result = subprocess.run(
-                        ["screen", "-list"],
-                        capture_output=True,
-                        text=True
-                    )
-                    running = f"msm-{server_dir.name}" in result.stdout
-                    
-                    servers.append({
-                        "name": server_dir.name,
-                        "type": config.get("type", "Unknown"),
-                        "version": config.get("version", "Unknown"),
-                        "ram": config.get("ram", 0),
-                        "port": config.get("port", 0),
-                        "cores": config.get("cores", 0),
-                        "running": running
-                    })
+    for name, config in configs.items():
+        probe = probes.get(name, {})
+        players = probe.get("players", {})
+        servers.append({
+            "name": name,
+            "type": config.get("type", "Unknown"),
+            "version": config.get("version", "Unknown"),
+            "ram": config.get("ram", 0),
+            "port": config.get("port", 0),
+            "cores": config.get("cores", 0),
+            "running": name in running_servers,
+            # Whether the server answers a status ping, not just has a process
+            "responding": probe.get("online", False),
+            "players": players.get("online", 0),
+            "max_players": players.get("max", 0),
+            "latency": round(probe.get("latency_ms", 0))
+        })
     
-    return jsonify({"servers": servers})
+    return servers
 
-@app.route('/api/stats')
-def api_stats():
+def server_list():
+    return STATUS.get()
+
+def system_stats():
     try:
         import psutil
-        cpu = psutil.cpu_percent(interval=0.1)
+        cpu = cpu_snapshot()['overall']
         memory = psutil.virtual_memory()
         
-        return jsonify({
-            "cpu": cpu,
+        return {
+            "cpu": round(cpu, 1),
             "memory": {
-                "total": memory.total / 1024 / 1024,
-                "used": memory.used / 1024 / 1024,
+                "total": round(memory.total / 1024 / 1024),
+                "used": round(memory.used / 1024 / 1024),
                 "percent": memory.percent
             }
-        })
+        }
     except (PermissionError, Exception) as e:
         # Fallback for Android/Termux where /proc/stat is restricted
-        return jsonify({
+        return {
             "cpu": 0,
             "memory": {
                 "total": 4096,
                 "used": 2048,
                 "percent": 50
             }
-        })
+        }
 
-@app.route('/api/server/start', methods=['POST'])
-def api_server_start():
-    data = request.json
-    server_name = data.get('name')
+STATUS = StatusSnapshot()
+
+# Actions run in-process against ServerManager; a finished job makes the
+# next listing re-read server state
+JOBS = JobQueue({
+    "start": MANAGER.start_server,
+    "stop": MANAGER.stop_server,
+    "restart": MANAGER.restart_server
+}, on_finish=lambda job: STATUS.invalidate())
+
+CONSOLES = ConsoleHub(SERVERS_DIR)
+
+def job_list():
+    # Unset fields are left out: None means "deleted" in a feed patch
+    return {
+        job.id: {k: v for k, v in job.info().items() if v is not None}
+        for job in JOBS.recent()
+    }
+
+# Shared by every open dashboard; samples only while someone is connected
+FEED = DashboardFeed({
+    "servers": lambda: {server["name"]: server for server in server_list()},
+    "stats": system_stats,
+    "jobs": job_list
+})
+
+@app.route('/api/servers')
+def api_servers():
+    # Unchanged listings are answered with 304 Not Modified
+    response = jsonify({"servers": server_list()})
+    # Weak, so the tag stays valid across gzip/br encodings
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
+
+@app.route('/api/stats')
+def api_stats():
+    return jsonify(system_stats())
+
+@app.route('/api/stream')
+def api_stream():
+    events = FEED.subscribe()
+    return Response(
+        stream_with_context(FEED.stream(events)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/metrics/<name>')
+def api_metrics(name):
+    tier = request.args.get('tier', '1s')
+    if tier not in [t[0] for t in TIERS]:
+        return jsonify({"error": f"Unknown tier: {tier}"}), 400
+    fields = METRICS.fields(name)
+    if fields is None:
+        return jsonify({"error": f"No metrics for '{name}'"}), 404
     
-    subprocess.Popen([
-        sys.executable,
-        str(Path(__file__).parent / "server_manager.py"),
-        "start",
-        server_name
-    ])
+    since = request.args.get('since', 0, type=float)
+    try:
+        samples = METRICS.series(name, fields).query(tier, since)
+    except SeriesLayoutError as e:
+        METRICS.warn_layout(name, e)
+        return jsonify({"error": f"{e}; run 'python3 core/metrics_store.py drop {name}' to reset it"}), 409
+    return jsonify({
+        "name": name,
+        "tier": tier,
+        "samples": samples
+    })
+
+def server_action(action):
+    data = request.json or {}
+    server_name = data.get('name')
+    if not server_name or REGISTRY.get(server_name) is None:
+        return jsonify({"error": f"Server '{server_name}' not found"}), 404
     
-    return jsonify({"status": "starting"})
+    job = JOBS.submit(server_name, action)
+    return jsonify({"job": job.info()}), 202
+
+@app.route('/api/server/start', methods=['POST'])
+def api_server_start():
+    return server_action("start")
 
 @app.route('/api/server/stop', methods=['POST'])
 def api_server_stop():
-    data = request.json
-    server_name = data.get('name')
-    
-    subprocess.Popen([
-        sys.executable,
-        str(Path(__file__).parent / "server_manager.py"),
-        "stop",
-        server_name
-    ])
+    return server_action("stop")
+
+@app.route('/api/server/restart', methods=['POST'])
+def api_server_restart():
+    return server_action("restart")
+
+@app.route('/api/jobs')
+def api_jobs():
+    return jsonify({"jobs": [job.info() for job in JOBS.recent()]})
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job.info())
+
+@app.route('/api/console/<name>/stream')
+def api_console_stream(name):
+    if REGISTRY.get(name) is None:
+        return jsonify({"error": f"Server '{name}' not found"}), 404
+    return Response(
+        stream_with_context(CONSOLES.get(name).stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/console/<name>')
+def api_console(name):
+    # Polling fallback for browsers without EventSource
+    if REGISTRY.get(name) is None:
+        return jsonify({"error": f"Server '{name}' not found"}), 404
+    console = CONSOLES.get(name)
+    console.subscribe()
+    try:
+        since = request.args.get('since', 0, type=int)
+        lines, seq, skipped = console.since(since, timeout=1.0 if since else 0)
+    finally:
+        console.unsubscribe()
+    return jsonify({"lines": lines, "seq": seq, "skipped": skipped})
+
+@app.route('/api/console/<name>/command', methods=['POST'])
+def api_console_command(name):
+    if REGISTRY.get(name) is None:
+        return jsonify({"error": f"Server '{name}' not found"}), 404
+    command = ((request.json or {}).get('command') or '').strip()
+    if not command:
+        return jsonify({"error": "Command required"}), 400
     
-    return jsonify({"status": "stopping"})
+    result = CONSOLES.get(name).command(command)
+    return jsonify(result), 200 if result["ok"] else 409
 
 def main():
+    port = int(MANAGER.get_setting("web_port", 8080))
+    threads = int(MANAGER.get_setting("web_threads", DEFAULT_THREADS))
+    dev = "--dev" in sys.argv
+    
     print("\033[1m\033[36m╔══════════════════════════════════════════════════════════╗\033[0m")
     print("\033[1m\033[36m║              WEB CONTROL PANEL                           ║\033[0m")
     print("\033[1m\033[36m╚══════════════════════════════════════════════════════════╝\033[0m")
     print()
-    print("\033[32m[INFO]\033[0m Starting web server...")
+    if dev:
+        print("\033[32m[INFO]\033[0m Starting development server...")
+    else:
+        server = "waitress" if waitress is not None else "built-in"
+        print(f"\033[32m[INFO]\033[0m Starting web server ({server}, {threads} workers)...")
+        if waitress is None:
+            print("\033[33m[WARN]\033[0m waitress is not installed: connections are closed after every")
+            print("       request, so every poll opens a new one (pip install waitress)")
     print()
     print("\033[33mAccess the control panel at:\033[0m")
     print()
-    print("  \033[1mhttp://localhost:8080\033[0m")
+    print(f"  \033[1mhttp://localhost:{port}\033[0m")
+    print()
+    print(f"\033[33mPanel token\033[0m (asked for on the first start, stop or command; also in {TOKEN_FILE}):")
+    print()
+    print(f"  \033[1m{WEB_TOKEN}\033[0m")
     print()
     print("\033[90mPress Ctrl+C to stop\033[0m")
     print()
     
-    app.run(host='0.0.0.0', port=8080, debug=False)
+    # Start sampling now so the first request sees a real interval
+    get_sampler()
+    try:
+        if dev:
+            app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+        else:
+            serve(app, host='0.0.0.0', port=port, threads=threads)
+    except KeyboardInterrupt:
+        print("\n\033[32m[INFO]\033[0m Web panel stopped")
 
 if __name__ == "__main__":
     main()
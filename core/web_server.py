@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Web Server
+Production serving for the web panel: worker pool, compression
+"""
+
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_THREADS = 16
+
+# Idle connections are closed after this many seconds
+CONNECTION_TIMEOUT = 30
+
+# Bodies smaller than this are not worth the CPU to compress
+COMPRESS_MIN_SIZE = 512
+
+COMPRESS_TYPES = ("application/json", "text/html")
+
+def choose_encoding(accept_encoding):
+    accepted = [part.split(";")[0].strip() for part in accept_encoding.split(",")]
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def enable_compression(app):
+    """Compress JSON and HTML responses for clients that accept br or gzip"""
+
+    @app.after_request
+    def compress(response):
+        from flask import request
+
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESS_TYPES or "Content-Encoding" in response.headers):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+        data = response.get_data()
+        if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+            return response
+
+        if encoding == "br":
+            data = brotli.compress(data, quality=5)
+        else:
+            data = gzip.compress(data, compresslevel=6)
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return app
+
+class PooledRequestHandler(WSGIRequestHandler):
+    # HTTP/1.1 for chunked event streams; werkzeug still closes after each response
+    protocol_version = "HTTP/1.1"
+    timeout = CONNECTION_TIMEOUT
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server handling connections on a fixed pool of threads"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=DEFAULT_THREADS):
+        super().__init__(host, port, app, handler=PooledRequestHandler)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="web")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+def serve(app, host="0.0.0.0", port=8080, threads=DEFAULT_THREADS):
+    """Serve app with waitress if installed, else a pooled werkzeug server.
+
+    Only waitress keeps connections alive between requests; the werkzeug
+    fallback bounds concurrency but closes each connection after use.
+
+    Each open dashboard event stream occupies one worker for as long as
+    it is connected, so threads should exceed the expected dashboards.
+    """
+    if waitress is not None:
+        waitress.serve(app, host=host, port=port, threads=threads,
+                       channel_timeout=CONNECTION_TIMEOUT, ident="msm")
+        return
+
+    server = PooledWSGIServer(host, port, app, threads)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
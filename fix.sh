@@ -40,6 +40,7 @@ echo -e "${CYAN}  Checking Python packages...${NC}"
 python3 -c "import psutil" 2>/dev/null || pip install psutil
 python3 -c "import requests" 2>/dev/null || pip install requests
 python3 -c "import flask" 2>/dev/null || pip install flask flask-cors
+python3 -c "import waitress" 2>/dev/null || pip install waitress
 python3 -c "import tqdm" 2>/dev/null || pip install tqdm
 echo -e "${GREEN}  ✓ Python packages OK${NC}"
 
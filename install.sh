@@ -38,7 +38,10 @@ yes | pkg install -y openjdk-17 python wget curl git tar gzip unzip screen htop
 
 echo -e "${CYAN}[INFO]${NC} Installing Python dependencies..."
 pip install --upgrade pip 2>/dev/null
-pip install psutil requests tqdm colorama flask flask-cors pyyaml 2>/dev/null
+pip install psutil requests tqdm colorama flask flask-cors waitress pyyaml 2>/dev/null
+python3 -c "import waitress" 2>/dev/null || echo -e "${YELLOW}[WARN]${NC} waitress not installed; the web panel will close connections after every request"
+# Optional: faster backup compression
+pip install zstandard 2>/dev/null || echo -e "${YELLOW}[WARN]${NC} zstandard not installed; backups will use zlib"
 
 echo -e "${CYAN}[INFO]${NC} Setting up permissions..."
 termux-setup-storage
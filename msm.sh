@@ -84,9 +84,13 @@ list_servers() {
     fi
 }
 
+is_server_running() {
+    python3 "$(dirname "$0")/core/server_manager.py" status "$1" >/dev/null 2>&1
+}
+
 check_server_status() {
     local server_name=$1
-    if screen -list | grep -q "msm-$server_name"; then
+    if is_server_running "$server_name"; then
         echo -e "${GREEN}[RUNNING]${NC}"
     else
         echo -e "${RED}[STOPPED]${NC}"
@@ -148,11 +152,12 @@ create_server() {
     read -p "> " mc_version
     [ -z "$mc_version" ] && mc_version="latest"
     
-    # RAM allocation
+    # RAM allocation (suggested from host memory and the other servers)
+    suggested_ram=$(python3 "$(dirname "$0")/core/heap_advisor.py" suggest 2>/dev/null || echo "2048")
     echo ""
-    echo -e "${YELLOW}Enter RAM allocation in MB (recommended: 2048-4096):${NC}"
+    echo -e "${YELLOW}Enter RAM allocation in MB (recommended for this device: ${suggested_ram}):${NC}"
     read -p "> " ram
-    [ -z "$ram" ] && ram="2048"
+    [ -z "$ram" ] && ram="$suggested_ram"
     
     # CPU cores
     echo ""
@@ -191,7 +196,7 @@ start_server() {
         return
     fi
     
-    if screen -list | grep -q "msm-$server_name"; then
+    if is_server_running "$server_name"; then
         echo -e "${YELLOW}[WARN]${NC} Server is already running"
         read -p "Press Enter to continue..." dummy
         return
@@ -218,7 +223,7 @@ stop_server() {
         return
     fi
     
-    if ! screen -list | grep -q "msm-$server_name"; then
+    if ! is_server_running "$server_name"; then
         echo -e "${YELLOW}[WARN]${NC} Server is not running"
         read -p "Press Enter to continue..." dummy
         return
@@ -245,12 +250,18 @@ server_console() {
         return
     fi
     
-    if ! screen -list | grep -q "msm-$server_name"; then
+    if ! is_server_running "$server_name"; then
         echo -e "${RED}[ERROR]${NC} Server is not running"
         read -p "Press Enter to continue..." dummy
         return
     fi
     
+    # Supervised servers have no screen session
+    if ! screen -list | grep -q "msm-$server_name"; then
+        python3 "$(dirname "$0")/core/supervisor.py" console "$server_name"
+        return
+    fi
+    
     echo -e "${CYAN}[INFO]${NC} Connecting to server console..."
     echo -e "${YELLOW}Press Ctrl+A then D to detach${NC}"
     sleep 2